@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+"""End-to-end throughput benchmark against the in-process fake RideWithGPS server.
+
+Measures items/sec and requests/sec for v1 and legacy list() walks (with and
+without page prefetch or adaptive page sizes) and for concurrent trip downloads, including time spent
+waiting on the RateLimiter. ``--consumer-delay`` imitates a slow consumer.
+
+Usage:
+    python benchmarks/bench_end_to_end.py --trips 2000 --latency 0.02 --threads 8
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import harness  # noqa: F401  # pylint: disable=unused-import  # repo root on sys.path
+
+from pyrwgps.fakeserver import FakeRideWithGPS
+
+
+class Run:
+    """Counters for one scenario, fed by client hooks."""
+
+    # pylint: disable=too-few-public-methods
+
+    def __init__(self, name):
+        self.name = name
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.rate_limit_wait = 0.0
+        self.items = 0
+        self.seconds = 0.0
+
+    def on_request(self, ctx):
+        # pylint: disable=unused-argument
+        with self.lock:
+            self.requests += 1
+
+    def on_wait(self, ctx):
+        with self.lock:
+            self.rate_limit_wait += ctx.rate_limit_wait
+
+    def attach(self, client):
+        """Count requests and rate limit waits on ``client``."""
+        client.add_hook("before_request", self.on_request)
+        client.add_hook("rate_limit_wait", self.on_wait)
+
+    def row(self):
+        """Format the results as a table row."""
+        return (
+            f"{self.name:<26} {self.items:>7} {self.requests:>6} {self.seconds:>8.2f} "
+            f"{self.items / self.seconds:>10,.0f} {self.requests / self.seconds:>8,.1f} "
+            f"{self.rate_limit_wait:>8.2f}"
+        )
+
+
+def consume(items, delay):
+    """Count ``items``, spending ``delay`` seconds on each like a slow consumer."""
+    count = 0
+    for _ in items:
+        if delay:
+            time.sleep(delay)
+        count += 1
+    return count
+
+
+def scenario_list(server, args, path, result_key, name, prefetch=0, adaptive=False):
+    # pylint: disable=too-many-arguments
+    client = server.client(
+        apikey="fake",
+        rate_limit_max=args.rate_max,
+        rate_limit_seconds=args.rate_seconds,
+    )
+    run = Run(name)
+    run.attach(client)
+    params = {"page_size": args.page_size} if "/api/v1/" in path else {}
+    start = time.perf_counter()
+    run.items = consume(
+        client.list(
+            path,
+            params=params,
+            result_key=result_key,
+            prefetch=prefetch,
+            adaptive=adaptive,
+        ),
+        args.consumer_delay,
+    )
+    run.seconds = time.perf_counter() - start
+    return run
+
+
+def scenario_export(server, args, suffix):
+    client = server.client(
+        apikey="fake",
+        rate_limit_max=args.rate_max,
+        rate_limit_seconds=args.rate_seconds,
+    )
+    run = Run(f"export {suffix}")
+    run.attach(client)
+    with tempfile.TemporaryDirectory() as tmp:
+        start = time.perf_counter()
+        run.items = client.export(
+            "/api/v1/trips.json",
+            os.path.join(tmp, f"trips.{suffix}"),
+            params={"page_size": args.page_size},
+            result_key="trips",
+            prefetch=args.prefetch,
+        )
+        run.seconds = time.perf_counter() - start
+    return run
+
+
+def scenario_downloads(server, args):
+    client = server.client(
+        apikey="fake",
+        rate_limit_max=args.rate_max,
+        rate_limit_seconds=args.rate_seconds,
+        pool_maxsize=args.threads,
+    )
+    run = Run(f"download x{args.threads} threads")
+    run.attach(client)
+    trip_ids = range(1, min(args.downloads, args.trips) + 1)
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.threads) as pool:
+        sizes = list(
+            pool.map(lambda i: len(client.download_trip_file(i, "gpx")), trip_ids)
+        )
+    run.seconds = time.perf_counter() - start
+    run.items = len(sizes)
+    return run
+
+
+def scenario_bulk(server, args):
+    client = server.client(
+        apikey="fake",
+        rate_limit_max=args.rate_max,
+        rate_limit_seconds=args.rate_seconds,
+        pool_maxsize=args.threads,
+    )
+    run = Run(f"bulk rename x{args.threads}")
+    run.attach(client)
+    changes = (
+        (f"/trips/{i}.json", {"name": f"Renamed {i}"})
+        for i in range(1, min(args.downloads, args.trips) + 1)
+    )
+    start = time.perf_counter()
+    report = client.bulk_update(changes, max_workers=args.threads)
+    run.seconds = time.perf_counter() - start
+    run.items = len(report.succeeded)
+    return run
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--trips", type=int, default=2000)
+    parser.add_argument("--downloads", type=int, default=200)
+    parser.add_argument("--page-size", type=int, default=100)
+    parser.add_argument("--latency", type=float, default=0.01)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--padding", type=int, default=0)
+    parser.add_argument("--track-points", type=int, default=500)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--rate-max", type=int, default=50)
+    parser.add_argument("--rate-seconds", type=int, default=1)
+    parser.add_argument("--prefetch", type=int, default=2)
+    parser.add_argument(
+        "--consumer-delay", type=float, default=0.0, help="seconds spent per item"
+    )
+    args = parser.parse_args(argv)
+
+    with FakeRideWithGPS(
+        trips=args.trips,
+        latency=args.latency,
+        jitter=args.jitter,
+        padding=args.padding,
+        track_points=args.track_points,
+        rate_limit_rate=args.rate_limit_rate,
+        failure_rate=args.failure_rate,
+        seed=0,
+    ) as server:
+        runs = [
+            scenario_list(server, args, "/api/v1/trips.json", "trips", "list v1"),
+            scenario_list(
+                server,
+                args,
+                "/api/v1/trips.json",
+                "trips",
+                f"list v1 prefetch {args.prefetch}",
+                prefetch=args.prefetch,
+            ),
+            scenario_list(
+                server,
+                args,
+                "/api/v1/trips.json",
+                "trips",
+                "list v1 adaptive",
+                adaptive=True,
+            ),
+            scenario_list(
+                server, args, "/users/1/trips.json", "results", "list legacy"
+            ),
+            scenario_export(server, args, "ndjson"),
+            scenario_export(server, args, "csv"),
+            scenario_downloads(server, args),
+            scenario_bulk(server, args),
+        ]
+        statuses = dict(server.statuses)
+
+    print(
+        f"{'scenario':<26} {'items':>7} {'reqs':>6} {'seconds':>8} "
+        f"{'items/s':>10} {'reqs/s':>8} {'rl wait':>8}"
+    )
+    for run in runs:
+        print(run.row())
+    print(f"server statuses: {statuses}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
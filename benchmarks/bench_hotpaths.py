@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""Microbenchmarks for the client hot paths, using recorded cassette payloads.
+
+Usage:
+    python benchmarks/bench_hotpaths.py                  # compare with baseline
+    python benchmarks/bench_hotpaths.py --save-baseline  # record a new baseline
+"""
+
+import json
+import os
+import sys
+import threading
+from types import SimpleNamespace
+from typing import List
+
+from harness import Result, load_payload, main, measure
+
+from pyrwgps import RideWithGPS
+from pyrwgps.projection import compile_fields, project
+from pyrwgps.ratelimiter import RateLimiter
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+TRIPS_PAGE = load_payload("ridewithgps_list_limit_30.yaml", "/trips.json")
+AUTH_TOKEN = load_payload("ridewithgps_list_limit_30.yaml", "/auth_tokens.json")
+
+
+class StubPool:
+    """Connection pool stand-in that answers every request with one payload."""
+
+    # pylint: disable=too-few-public-methods
+
+    def __init__(self, body: bytes, status: int = 200):
+        self.response = SimpleNamespace(data=body, status=status)
+
+    def urlopen(self, method, url, **kwargs):
+        # pylint: disable=unused-argument
+        return self.response
+
+
+def _client(cache: bool = False) -> RideWithGPS:
+    client = RideWithGPS(apikey="benchkey", cache=cache, rate_limit_max=10**9)
+    client.auth_token = "benchtoken"
+    client.connection_pool = StubPool(TRIPS_PAGE)
+    return client
+
+
+def bench_to_obj() -> Result:
+    client = _client()
+    data = json.loads(TRIPS_PAGE)
+    return measure("to_obj_trips_page", lambda: client._to_obj(data), number=200)
+
+
+def bench_to_obj_fields() -> Result:
+    client = _client()
+    data = json.loads(TRIPS_PAGE)
+    tree = compile_fields(
+        ("results.id", "results.name", "results.distance", "results.updated_at")
+    )
+    return measure(
+        "to_obj_trips_page_fields",
+        lambda: client._to_obj(project(data, tree)),
+        number=200,
+    )
+
+
+def bench_to_obj_auth_token() -> Result:
+    client = _client()
+    data = json.loads(AUTH_TOKEN)
+    return measure("to_obj_auth_token", lambda: client._to_obj(data), number=5000)
+
+
+def bench_compose_url() -> Result:
+    client = _client()
+    params = {"offset": 300, "limit": 100, "version": 2, "auth_token": "benchtoken"}
+    return measure(
+        "compose_url_apikey",
+        lambda: client._compose_url("/users/3052056/trips.json", params),
+        number=20000,
+    )
+
+
+def bench_call_params() -> Result:
+    client = _client()
+    client._request = lambda method, path, params=None, extra_headers=None: {}
+    return measure(
+        "call_param_handling",
+        lambda: client.call(
+            path="/users/3052056/trips.json", params={"offset": 0, "limit": 30}
+        ),
+        number=20000,
+    )
+
+
+def bench_call_roundtrip() -> Result:
+    client = _client()
+    return measure(
+        "call_trips_page_roundtrip",
+        lambda: client.get(
+            path="/users/3052056/trips.json", params={"offset": 0, "limit": 30}
+        ),
+        number=200,
+    )
+
+
+def bench_cache_key() -> Result:
+    client = _client(cache=True)
+    params = {"offset": 300, "limit": 100, "version": 2, "auth_token": "benchtoken"}
+    return measure(
+        "cache_key",
+        lambda: client._cache_key("/users/3052056/trips.json", params),
+        number=50000,
+    )
+
+
+def bench_cache_hit() -> Result:
+    client = _client(cache=True)
+    client.get(path="/users/3052056/trips.json", params={"offset": 0, "limit": 30})
+    return measure(
+        "call_cache_hit",
+        lambda: client.get(
+            path="/users/3052056/trips.json", params={"offset": 0, "limit": 30}
+        ),
+        number=20000,
+    )
+
+
+def bench_ratelimiter_contention(threads: int = 8, per_thread: int = 5000) -> Result:
+    """Acquire from several threads at once against a limit that never blocks."""
+    limiter = RateLimiter(max_messages=10**9, every_seconds=3600)
+
+    def worker():
+        for _ in range(per_thread):
+            limiter.acquire()
+
+    def run():
+        pool = [threading.Thread(target=worker) for _ in range(threads)]
+        for t in pool:
+            t.start()
+        for t in pool:
+            t.join()
+
+    result = measure("ratelimiter_acquire_8_threads", run, number=1, memory=False)
+    # Report individual acquisitions rather than whole contended runs.
+    result.ops_per_sec *= threads * per_thread
+    return result
+
+
+def run_all() -> List[Result]:
+    """Run every benchmark in this module."""
+    return [
+        bench_to_obj(),
+        bench_to_obj_fields(),
+        bench_to_obj_auth_token(),
+        bench_compose_url(),
+        bench_call_params(),
+        bench_call_roundtrip(),
+        bench_cache_key(),
+        bench_cache_hit(),
+        bench_ratelimiter_contention(),
+    ]
+
+
+if __name__ == "__main__":
+    sys.exit(main(run_all, BASELINE))
@@ -0,0 +1,174 @@
+"""Small benchmark harness: ops/sec, allocations, peak memory and baselines."""
+
+import argparse
+import gc
+import json
+import os
+import sys
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List, Optional
+
+import yaml  # type: ignore
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CASSETTE_DIR = os.path.join(ROOT, "tests", "cassettes")
+
+sys.path.insert(0, ROOT)
+
+
+def load_cassette_bodies(name: str) -> Dict[str, bytes]:
+    """Return ``{uri: response body}`` for every interaction in a recorded cassette."""
+    with open(os.path.join(CASSETTE_DIR, name), encoding="utf8") as f:
+        cassette = yaml.safe_load(f)
+    bodies = {}
+    for interaction in cassette["interactions"]:
+        body = interaction["response"]["body"]["string"]
+        if isinstance(body, str):
+            body = body.encode("utf8")
+        bodies[interaction["request"]["uri"]] = body
+    return bodies
+
+
+def load_payload(name: str, path_fragment: str) -> bytes:
+    """Return the first cassette response body whose URI contains ``path_fragment``."""
+    for uri, body in load_cassette_bodies(name).items():
+        if path_fragment in uri:
+            return body
+    raise KeyError(f"no interaction matching {path_fragment!r} in {name}")
+
+
+class Result:
+    """Measurements for one benchmark."""
+
+    # pylint: disable=too-few-public-methods
+
+    def __init__(
+        self, name: str, ops_per_sec: float, allocs_per_op: float, peak_kib: float
+    ):
+        self.name = name
+        self.ops_per_sec = ops_per_sec
+        self.allocs_per_op = allocs_per_op
+        self.peak_kib = peak_kib
+
+    def as_dict(self) -> Dict[str, float]:
+        """Return the measurements as a JSON-serialisable dict."""
+        return {
+            "ops_per_sec": round(self.ops_per_sec, 1),
+            "allocs_per_op": round(self.allocs_per_op, 1),
+            "peak_kib": round(self.peak_kib, 1),
+        }
+
+
+def measure(
+    name: str,
+    func: Callable[[], Any],
+    number: int = 1000,
+    repeat: int = 7,
+    memory: bool = True,
+) -> Result:
+    """Time ``func`` (best of ``repeat`` runs of ``number`` calls) and trace its memory.
+
+    Allocations are the tracemalloc blocks still held by the results of ``number``
+    calls, so they reflect the objects a caller would retain; the peak covers
+    temporaries as well.
+    """
+    func()  # warm up caches and lazy imports
+    best = float("inf")
+    for _ in range(repeat):
+        gc.collect()
+        gc.disable()  # like timeit: keep collector pauses out of the timings
+        try:
+            start = time.perf_counter()
+            for _ in range(number):
+                func()
+            best = min(best, time.perf_counter() - start)
+        finally:
+            gc.enable()
+
+    allocs = peak = 0.0
+    if memory:
+        gc.collect()
+        tracemalloc.start()
+        before = tracemalloc.take_snapshot()
+        kept = [func() for _ in range(number)]
+        after = tracemalloc.take_snapshot()
+        _, peak_bytes = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        blocks = sum(stat.count_diff for stat in after.compare_to(before, "filename"))
+        allocs = max(blocks, 0) / number
+        peak = peak_bytes / 1024
+        del kept
+    return Result(name, number / best, allocs, peak)
+
+
+def compare(
+    results: List[Result], baseline: Dict[str, Dict[str, float]], threshold: float
+) -> List[str]:
+    """Return a message for every result that regressed past ``threshold``."""
+    failures = []
+    for result in results:
+        base = baseline.get(result.name)
+        if not base:
+            continue
+        floor = base["ops_per_sec"] * (1 - threshold)
+        if result.ops_per_sec < floor:
+            failures.append(
+                f"{result.name}: {result.ops_per_sec:,.0f} ops/s "
+                f"< {floor:,.0f} (baseline {base['ops_per_sec']:,.0f})"
+            )
+        ceiling = base["peak_kib"] * (1 + threshold)
+        if base["peak_kib"] and result.peak_kib > ceiling:
+            failures.append(
+                f"{result.name}: peak {result.peak_kib:,.1f} KiB "
+                f"> {ceiling:,.1f} (baseline {base['peak_kib']:,.1f})"
+            )
+    return failures
+
+
+def main(
+    benchmarks: Callable[[], List[Result]],
+    baseline_path: str,
+    argv: Optional[List[str]] = None,
+) -> int:
+    """Run ``benchmarks``, print a table, and compare against ``baseline_path``."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--save-baseline",
+        action="store_true",
+        help="write the results as the new baseline instead of comparing",
+    )
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.4,
+        help="allowed relative regression before failing (default: 0.4)",
+    )
+    args = parser.parse_args(argv)
+
+    results = benchmarks()
+    print(f"{'benchmark':<32} {'ops/sec':>14} {'allocs/op':>10} {'peak KiB':>10}")
+    for r in results:
+        print(
+            f"{r.name:<32} {r.ops_per_sec:>14,.0f} "
+            f"{r.allocs_per_op:>10.1f} {r.peak_kib:>10.1f}"
+        )
+
+    if args.save_baseline:
+        with open(baseline_path, "w", encoding="utf8") as f:
+            json.dump(
+                {r.name: r.as_dict() for r in results}, f, indent=2, sort_keys=True
+            )
+            f.write("\n")
+        print(f"baseline written to {baseline_path}")
+        return 0
+
+    if not os.path.exists(baseline_path):
+        print("no baseline found; run with --save-baseline to create one")
+        return 0
+    with open(baseline_path, encoding="utf8") as f:
+        baseline = json.load(f)
+    failures = compare(results, baseline, args.threshold)
+    for failure in failures:
+        print(f"REGRESSION {failure}")
+    return 1 if failures else 0
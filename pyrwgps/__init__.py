@@ -1,7 +1,24 @@
-"""Public API exports for the pyrwgps package."""
+"""Public API exports for the pyrwgps package.
 
-from .ridewithgps import RideWithGPS
+RideWithGPS is imported on first use, so code that only needs a submodule
+(such as the ``pyrwgps`` command parsing its arguments) does not pay for
+loading urllib3 and certifi.
+"""
+
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    from .ridewithgps import RideWithGPS
 
 __all__ = [
     "RideWithGPS",
 ]
+
+
+def __getattr__(name: str) -> Any:
+    if name == "RideWithGPS":
+        # pylint: disable-next=import-outside-toplevel,redefined-outer-name
+        from .ridewithgps import RideWithGPS
+
+        return RideWithGPS
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
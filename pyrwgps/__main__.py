@@ -0,0 +1,7 @@
+"""Run the ``pyrwgps`` command with ``python -m pyrwgps``."""
+
+import sys
+
+from .cli import main
+
+sys.exit(main())
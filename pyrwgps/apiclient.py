@@ -1,58 +1,422 @@
 """Base HTTP client and shared secret client for the ridewithgps package."""
 
 import json
+import threading
+import time
+from collections import Counter
 from urllib.parse import urlencode
 
 from types import SimpleNamespace
-from typing import Any
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    Mapping,
+    Optional,
+    Tuple,
+    Union,
+)
 
 import urllib3
 import certifi
-from .ratelimiter import RateLimiter
+from .breaker import CircuitBreaker, CircuitOpenError
+from .cache import ResponseCache, cache_key, identity_scope
+from .hooks import HOOK_EVENTS, Hook, RequestContext
+from .projection import compile_fields, normalize_fields, project
+from .quota import QuotaLedger
+from .ratelimiter import PRIORITIES, RateBuckets, RateExceededError, RateLimiter
+from .retry import TRANSIENT_ERRORS, RetryPolicy
+
+_MISSING = object()
+
+_MUTATING_METHODS = frozenset(("POST", "PUT", "PATCH", "DELETE"))
+
+# Params that carry a credential, most specific first; see _cache_scope().
+_CREDENTIAL_PARAMS = ("auth_token", "access_token", "apikey")
+
+# A timeout in seconds: one value for both phases, or a (connect, read) pair.
+TimeoutSpec = Union[float, Tuple[float, float]]
+
+DEFAULT_TIMEOUT = (10.0, 60.0)
+
+
+def _split_timeout(timeout: Optional[TimeoutSpec]) -> Optional[Tuple[float, float]]:
+    """Return ``timeout`` as a (connect, read) pair."""
+    if timeout is None:
+        return None
+    if isinstance(timeout, tuple):
+        connect, read = timeout
+        return float(connect), float(read)
+    return float(timeout), float(timeout)
+
+
+def deadline_after(seconds: Optional[float]) -> Optional[float]:
+    """Return the ``time.monotonic()`` value ``seconds`` from now (None stays None)."""
+    if seconds is None:
+        return None
+    return time.monotonic() + seconds
+
+
+def _retry_after(response) -> Optional[float]:
+    """Return the Retry-After header of ``response`` in seconds, if it is numeric."""
+    headers = getattr(response, "headers", None) or {}
+    value = headers.get("Retry-After")
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
 
 
 class APIError(Exception):
     """Base exception for API client errors."""
 
 
+class DeadlineExceededError(APIError):
+    """Raised instead of starting a request once the caller's deadline has passed."""
+
+
 class APIClient:
     """Base HTTP client for RideWithGPS API."""
 
+    # pylint: disable=too-many-instance-attributes
+
     BASE_URL = "https://ridewithgps.com"
 
     def __init__(
         self,
         *args,
-        cache: bool = False,
+        cache: Union[bool, ResponseCache] = False,
         rate_limit_lock=None,
         encoding="utf8",
         rate_limit_max=10,
         rate_limit_seconds=1,
+        rate_limit_bulk_share=0.1,
+        rate_limits: Optional[Mapping[str, RateLimiter]] = None,
+        pool_maxsize=10,
+        retry: Union[RetryPolicy, bool, None] = True,
+        timeout: Optional[TimeoutSpec] = DEFAULT_TIMEOUT,
+        quota: Optional[QuotaLedger] = None,
+        breaker: Union[CircuitBreaker, bool, None] = None,
         **kwargs,
     ):
         """
         Initialize the API client.
 
         Args:
-            cache: Enable in-memory caching for GET requests.
+            cache: Enable in-memory caching for GET requests. Mutations
+                invalidate only the cached entries they affect. Pass a
+                ResponseCache to share one store between clients.
             rate_limit_lock: Optional lock for rate limiting.
             encoding: Response encoding.
             rate_limit_max: Max requests per window.
             rate_limit_seconds: Window size in seconds.
+            rate_limit_bulk_share: Minimum share of rate limit slots kept for
+                ``priority="bulk"`` calls while higher priorities wait.
+            rate_limits: Separate limiters for some routes, by pattern such
+                as ``"GET /api/v1/*"`` or ``"/trips/*.gpx"``; other requests
+                use the ``rate_limit_max`` limiter. See RateBuckets.
+            pool_maxsize: Connections kept open per host; raise it to match the
+                number of threads sharing this client.
+            retry: RetryPolicy for transient failures. True (the default) uses
+                RetryPolicy(); False or None disables retries.
+            timeout: Seconds to wait for a connection and for each read, as
+                one number or a ``(connect, read)`` pair; None waits forever.
+            quota: QuotaLedger counting every request against hourly and
+                daily quotas; see pyrwgps.quota.
+            breaker: CircuitBreaker that fails calls to a failing endpoint
+                group fast; True uses CircuitBreaker(). Pass one instance to
+                several clients to share what they learn. See pyrwgps.breaker.
         """
         # pylint: disable=unused-argument, too-many-arguments
-        self.cache_enabled = cache
-        self._cache: dict | None = {} if cache else None  # type: ignore[assignment]
+        self._cache: Optional[ResponseCache] = None
+        if isinstance(cache, ResponseCache):
+            self._cache = cache
+        elif cache:
+            self._cache = ResponseCache()
+        self.cache_enabled = self._cache is not None
         self.rate_limit_lock = rate_limit_lock
         self.encoding = encoding
+        self.pool_maxsize = pool_maxsize
         self.connection_pool = self._make_connection_pool()
         self.ratelimiter = RateLimiter(
-            max_messages=rate_limit_max, every_seconds=rate_limit_seconds
+            max_messages=rate_limit_max,
+            every_seconds=rate_limit_seconds,
+            bulk_share=rate_limit_bulk_share,
         )
+        self.rate_buckets = RateBuckets(self.ratelimiter, rate_limits)
+        if retry is True:
+            retry = RetryPolicy()
+        self.retry: Optional[RetryPolicy] = retry or None
+        self.timeout = _split_timeout(timeout)
+        self.quota = quota
+        if breaker is True:
+            breaker = CircuitBreaker()
+        self.breaker: Optional[CircuitBreaker] = breaker or None
+        self.metrics: Counter = Counter()
+        self.hooks: Dict[str, List[Hook]] = {}
+        self._local = threading.local()
+
+    # ------------------------------------------------------------------
+    # Lifecycle hooks
+    # ------------------------------------------------------------------
+
+    def add_hook(self, event: str, callback: Hook) -> None:
+        """
+        Register a callback for a request lifecycle event.
+
+        Args:
+            event: One of ``HOOK_EVENTS``.
+            callback: Called with the ``RequestContext`` of the request.
+        """
+        if event not in HOOK_EVENTS:
+            raise ValueError(f"event must be one of {HOOK_EVENTS!r}, got {event!r}")
+        self.hooks.setdefault(event, []).append(callback)
+
+    def remove_hook(self, event: str, callback: Hook) -> None:
+        """Unregister a callback previously passed to add_hook()."""
+        callbacks = self.hooks.get(event, [])
+        if callback in callbacks:
+            callbacks.remove(callback)
+
+    def _fire(self, event: str, ctx: Optional[RequestContext]) -> None:
+        """Timestamp ``event`` on the context and run its callbacks."""
+        if ctx is None:
+            return
+        ctx.mark(event)
+        for callback in self.hooks.get(event, ()):
+            callback(ctx)
+
+    def _begin(
+        self,
+        method: str,
+        path: str,
+        params=None,
+        *,
+        timeout: Optional[TimeoutSpec] = None,
+        deadline: Optional[float] = None,
+        priority: str = "normal",
+    ) -> RequestContext:
+        """Create the context for a request and make it current for this thread.
+
+        ``deadline`` is a budget in seconds from now for the whole request,
+        including rate limit waits and retries.
+        """
+        # pylint: disable=too-many-arguments
+        if priority not in PRIORITIES:
+            raise ValueError(
+                f"priority must be one of {PRIORITIES!r}, got {priority!r}"
+            )
+        ctx = RequestContext(method, path, params)
+        ctx.timeout = _split_timeout(timeout)
+        ctx.deadline = deadline_after(deadline)
+        ctx.priority = priority
+        self._local.context = ctx
+        return ctx
+
+    def _current_context(self) -> Optional[RequestContext]:
+        """Return the context of the request running on this thread, if any."""
+        return getattr(self._local, "context", None)
+
+    @property
+    def last_context(self) -> Optional[RequestContext]:
+        """The RequestContext of the latest call made on the current thread.
+
+        Useful to inspect the HTTP status or timings of a call after it returns.
+        """
+        return self._current_context()
+
+    def quota_scope(self) -> str:
+        """The key requests are counted under in the ``quota`` ledger."""
+        return "default"
+
+    def _limiters(self, ctx: Optional[RequestContext]) -> Tuple[RateLimiter, ...]:
+        """The rate limiters a request must get a slot from, in order."""
+        if ctx is not None and self.rate_buckets:
+            return (self.rate_buckets.limiter_for(ctx.method, ctx.path),)
+        return (self.ratelimiter,)
+
+    @staticmethod
+    def _time_left(ctx: Optional[RequestContext]) -> Optional[float]:
+        """Seconds until the deadline of ``ctx``, or None if it has none."""
+        if ctx is None or ctx.deadline is None:
+            return None
+        timeout = ctx.deadline - time.monotonic()
+        if timeout <= 0:
+            raise DeadlineExceededError(
+                f"Deadline passed before {ctx.method} {ctx.path}"
+            )
+        return timeout
+
+    def _acquire_rate_limit(self, ctx: Optional[RequestContext]) -> None:
+        """Wait for a slot of the request's rate limit bucket, reporting any wait to hooks.
+
+        With a ``quota`` ledger the request is counted first, so one refused
+        for its quota never takes a slot.
+
+        Raises:
+            DeadlineExceededError: If the request's deadline passes first.
+            QuotaExceededError: If the request would go over a quota.
+        """
+        priority = "normal" if ctx is None else ctx.priority
+        timeout = self._time_left(ctx)
+        if self.quota is not None:
+            try:
+                self.quota.spend(self.quota_scope(), priority, timeout=timeout)
+            except RateExceededError as exc:
+                raise DeadlineExceededError(
+                    "Deadline passed waiting for a paced bulk request"
+                ) from exc
+        waited = 0.0
+        for limiter in self._limiters(ctx):
+            timeout = self._time_left(ctx)
+            try:
+                waited += limiter.acquire(timeout=timeout, priority=priority)
+            except RateExceededError as exc:
+                if timeout is None:
+                    raise
+                raise DeadlineExceededError(
+                    "Deadline passed waiting for a rate limit slot"
+                ) from exc
+        if waited and ctx is not None:
+            ctx.rate_limit_wait = waited
+            self._fire("rate_limit_wait", ctx)
+
+    def _send(
+        self,
+        ctx: RequestContext,
+        send: Callable[[], Any],
+        retry: Union[RetryPolicy, bool, None] = None,
+        opted_in: bool = False,
+    ) -> Any:
+        """
+        Run ``send`` (one HTTP attempt), retrying transient failures.
+
+        Every attempt passes the circuit breaker, then takes a rate limit
+        slot; see _attempt(). Retries are counted in
+        ``metrics["retries"]`` and reported to ``retry`` hooks. No retry is
+        attempted if its backoff would run past ``ctx.deadline``.
+
+        Args:
+            ctx: Context of the request.
+            send: Makes one attempt and returns its parsed response.
+            retry: Policy for this request; None uses the client's, True
+                RetryPolicy() and False no retries.
+            opted_in: Retry even if the policy does not list the method.
+        """
+        policy: Optional[RetryPolicy] = self.retry
+        if retry is True:
+            policy = RetryPolicy()
+        elif retry is not None:
+            policy = retry or None
+        while True:
+            ctx.attempt += 1
+            try:
+                result = self._attempt(ctx, send)
+            except TRANSIENT_ERRORS as exc:
+                delay = self._retry_delay(ctx, policy, opted_in)
+                if delay is None:
+                    if ctx.deadline is not None and time.monotonic() >= ctx.deadline:
+                        # The timeout was cut short by the deadline.
+                        raise DeadlineExceededError(
+                            f"Deadline passed during {ctx.method} {ctx.path}"
+                        ) from exc
+                    raise
+                reason = type(exc).__name__
+            else:
+                if policy is None or not policy.retry_status(ctx.status):
+                    return result
+                delay = self._retry_delay(ctx, policy, opted_in)
+                if delay is None:
+                    return result
+                reason = str(ctx.status)
+            self.metrics["retries"] += 1
+            self.metrics[f"retries.{reason}"] += 1
+            self._fire("retry", ctx)
+            time.sleep(delay)
+
+    def _attempt(self, ctx: RequestContext, send: Callable[[], Any]) -> Any:
+        """
+        Make one attempt of ``ctx``, reporting its outcome to the breaker.
+
+        Raises:
+            CircuitOpenError: If the endpoint's circuit is open; the attempt
+                then takes no rate limit slot and no quota.
+        """
+        breaker = self.breaker
+        if breaker is None:
+            self._acquire_rate_limit(ctx)
+            return send()
+        key = breaker.key_for(ctx.path)
+        try:
+            breaker.before(key)
+        except CircuitOpenError:
+            self.metrics["circuit_open"] += 1
+            raise
+        healthy: Optional[bool] = None
+        try:
+            self._acquire_rate_limit(ctx)
+            try:
+                result = send()
+            except TRANSIENT_ERRORS:
+                healthy = False
+                raise
+            healthy = ctx.status not in breaker.failure_statuses
+            return result
+        finally:
+            breaker.after(key, healthy)
+
+    @staticmethod
+    def _retry_delay(
+        ctx: RequestContext, policy: Optional[RetryPolicy], opted_in: bool
+    ) -> Optional[float]:
+        """Return the backoff before retrying ``ctx``, or None to give up."""
+        if policy is None or not policy.allows(ctx.method, ctx.attempt, opted_in):
+            return None
+        delay = policy.backoff(ctx.attempt, ctx.retry_after)
+        if ctx.deadline is not None and time.monotonic() + delay >= ctx.deadline:
+            return None
+        return delay
+
+    def _timeout_for(self, ctx: Optional[RequestContext]) -> Optional[urllib3.Timeout]:
+        """Return the urllib3 timeout for the next attempt of ``ctx``."""
+        timeout = self.timeout
+        total = None
+        if ctx is not None:
+            if ctx.timeout is not None:
+                timeout = ctx.timeout
+            if ctx.deadline is not None:
+                total = ctx.deadline - time.monotonic()
+                if total <= 0:
+                    raise DeadlineExceededError(
+                        f"Deadline passed before {ctx.method} {ctx.path}"
+                    )
+        if timeout is None and total is None:
+            return None
+        connect, read = timeout or (None, None)
+        return urllib3.Timeout(connect=connect, read=read, total=total)
 
     def _make_connection_pool(self):
         """Create a urllib3 PoolManager with certifi CA certs."""
-        return urllib3.PoolManager(cert_reqs="CERT_REQUIRED", ca_certs=certifi.where())
+        return urllib3.PoolManager(
+            cert_reqs="CERT_REQUIRED",
+            ca_certs=certifi.where(),
+            maxsize=self.pool_maxsize,
+            # Connection errors are retried by RetryPolicy, through the rate
+            # limiter; urllib3 only follows redirects.
+            retries=urllib3.Retry(
+                total=None,
+                connect=0,
+                read=0,
+                other=0,
+                status=0,
+                redirect=5,
+                raise_on_redirect=False,
+            ),
+        )
 
     def _compose_url(self, path, params=None):
         """Compose a full URL from path and query parameters."""
@@ -65,6 +429,12 @@ class APIClient:
 
     def _handle_response(self, response):
         """Decode and parse the HTTP response as JSON, or return empty object if no content."""
+        result = self._parse_response(response)
+        self._fire("handled", self._current_context())
+        return result
+
+    def _parse_response(self, response):
+        """Parse the response body; see _handle_response()."""
         response_data = response.data.decode(self.encoding)
 
         # Handle empty responses (common for successful PATCH/PUT/DELETE operations)
@@ -81,7 +451,24 @@ class APIClient:
         """Rate-limited HTTP call. Acquires rate_limit_lock if set."""
         if self.rate_limit_lock:
             self.rate_limit_lock.acquire()
-        return self.connection_pool.urlopen(method, url, **kwargs)
+        ctx = self._current_context()
+        if ctx is not None:
+            ctx.url = url
+        if "timeout" not in kwargs:
+            timeout = self._timeout_for(ctx)
+            if timeout is not None:
+                kwargs["timeout"] = timeout
+        self._fire("before_request", ctx)
+        response = self.connection_pool.urlopen(method, url, **kwargs)
+        if ctx is not None:
+            ctx.status = getattr(response, "status", None)
+            data = getattr(response, "data", None)
+            ctx.response_bytes = len(data) if isinstance(data, bytes) else None
+            ctx.retry_after = None
+            if ctx.status in (429, 503):
+                ctx.retry_after = _retry_after(response)
+        self._fire("response", ctx)
+        return response
 
     def _request(self, method, path, params=None, extra_headers=None):
         """Make an HTTP request and return the parsed response."""
@@ -112,7 +499,39 @@ class APIClient:
             return [self._to_obj(i) for i in data]
         return data
 
-    def call(self, *args, path, params=None, method="GET", **kwargs):
+    def _cache_scope(self, params=None) -> Optional[str]:
+        """Return the identity cached responses are scoped to (None if anonymous).
+
+        Credentials are dropped from cache keys, so the scope must come from
+        the credential actually sent: a digest of the one in ``params``.
+        """
+        for name in _CREDENTIAL_PARAMS:
+            if params and params.get(name):
+                return identity_scope(str(params[name]))
+        return None
+
+    def _cache_key(self, path, params=None):
+        """Return the cache key for a GET of ``path`` with ``params``."""
+        scope = self._cache_scope(params)
+        if self._cache is None:
+            return cache_key(path, params, scope)
+        return self._cache.key(path, params, scope)
+
+    def call(
+        self,
+        *args,
+        path,
+        params=None,
+        method="GET",
+        idempotency_key: Optional[str] = None,
+        retry: Union[RetryPolicy, bool, None] = None,
+        timeout: Optional[TimeoutSpec] = None,
+        deadline: Optional[float] = None,
+        fields: Optional[Iterable[str]] = None,
+        raw: bool = False,
+        priority: str = "normal",
+        **kwargs,
+    ):
         """
         Make a rate-limited API call.
 
@@ -120,23 +539,62 @@ class APIClient:
             path: API endpoint path.
             params: Query parameters.
             method: HTTP method.
+            idempotency_key: Sent as the ``Idempotency-Key`` header; also makes a
+                POST or PATCH eligible for retries.
+            retry: RetryPolicy for this call instead of the client's; False
+                disables retries, True uses RetryPolicy().
+            timeout: Connect/read timeout for this call instead of the client's.
+            deadline: Seconds the whole call may take, including rate limit
+                waits and retries.
+            fields: Dotted paths of the response fields to keep, e.g.
+                ``["trip.id", "trip.user.name"]``; everything else is dropped
+                before objects are built.
+            raw: Return the parsed JSON (dicts and lists) instead of objects.
+                With caching on, raw results are shared with the cache and must
+                not be modified.
+            priority: Rate limiter lane: ``"interactive"`` for a person
+                waiting on the result, ``"normal"``, or ``"bulk"`` for
+                background work. Queued calls of a higher priority get the
+                next slot.
+
+        Raises:
+            DeadlineExceededError: If the deadline passes before a response.
         """
-        # pylint: disable=unused-argument
-        cache_key = None
-        use_cache = (
-            self.cache_enabled
-            and method.upper() == "GET"
-            and isinstance(self._cache, dict)
+        # pylint: disable=unused-argument, too-many-arguments, too-many-locals
+        ctx = self._begin(
+            method, path, params, timeout=timeout, deadline=deadline, priority=priority
         )
-        if use_cache:
-            params_tuple = tuple(sorted((params or {}).items()))
-            cache_key = (path, params_tuple)
-            # pylint: disable=unsupported-membership-test, unsubscriptable-object
-            if cache_key in self._cache:
-                return self._cache[cache_key]
-
-        self.ratelimiter.acquire()
-        response = self._request(method, path, params=params)
+        tree = None
+        if fields is not None:
+            fields = normalize_fields(fields)
+            tree = compile_fields(fields)
+        key: Any = None
+        cache = self._cache if self.cache_enabled and ctx.method == "GET" else None
+        if cache is not None:
+            key = self._cache_key(path, params)
+            if fields is not None or raw:
+                key = (key, fields, raw)
+            cached = cache.get(key, _MISSING)
+            if cached is not _MISSING:
+                ctx.result = cached
+                self._fire("cache_hit", ctx)
+                return ctx.result
+
+        headers = {"Idempotency-Key": idempotency_key} if idempotency_key else None
+        try:
+            response = self._send(
+                ctx,
+                lambda: self._request(
+                    method, path, params=params, extra_headers=headers
+                ),
+                retry,
+                opted_in=idempotency_key is not None,
+            )
+        finally:
+            if ctx.method in _MUTATING_METHODS and self._cache is not None:
+                # The server may have applied the change even if we never saw
+                # the response, so invalidate either way.
+                self._cache.invalidate(path)
         if isinstance(response, str):
             try:
                 data = json.loads(response)
@@ -145,20 +603,37 @@ class APIClient:
                         data.get("error") or data.get("errors") or "Unknown API error"
                     )
                     raise APIError(str(message))
-                result = self._to_obj(data)
+                result = project(data, tree)
             except json.JSONDecodeError as exc:
                 raise APIError("Invalid JSON response") from exc
         else:
-            result = self._to_obj(response)
+            result = project(response, tree)
+        if not raw:
+            result = self._to_obj(result)
+        ctx.result = result
+        self._fire("converted", ctx)
 
-        if use_cache:
-            # pylint: disable=unsupported-assignment-operation
-            self._cache[cache_key] = result
+        if cache is not None:
+            cache.set(key, path, result)
         return result
 
     def clear_cache(self) -> None:
         """
         Clear the in-memory GET request cache.
         """
-        if isinstance(self._cache, dict):
+        if self._cache is not None:
             self._cache.clear()
+
+    def invalidate_cache(self, path: str) -> int:
+        """
+        Drop cached responses made stale by a change to ``path``.
+
+        Mutations made through call() do this automatically; use it after
+        changing a resource some other way (e.g. on the website).
+
+        Returns:
+            The number of cache entries removed.
+        """
+        if self._cache is None:
+            return 0
+        return self._cache.invalidate(path)
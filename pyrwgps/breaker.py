@@ -0,0 +1,222 @@
+"""Circuit breakers for the ridewithgps package.
+
+When a group of endpoints is degraded (say the legacy file downloads time out
+while the v1 API is fine), retrying every call against it burns rate limit
+slots and worker threads on requests that will fail anyway. A CircuitBreaker
+counts consecutive failures per endpoint group and, past a threshold, fails
+calls to that group fast with CircuitOpenError::
+
+    client = RideWithGPS(apikey="...", breaker=CircuitBreaker(key="template"))
+
+After ``reset_timeout`` seconds the circuit is half-open: a few probe calls
+go through, and the first successful one closes it again while a failed one
+reopens it. Groups are independent, so healthy endpoints keep their full
+throughput; a closed circuit costs a dictionary lookup per call.
+"""
+
+import re
+import threading
+import time
+from typing import Callable, Dict, Iterable, Optional, Union
+
+# Circuit states.
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+# Statuses that count as a failure of the endpoint. 429 is the rate limiter's
+# business, and 4xx responses mean the endpoint works.
+FAILURE_STATUSES = frozenset((500, 502, 503, 504))
+
+_NUMERIC_SEGMENT = re.compile(r"(?<=/)\d+(?=[./]|$)")
+
+
+def endpoint_family(path: str) -> str:
+    """``"v1"`` for ``/api/v1/...`` paths, ``"legacy"`` for everything else."""
+    return "v1" if path.lstrip("/").startswith("api/v1/") else "legacy"
+
+
+def endpoint_template(path: str) -> str:
+    """``path`` with numeric IDs replaced, e.g. ``/trips/{id}.tcx``."""
+    path = "/" + path.split("?", 1)[0].lstrip("/")
+    return _NUMERIC_SEGMENT.sub("{id}", path)
+
+
+_KEYS: Dict[str, Callable[[str], str]] = {
+    "family": endpoint_family,
+    "template": endpoint_template,
+}
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of a request to an endpoint group whose circuit is open.
+
+    Attributes:
+        key: The endpoint group, e.g. ``"legacy"`` or ``"/trips/{id}.tcx"``.
+        retry_after: Seconds until probe requests are let through again.
+    """
+
+    def __init__(self, key: str, retry_after: float):
+        super().__init__(
+            f"Circuit for {key} is open after repeated failures; "
+            f"retry in {retry_after:.1f}s"
+        )
+        self.key = key
+        self.retry_after = retry_after
+
+
+class Circuit:
+    """State of one endpoint group."""
+
+    # pylint: disable=too-few-public-methods
+
+    __slots__ = ("state", "failures", "opened_at", "probes", "opened")
+
+    def __init__(self):
+        self.state = CLOSED
+        # Consecutive failures while closed.
+        self.failures = 0
+        self.opened_at = 0.0
+        # Probe requests in flight while half-open.
+        self.probes = 0
+        # Times the circuit has opened.
+        self.opened = 0
+
+
+class CircuitBreaker:
+    """Per-endpoint-group circuit breakers, safe to share between clients.
+
+    Args:
+        key: How requests are grouped: ``"family"`` (v1 or legacy),
+            ``"template"`` (the path with IDs replaced), or a function of
+            the request path.
+        failure_threshold: Consecutive failures that open a circuit.
+        reset_timeout: Seconds an open circuit fails fast before probing.
+        half_open_probes: Requests let through at once while half-open.
+        failure_statuses: Response statuses counted as failures; dropped
+            connections and timeouts always are.
+        clock: Returns monotonic seconds.
+    """
+
+    # pylint: disable=too-many-arguments, too-many-instance-attributes
+
+    def __init__(
+        self,
+        *,
+        key: Union[str, Callable[[str], str]] = "family",
+        failure_threshold: int = 5,
+        reset_timeout: float = 30.0,
+        half_open_probes: int = 1,
+        failure_statuses: Iterable[int] = FAILURE_STATUSES,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        if isinstance(key, str):
+            if key not in _KEYS:
+                raise ValueError(f"key must be one of {tuple(_KEYS)!r} or a function")
+            key = _KEYS[key]
+        self.key_for: Callable[[str], str] = key
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.half_open_probes = half_open_probes
+        self.failure_statuses = frozenset(failure_statuses)
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._circuits: Dict[str, Circuit] = {}
+
+    def __repr__(self):
+        return (
+            f"CircuitBreaker(failure_threshold={self.failure_threshold}, "
+            f"reset_timeout={self.reset_timeout})"
+        )
+
+    def before(self, key: str) -> None:
+        """
+        Admit a request to ``key``, or fail it fast.
+
+        Every admitted request must be followed by after().
+
+        Raises:
+            CircuitOpenError: If the circuit is open, or half-open with all
+                probes in flight.
+        """
+        circuit = self._circuits.get(key)
+        if circuit is None or circuit.state == CLOSED:
+            return
+        with self._lock:
+            if circuit.state == CLOSED:
+                return
+            now = self.clock()
+            if circuit.state == OPEN:
+                wait = circuit.opened_at + self.reset_timeout - now
+                if wait > 0:
+                    raise CircuitOpenError(key, wait)
+                circuit.state = HALF_OPEN
+                circuit.probes = 0
+            if circuit.probes >= self.half_open_probes:
+                raise CircuitOpenError(key, 0.0)
+            circuit.probes += 1
+
+    def after(self, key: str, healthy: Optional[bool]) -> None:
+        """
+        Record the outcome of a request admitted by before().
+
+        Args:
+            key: The request's endpoint group.
+            healthy: True if the endpoint answered, False if it failed, None
+                if the request never reached it (e.g. its deadline passed).
+        """
+        circuit = self._circuits.get(key)
+        quiet = circuit is None or (circuit.state == CLOSED and not circuit.failures)
+        if quiet and healthy is not False:
+            return
+        with self._lock:
+            circuit = self._circuits.setdefault(key, Circuit())
+            if circuit.state == CLOSED:
+                if healthy:
+                    circuit.failures = 0
+                elif healthy is False:
+                    circuit.failures += 1
+                    if circuit.failures >= self.failure_threshold:
+                        self._open(circuit)
+                return
+            if circuit.state == HALF_OPEN:
+                circuit.probes = max(circuit.probes - 1, 0)
+                if healthy:
+                    circuit.state = CLOSED
+                    circuit.failures = 0
+                elif healthy is False:
+                    self._open(circuit)
+            # Requests admitted before the circuit opened change nothing.
+
+    def _open(self, circuit: Circuit) -> None:
+        circuit.state = OPEN
+        circuit.opened_at = self.clock()
+        circuit.failures = 0
+        circuit.probes = 0
+        circuit.opened += 1
+
+    def state(self, key: str) -> str:
+        """``"closed"``, ``"open"`` or ``"half_open"`` (also once an open
+        circuit's timeout is up)."""
+        circuit = self._circuits.get(key)
+        if circuit is None:
+            return CLOSED
+        with self._lock:
+            if (
+                circuit.state == OPEN
+                and self.clock() >= circuit.opened_at + self.reset_timeout
+            ):
+                return HALF_OPEN
+            return circuit.state
+
+    def states(self) -> Dict[str, str]:
+        """The state of every endpoint group seen so far."""
+        return {key: self.state(key) for key in list(self._circuits)}
+
+    def reset(self, key: Optional[str] = None) -> None:
+        """Close the circuit of ``key``, or of every group."""
+        with self._lock:
+            if key is None:
+                self._circuits.clear()
+            else:
+                self._circuits.pop(key, None)
@@ -0,0 +1,209 @@
+"""Concurrent bulk mutations for the ridewithgps package."""
+
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from .apiclient import APIError, DeadlineExceededError, TimeoutSpec, deadline_after
+from .retry import IDEMPOTENT_METHODS, RetryPolicy
+
+# Bulk changes set fields to absolute values, so PATCH is as safe to repeat as PUT.
+# POST (create) is never retried.
+BULK_RETRY_METHODS = IDEMPOTENT_METHODS | {"PATCH"}
+
+Change = Tuple[str, Optional[Dict[str, Any]]]
+
+
+class BulkItemResult:
+    """Outcome of one change in a bulk run."""
+
+    # pylint: disable=too-few-public-methods, too-many-instance-attributes
+
+    __slots__ = (
+        "index",
+        "path",
+        "params",
+        "ok",
+        "status",
+        "result",
+        "error",
+        "attempts",
+    )
+
+    def __init__(self, index: int, path: str, params: Optional[Dict[str, Any]]):
+        self.index = index
+        self.path = path
+        self.params = params
+        self.ok = False
+        self.status: Optional[int] = None
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+        self.attempts = 0
+
+    def __repr__(self):
+        outcome = "ok" if self.ok else f"failed: {self.error!r}"
+        return (
+            f"BulkItemResult(index={self.index}, path={self.path!r}, "
+            f"status={self.status}, attempts={self.attempts}, {outcome})"
+        )
+
+
+class BulkReport:
+    """Per-item results of a bulk run, in input order.
+
+    ``complete`` is False if the run stopped at its deadline; changes after
+    the last result were never taken from the input.
+    """
+
+    def __init__(
+        self, results: List[BulkItemResult], elapsed: float, complete: bool = True
+    ):
+        self.results = results
+        self.elapsed = elapsed
+        self.complete = complete
+
+    def __iter__(self) -> Iterator[BulkItemResult]:
+        return iter(self.results)
+
+    def __len__(self) -> int:
+        return len(self.results)
+
+    @property
+    def succeeded(self) -> List[BulkItemResult]:
+        """Results of the changes that were applied."""
+        return [r for r in self.results if r.ok]
+
+    @property
+    def failed(self) -> List[BulkItemResult]:
+        """Results of the changes that failed after all retries."""
+        return [r for r in self.results if not r.ok]
+
+    def __repr__(self):
+        return (
+            f"BulkReport(total={len(self)}, succeeded={len(self.succeeded)}, "
+            f"failed={len(self.failed)}, complete={self.complete}, "
+            f"elapsed={self.elapsed:.2f}s)"
+        )
+
+
+def _apply(
+    client: Any,
+    item: BulkItemResult,
+    method: str,
+    policy: RetryPolicy,
+    *,
+    timeout: Optional[TimeoutSpec] = None,
+    end: Optional[float] = None,
+) -> BulkItemResult:
+    """Apply one change; retries happen inside client.call()."""
+    # pylint: disable=too-many-arguments
+    if end is not None and time.monotonic() >= end:
+        # Queued behind other changes until the deadline passed.
+        item.error = DeadlineExceededError(f"Deadline passed before {item.path}")
+        return item
+    try:
+        item.result = client.call(
+            path=item.path,
+            params=dict(item.params or {}),
+            method=method,
+            retry=policy,
+            timeout=timeout,
+            deadline=None if end is None else end - time.monotonic(),
+        )
+    except Exception as exc:  # pylint: disable=broad-exception-caught
+        # A bad item must not sink the batch; record it and move on.
+        item.error = exc
+    ctx = client.last_context
+    if ctx is not None:
+        item.status = ctx.status
+        item.attempts = ctx.attempt
+    if item.error is None:
+        item.ok = item.status is None or item.status < 400
+        if not item.ok:
+            item.error = APIError(f"HTTP {item.status} for {method} {item.path}")
+    return item
+
+
+def bulk_update(
+    client: Any,
+    changes: Iterable[Change],
+    *,
+    method: str = "PUT",
+    max_workers: int = 8,
+    retries: int = 3,
+    backoff: float = 0.5,
+    backoff_max: float = 30.0,
+    progress: Optional[Callable[[int, BulkItemResult], None]] = None,
+    timeout: Optional[TimeoutSpec] = None,
+    deadline: Optional[float] = None,
+) -> BulkReport:
+    """
+    Apply many ``(path, params)`` changes concurrently within the client's rate limit.
+
+    Every request still goes through ``client.call()``, so the RateLimiter, hooks
+    and cache invalidation apply as usual. Transient failures (429, 5xx, dropped
+    connections) of PUT, PATCH and DELETE changes are retried with jittered
+    exponential backoff, each attempt taking a rate limit slot; anything that
+    still fails is recorded in the report rather than raised.
+
+    Args:
+        client: An APIClient (usually RideWithGPS).
+        changes: Iterable of ``(path, params)``; consumed lazily.
+        method: HTTP method for every change (``PUT``, ``PATCH``, ``POST`` or ``DELETE``).
+        max_workers: Number of requests in flight at once.
+        retries: Retries per change after the first attempt.
+        backoff: Base backoff in seconds; doubles on every retry.
+        backoff_max: Upper bound for a single backoff.
+        progress: Called as ``progress(done, item_result)`` after each change finishes.
+        timeout: Connect/read timeout per request instead of the client's.
+        deadline: Seconds the whole run may take. Once it has passed no further
+            request is started: changes already taken from ``changes`` fail with
+            DeadlineExceededError, the rest are left unconsumed and the report
+            is marked incomplete.
+
+    Returns:
+        A BulkReport with one BulkItemResult per change, in input order.
+    """
+    # pylint: disable=too-many-arguments, too-many-locals
+    started = time.monotonic()
+    end = deadline_after(deadline)
+    complete = True
+    policy = RetryPolicy(
+        total=retries,
+        backoff_factor=backoff,
+        backoff_max=backoff_max,
+        methods=BULK_RETRY_METHODS,
+    )
+    results: List[BulkItemResult] = []
+    lock = threading.Lock()
+    done = 0
+
+    def finished(future: Future) -> None:
+        nonlocal done
+        item = future.result()
+        with lock:
+            done += 1
+            count = done
+        if progress is not None:
+            progress(count, item)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        pending: Set[Future] = set()
+        for index, (path, params) in enumerate(changes):
+            item = BulkItemResult(index, path, params)
+            results.append(item)
+            future = pool.submit(
+                _apply, client, item, method.upper(), policy, timeout=timeout, end=end
+            )
+            future.add_done_callback(finished)
+            pending.add(future)
+            # Keep a bounded window in flight so huge iterables stay lazy.
+            if len(pending) >= max_workers * 2:
+                _, pending = wait(pending, return_when=FIRST_COMPLETED)
+            if end is not None and time.monotonic() >= end:
+                complete = False
+                break
+        wait(pending)
+
+    return BulkReport(results, time.monotonic() - started, complete)
@@ -0,0 +1,217 @@
+"""Response cache with targeted invalidation for the ridewithgps package."""
+
+import hashlib
+import json
+import re
+import threading
+from collections import OrderedDict
+from fnmatch import fnmatchcase
+from functools import lru_cache
+from typing import Any, Dict, Hashable, Iterable, List, Optional, Set, Tuple
+
+_EXTENSION = re.compile(r"\.[A-Za-z0-9]+$")
+
+# Cached collections that change whenever a resource of the given kind does.
+DEFAULT_DEPENDENCIES: Dict[str, Tuple[str, ...]] = {
+    "trips": ("sync",),
+    "routes": ("sync",),
+    "events": ("sync",),
+}
+
+# Credentials are carried by the cache scope, never by the key itself.
+_CREDENTIAL_PARAMS = frozenset(("apikey", "auth_token", "access_token"))
+_FLAT_TYPES = (str, int)
+
+
+@lru_cache(maxsize=4096)
+def identity_scope(secret: Optional[str]) -> Optional[str]:
+    """Return an opaque cache scope for a credential, or None if there is none.
+
+    Only a digest of ``secret`` ends up in cache keys, so a shared cache never
+    holds tokens.
+    """
+    if not secret:
+        return None
+    return hashlib.blake2b(secret.encode("utf8"), digest_size=12).hexdigest()
+
+
+def cache_key(
+    path: str, params: Optional[Dict[str, Any]] = None, scope: Optional[str] = None
+) -> Tuple[Optional[str], str, Hashable]:
+    """Return a stable, hashable cache key for a GET of ``path`` with ``params``.
+
+    Params are put in a canonical form (sorted keys at every level), so nested
+    dicts and lists work and key order does not matter. Credential params are
+    dropped; pass the caller's identity as ``scope`` instead.
+    """
+    if not params:
+        return (scope, path, ())
+    items = sorted((k, v) for k, v in params.items() if k not in _CREDENTIAL_PARAMS)
+    # Flat str/int params (the common case) are keyed by the sorted items; anything
+    # else (nested values, floats, bools) by canonical JSON, which keeps 1, 1.0 and
+    # True apart.
+    if all(v.__class__ in _FLAT_TYPES for _, v in items):
+        return (scope, path, tuple(items))
+    canonical = json.dumps(
+        dict(items), sort_keys=True, separators=(",", ":"), default=str
+    )
+    return (scope, path, canonical)
+
+
+def resource_of(path: str) -> Tuple[str, Optional[str]]:
+    """Return ``(kind, id)`` for an API path; ``id`` is None for collections.
+
+    Works for both the v1 and legacy APIs::
+
+        /api/v1/trips/123.json          -> ("trips", "123")
+        /trips/123.json                 -> ("trips", "123")
+        /api/v1/routes/5/polyline.json  -> ("routes", "5")
+        /api/v1/trips.json              -> ("trips", None)
+        /users/1/trips.json             -> ("trips", None)
+    """
+    clean = path.split("?", 1)[0].strip("/").removeprefix("api/v1/")
+    segments = [_EXTENSION.sub("", s) for s in clean.split("/") if s]
+    if not segments:
+        return "", None
+    if segments[0] == "users" and len(segments) >= 3:
+        # Collections owned by a user, e.g. /users/{id}/trips.json
+        segments = segments[2:]
+    kind = segments[0]
+    item_id = segments[1] if len(segments) > 1 else None
+    return kind, item_id
+
+
+class ResponseCache:
+    """Thread-safe in-memory store for GET responses.
+
+    Entries are indexed by the resource they belong to (see resource_of()), so a
+    mutation only drops the affected resource and the collections that list it,
+    instead of the whole cache.
+
+    One store can be shared by many clients, e.g. one per OAuth user: keys are
+    scoped by each client's authenticated identity, except for paths matching
+    ``shared`` patterns, whose responses are the same for everyone.
+
+    Args:
+        dependencies: Maps a resource kind to further kinds whose collections
+            must be dropped when it changes. Defaults to DEFAULT_DEPENDENCIES.
+        shared: ``fnmatch`` patterns of public paths cached once for all users.
+        max_entries: Entries kept at most; past that, the least recently used
+            are dropped. None keeps everything.
+    """
+
+    # pylint: disable=too-many-instance-attributes
+
+    def __init__(
+        self,
+        dependencies: Optional[Dict[str, Tuple[str, ...]]] = None,
+        shared: Iterable[str] = (),
+        max_entries: Optional[int] = None,
+    ):
+        self.dependencies = dict(
+            DEFAULT_DEPENDENCIES if dependencies is None else dependencies
+        )
+        self.shared = tuple(shared)
+        self.max_entries = max_entries
+        self._rules: List[Tuple[str, Tuple[str, ...]]] = []
+        self._entries: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._paths: Dict[Hashable, str] = {}
+        self._by_kind: Dict[str, Set[Hashable]] = {}
+        self._lock = threading.RLock()
+
+    def key(
+        self, path: str, params: Optional[Dict[str, Any]] = None, scope=None
+    ) -> Tuple[Optional[str], str, Hashable]:
+        """Return the key for ``path``, dropping ``scope`` for shared paths."""
+        if scope is not None and any(fnmatchcase(path, p) for p in self.shared):
+            scope = None
+        return cache_key(path, params, scope)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Return the cached value for ``key``, or ``default``."""
+        if self.max_entries is None:
+            return self._entries.get(key, default)
+        with self._lock:
+            if key not in self._entries:
+                return default
+            self._entries.move_to_end(key)
+            return self._entries[key]
+
+    def set(self, key: Hashable, path: str, value: Any) -> None:
+        """Store ``value`` under ``key`` as a response for ``path``."""
+        kind, _ = resource_of(path)
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            self._paths[key] = path
+            self._by_kind.setdefault(kind, set()).add(key)
+            if self.max_entries is not None:
+                while len(self._entries) > self.max_entries:
+                    self._discard(next(iter(self._entries)))
+
+    def clear(self) -> None:
+        """Drop every entry."""
+        with self._lock:
+            self._entries.clear()
+            self._paths.clear()
+            self._by_kind.clear()
+
+    def add_dependency(self, mutated: str, *dependents: str) -> None:
+        """Drop cached paths matching ``dependents`` whenever ``mutated`` changes.
+
+        Both sides are ``fnmatch`` patterns over API paths, e.g.
+        ``cache.add_dependency("/routes/*", "/api/v1/collections/*")``.
+        """
+        self._rules.append((mutated, dependents))
+
+    def invalidate(self, path: str) -> int:
+        """Drop the entries a mutation of ``path`` may have made stale.
+
+        That is the resource's own responses (any sub-path of the same ID, on
+        either API), every cached collection of the same kind, collections of
+        dependent kinds, and anything matched by add_dependency() rules.
+
+        Returns:
+            The number of entries removed.
+        """
+        kind, item_id = resource_of(path)
+        patterns = [
+            p
+            for mutated, deps in self._rules
+            if fnmatchcase(path, mutated)
+            for p in deps
+        ]
+        with self._lock:
+            stale = []
+            for key in self._by_kind.get(kind, ()):
+                entry_id = resource_of(self._paths[key])[1]
+                if entry_id is None or (item_id is not None and entry_id == item_id):
+                    stale.append(key)
+            for dependent in self.dependencies.get(kind, ()):
+                stale.extend(self._by_kind.get(dependent, ()))
+            if patterns:
+                stale.extend(
+                    key
+                    for key, cached_path in self._paths.items()
+                    if any(fnmatchcase(cached_path, p) for p in patterns)
+                )
+            removed = 0
+            for key in set(stale):
+                removed += self._discard(key)
+            return removed
+
+    def _discard(self, key: Hashable) -> int:
+        if key not in self._entries:
+            return 0
+        del self._entries[key]
+        path = self._paths.pop(key)
+        keys = self._by_kind.get(resource_of(path)[0])
+        if keys is not None:
+            keys.discard(key)
+        return 1
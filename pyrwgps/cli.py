@@ -0,0 +1,442 @@
+"""The ``pyrwgps`` command: list, export, download and sync from the shell.
+
+Credentials come from the environment (or the matching options)::
+
+    RIDEWITHGPS_KEY=...                              # API key auth
+    RIDEWITHGPS_EMAIL=... RIDEWITHGPS_PASSWORD=...   # optional, with the key
+    RIDEWITHGPS_CLIENT_ID=... RIDEWITHGPS_ACCESS_TOKEN=...  # OAuth instead
+
+Examples::
+
+    pyrwgps list /api/v1/routes.json --result-key routes --limit 10
+    pyrwgps export /api/v1/trips.json trips.parquet --result-key trips
+    pyrwgps download-trips 123 456 --format tcx
+    pyrwgps sync --concurrency 8 --heatmap ~/heatmap
+
+Only argparse is imported up front; the HTTP client and the export sinks are
+loaded once a command needs them, so ``--help`` and argument errors return
+without loading urllib3.
+"""
+
+import argparse
+import json
+import os
+import sys
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+DEFAULT_CACHE_DIR = os.path.join(
+    os.environ.get("XDG_CACHE_HOME") or os.path.join("~", ".cache"), "pyrwgps"
+)
+SYNC_STATE = ".sync.json"
+
+
+def _env(name: str) -> Optional[str]:
+    return os.environ.get(name) or None
+
+
+def _param(text: str) -> Tuple[str, str]:
+    key, sep, value = text.partition("=")
+    if not sep or not key:
+        raise argparse.ArgumentTypeError(f"expected KEY=VALUE, got {text!r}")
+    return key, value
+
+
+def _fields(text: str) -> List[str]:
+    return [field.strip() for field in text.split(",") if field.strip()]
+
+
+def _common_options(parser: argparse.ArgumentParser, defaults: bool = True) -> None:
+    """Add the connection options, accepted before or after the subcommand.
+
+    On subcommands (``defaults=False``) an option left out does not override
+    the value given before the subcommand.
+    """
+    group = parser.add_argument_group("connection")
+
+    def option(name: str, default: Any, **kwargs: Any) -> None:
+        group.add_argument(
+            name, default=default if defaults else argparse.SUPPRESS, **kwargs
+        )
+
+    option("--apikey", _env("RIDEWITHGPS_KEY"))
+    option("--email", _env("RIDEWITHGPS_EMAIL"))
+    option("--password", _env("RIDEWITHGPS_PASSWORD"))
+    option("--client-id", _env("RIDEWITHGPS_CLIENT_ID"))
+    option("--client-secret", _env("RIDEWITHGPS_CLIENT_SECRET"))
+    option("--access-token", _env("RIDEWITHGPS_ACCESS_TOKEN"))
+    option("--base-url", _env("RIDEWITHGPS_BASE_URL"), help=argparse.SUPPRESS)
+    option(
+        "--concurrency",
+        4,
+        type=int,
+        help="requests in flight at once: parallel downloads, or the current "
+        "page plus pages prefetched for list and export (default: 4)",
+    )
+    option(
+        "--rate-limit",
+        10,
+        type=int,
+        metavar="N",
+        help="at most N requests per --rate-period (default: 10)",
+    )
+    option(
+        "--rate-period",
+        1,
+        type=int,
+        metavar="SECONDS",
+        help="rate limit window in seconds (default: 1)",
+    )
+    option("--timeout", None, type=float, help="read timeout in seconds")
+    option(
+        "--hourly-quota",
+        None,
+        type=int,
+        metavar="N",
+        help="at most N requests per hour for this key, counted in "
+        "CACHE_DIR/quota.json across runs",
+    )
+    option("--daily-quota", None, type=int, metavar="N", help="the same, per day")
+    option(
+        "--cache-dir",
+        _env("PYRWGPS_CACHE_DIR") or DEFAULT_CACHE_DIR,
+        help="where downloads and sync state go by default "
+        "(default: $PYRWGPS_CACHE_DIR or ~/.cache/pyrwgps)",
+    )
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """Return the argument parser for the ``pyrwgps`` command."""
+    parser = argparse.ArgumentParser(
+        prog="pyrwgps",
+        description="List, export, download and sync RideWithGPS data.",
+    )
+    _common_options(parser)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    def walk_options(command: argparse.ArgumentParser) -> None:
+        command.add_argument("path", help="list endpoint, e.g. /api/v1/trips.json")
+        command.add_argument(
+            "--result-key",
+            default=None,
+            help="root key of the items; defaults to the resource name for v1 "
+            "paths and 'results' for legacy ones",
+        )
+        command.add_argument("--limit", type=int, default=None)
+        command.add_argument(
+            "--fields", type=_fields, default=None, help="comma-separated fields"
+        )
+        command.add_argument(
+            "--param",
+            type=_param,
+            action="append",
+            default=[],
+            metavar="KEY=VALUE",
+            help="query parameter; may be repeated",
+        )
+
+    list_cmd = commands.add_parser("list", help="write items as NDJSON or CSV")
+    _common_options(list_cmd, defaults=False)
+    walk_options(list_cmd)
+    list_cmd.add_argument("--format", choices=("ndjson", "csv"), default="ndjson")
+
+    export_cmd = commands.add_parser("export", help="export items to a file")
+    _common_options(export_cmd, defaults=False)
+    walk_options(export_cmd)
+    export_cmd.add_argument(
+        "destination", help=".ndjson, .jsonl, .csv, .parquet or .arrow file"
+    )
+    export_cmd.add_argument(
+        "--format", choices=("ndjson", "csv", "parquet", "arrow"), default=None
+    )
+    export_cmd.add_argument("--batch-size", type=int, default=1000)
+
+    def file_options(command: argparse.ArgumentParser) -> None:
+        command.add_argument("--format", choices=("gpx", "tcx", "kml"), default="gpx")
+        command.add_argument(
+            "--out", default=None, help="directory (default: CACHE_DIR/trips)"
+        )
+
+    download_cmd = commands.add_parser(
+        "download-trips", help="download trip files by ID"
+    )
+    download_cmd.add_argument(
+        "ids", nargs="*", help="trip IDs; read from stdin, one per line, if omitted"
+    )
+    file_options(download_cmd)
+    _common_options(download_cmd, defaults=False)
+    download_cmd.add_argument(
+        "--force", action="store_true", help="download files that already exist"
+    )
+
+    sync_cmd = commands.add_parser(
+        "sync", help="download files of trips that are new or changed since last sync"
+    )
+    file_options(sync_cmd)
+    _common_options(sync_cmd, defaults=False)
+    sync_cmd.add_argument(
+        "--heatmap",
+        default=None,
+        metavar="DIR",
+        help="also draw trips not drawn yet into this heatmap (needs numpy)",
+    )
+    sync_cmd.add_argument(
+        "--heatmap-zooms",
+        type=lambda text: [int(zoom) for zoom in _fields(text)],
+        default=None,
+        metavar="Z,Z",
+        help="zoom levels of a new heatmap (default: 12)",
+    )
+    return parser
+
+
+def _client(args: argparse.Namespace) -> Any:
+    """Build an authenticated client from the parsed options."""
+    # pylint: disable=import-outside-toplevel
+    from .ridewithgps import RideWithGPS
+
+    options: Dict[str, Any] = {
+        "rate_limit_max": args.rate_limit,
+        "rate_limit_seconds": args.rate_period,
+        "pool_maxsize": max(args.concurrency, 1),
+    }
+    if args.timeout is not None:
+        options["timeout"] = (10.0, args.timeout)
+    if args.hourly_quota or args.daily_quota:
+        from .quota import QuotaLedger
+
+        options["quota"] = QuotaLedger(
+            os.path.join(os.path.expanduser(args.cache_dir), "quota.json"),
+            hourly=args.hourly_quota,
+            daily=args.daily_quota,
+            # Write every request, so runs side by side see each other's counts.
+            flush_interval=0,
+        )
+    if args.client_id:
+        client = RideWithGPS(
+            client_id=args.client_id,
+            client_secret=args.client_secret,
+            access_token=args.access_token,
+            **options,
+        )
+    elif args.apikey:
+        client = RideWithGPS(apikey=args.apikey, **options)
+    else:
+        raise SystemExit(
+            "pyrwgps: set RIDEWITHGPS_KEY (or --apikey), or RIDEWITHGPS_CLIENT_ID "
+            "and RIDEWITHGPS_ACCESS_TOKEN for OAuth"
+        )
+    if args.base_url:
+        setattr(client, "BASE_URL", args.base_url)
+    if not args.client_id and args.email and args.password:
+        client.authenticate(email=args.email, password=args.password)
+    return client
+
+
+def _walk_options(args: argparse.Namespace) -> Dict[str, Any]:
+    result_key = args.result_key
+    if result_key is None:
+        name = os.path.basename(args.path).split(".")[0]
+        result_key = name if "/api/v1/" in args.path else "results"
+    return {
+        "params": dict(args.param),
+        "result_key": result_key,
+        "limit": args.limit,
+        "fields": args.fields,
+        "prefetch": max(args.concurrency - 1, 0),
+    }
+
+
+def _list(args: argparse.Namespace) -> int:
+    # pylint: disable=import-outside-toplevel
+    from .export import CSVSink, NDJSONSink
+
+    sink = CSVSink(sys.stdout) if args.format == "csv" else NDJSONSink(sys.stdout)
+    client = _client(args)
+    # Small batches so output appears as pages arrive.
+    client.export(args.path, sink, batch_size=100, **_walk_options(args))
+    return 0
+
+
+def _export(args: argparse.Namespace) -> int:
+    client = _client(args)
+    count = client.export(
+        args.path,
+        args.destination,
+        format=args.format,
+        batch_size=args.batch_size,
+        **_walk_options(args),
+    )
+    print(f"Exported {count} items to {args.destination}", file=sys.stderr)
+    return 0
+
+
+def _out_dir(args: argparse.Namespace) -> str:
+    out = args.out or os.path.join(os.path.expanduser(args.cache_dir), "trips")
+    os.makedirs(out, exist_ok=True)
+    return out
+
+
+def _write_atomic(path: str, data: bytes) -> None:
+    """Write ``data`` so readers never see a partial file."""
+    partial = path + ".part"
+    with open(partial, "wb") as handle:
+        handle.write(data)
+    os.replace(partial, path)
+
+
+def _download(
+    client: Any,
+    trip_ids: Iterable[int],
+    out: str,
+    file_format: str,
+    workers: int,
+    *,
+    priority: str = "normal",
+) -> Tuple[List[int], List[Tuple[int, BaseException]]]:
+    """Download trip files concurrently; return (done, failures)."""
+    # pylint: disable=import-outside-toplevel, too-many-arguments
+    from concurrent.futures import ThreadPoolExecutor
+
+    from .apiclient import APIError
+
+    def fetch(trip_id: int) -> Optional[BaseException]:
+        try:
+            data = client.download_trip_file(trip_id, file_format, priority=priority)
+        except Exception as exc:  # pylint: disable=broad-exception-caught
+            # Report the failure and carry on with the other trips.
+            return exc
+        # The body of an error response is not a trip file.
+        status = client.last_context.status
+        if status is not None and status >= 400:
+            return APIError(f"HTTP {status}: {data[:200].decode('utf8', 'replace')}")
+        _write_atomic(os.path.join(out, f"{trip_id}.{file_format}"), data)
+        return None
+
+    done: List[int] = []
+    failures: List[Tuple[int, BaseException]] = []
+    ids = list(trip_ids)
+    with ThreadPoolExecutor(max_workers=max(workers, 1)) as pool:
+        for trip_id, error in zip(ids, pool.map(fetch, ids)):
+            if error is None:
+                done.append(trip_id)
+            else:
+                failures.append((trip_id, error))
+                print(f"Trip {trip_id}: {error}", file=sys.stderr)
+    return done, failures
+
+
+def _download_trips(args: argparse.Namespace) -> int:
+    ids = args.ids or [line for line in sys.stdin.read().split() if line]
+    try:
+        trip_ids = [int(trip_id) for trip_id in ids]
+    except ValueError as exc:
+        raise SystemExit(f"pyrwgps: {exc}") from exc
+    out = _out_dir(args)
+    if not args.force:
+        trip_ids = [
+            trip_id
+            for trip_id in trip_ids
+            if not os.path.exists(os.path.join(out, f"{trip_id}.{args.format}"))
+        ]
+    client = _client(args)
+    done, failures = _download(client, trip_ids, out, args.format, args.concurrency)
+    print(f"Downloaded {len(done)} trips to {out}", file=sys.stderr)
+    return 1 if failures else 0
+
+
+def _wait_for_quota(client: Any, known: int) -> None:
+    """Hold a sync back until its estimated requests fit in the quota."""
+    # pylint: disable=import-outside-toplevel
+    from .quota import QuotaPlanner
+
+    planner = QuotaPlanner(client)
+    requests = planner.estimate_sync(known=known).requests
+    if not planner.fits(requests):
+        print(
+            f"Waiting for quota: sync needs about {requests} requests", file=sys.stderr
+        )
+    planner.defer(requests)
+
+
+def _draw_heatmap(client: Any, args: argparse.Namespace, trip_ids: List[int]) -> bool:
+    """Draw the trips not drawn yet into ``--heatmap``; False if any failed."""
+    # pylint: disable=import-outside-toplevel
+    from .heatmap import Heatmap
+
+    heatmap = Heatmap(os.path.expanduser(args.heatmap), zooms=args.heatmap_zooms)
+    drawn = heatmap.update(client, trip_ids, max_workers=args.concurrency)
+    for trip_id, error in heatmap.failed.items():
+        print(f"Trip {trip_id}: {error}", file=sys.stderr)
+    print(f"Drew {drawn} trips into {args.heatmap}", file=sys.stderr)
+    return not heatmap.failed
+
+
+def _sync(args: argparse.Namespace) -> int:
+    out = _out_dir(args)
+    state_path = os.path.join(out, SYNC_STATE)
+    try:
+        with open(state_path, encoding="utf8") as handle:
+            synced: Dict[str, Any] = json.load(handle)
+    except FileNotFoundError:
+        synced = {}
+    client = _client(args)
+    if client.quota is not None:
+        _wait_for_quota(client, known=len(synced))
+    current: Dict[str, Any] = {}
+    for trip in client.list(
+        "/api/v1/trips.json",
+        result_key="trips",
+        fields=["id", "updated_at"],
+        raw=True,
+        prefetch=max(args.concurrency - 1, 0),
+        priority="bulk",
+    ):
+        current[str(trip["id"])] = trip.get("updated_at")
+    stale = [
+        int(trip_id)
+        for trip_id, updated_at in current.items()
+        if synced.get(trip_id) != updated_at
+        or not os.path.exists(os.path.join(out, f"{trip_id}.{args.format}"))
+    ]
+    done, failures = _download(
+        client, stale, out, args.format, args.concurrency, priority="bulk"
+    )
+    for trip_id in done:
+        synced[str(trip_id)] = current[str(trip_id)]
+    _write_atomic(state_path, json.dumps(synced, sort_keys=True).encode("utf8"))
+    print(
+        f"Synced {len(done)} new or changed of {len(current)} trips to {out}",
+        file=sys.stderr,
+    )
+    if args.heatmap and not _draw_heatmap(client, args, [int(i) for i in current]):
+        return 1
+    return 1 if failures else 0
+
+
+COMMANDS = {
+    "list": _list,
+    "export": _export,
+    "download-trips": _download_trips,
+    "sync": _sync,
+}
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Run the ``pyrwgps`` command; return the exit status."""
+    args = build_parser().parse_args(argv)
+    try:
+        return COMMANDS[args.command](args)
+    except KeyboardInterrupt:
+        return 130
+    except BrokenPipeError:
+        # The reader went away (e.g. ``pyrwgps list ... | head``).
+        sys.stderr.close()
+        return 0
+    except Exception as exc:  # pylint: disable=broad-exception-caught
+        # One line instead of a traceback; the API error already says what failed.
+        print(f"pyrwgps: {exc}", file=sys.stderr)
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
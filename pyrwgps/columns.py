@@ -0,0 +1,152 @@
+"""Columnar results of list() walks for the ridewithgps package.
+
+Items are taken as raw JSON (``list(raw=True)``) and appended column by column
+as each page arrives, so no objects are built on the way to a table; only
+records with nested objects are copied, to flatten them. Values are collected
+in a list per column and typed when the walk ends: numeric columns come out as
+``array.array`` buffers, which to_frame() hands to pandas without copying::
+
+    columns = client.to_columns("/api/v1/trips.json", result_key="trips")
+    columns["distance"]  # array('d', [...])
+
+    frame = client.list_frame("/api/v1/trips.json", result_key="trips")
+"""
+
+import math
+from array import array
+from typing import Any, Dict, Iterable, List, Optional, Union
+
+from .projection import flatten as flatten_record
+
+Column = Union["array[Any]", List[Any]]
+
+_NONE = type(None)
+_INTS = {int}
+_FLOATS = ({float}, {int, float})
+
+
+def typed_column(values: List[Any]) -> Column:
+    """Return ``values`` as the narrowest column that holds them.
+
+    Integers become ``array('q')``; floats, or integers with missing values,
+    become ``array('d')`` with NaN for the missing ones (as in pandas).
+    Anything else (strings, booleans, mixed types, nested values) stays a
+    list, with None for missing values.
+    """
+    kinds = set(map(type, values))
+    missing = _NONE in kinds
+    kinds.discard(_NONE)
+    if kinds == _INTS and not missing:
+        try:
+            return array("q", values)
+        except OverflowError:
+            return values
+    if kinds == _INTS or kinds in _FLOATS:
+        if missing:
+            values = [math.nan if v is None else v for v in values]
+        return array("d", values)
+    return values
+
+
+class ColumnBuilder:
+    """Accumulates batches of raw JSON records into columns.
+
+    Columns appear in the order their fields are first seen; a record without
+    a field gets None (NaN once typed) in that column.
+
+    Args:
+        flatten: Spread nested objects into dotted columns (``user.name``);
+            otherwise they are kept whole in an object column.
+    """
+
+    def __init__(self, flatten: bool = True):
+        self.flatten = flatten
+        self.rows = 0
+        self._values: Dict[str, List[Any]] = {}
+
+    def __len__(self) -> int:
+        return self.rows
+
+    def add(self, records: Iterable[Dict[str, Any]]) -> None:
+        """Append records; an iterator (such as a list() walk) is consumed as it yields."""
+        values = self._values
+        start = self.rows
+        rows = start
+        for record in records:
+            if self.flatten and any(isinstance(v, dict) for v in record.values()):
+                record = flatten_record(record)
+            for name, value in record.items():
+                column = values.get(name)
+                if column is None:
+                    column = values[name] = [None] * rows
+                elif len(column) < rows:
+                    column.extend([None] * (rows - len(column)))
+                column.append(value)
+            rows += 1
+        self.rows = rows
+        if rows > start:
+            for column in values.values():
+                if len(column) < rows:
+                    column.extend([None] * (rows - len(column)))
+
+    def build(self) -> Dict[str, Column]:
+        """Return the typed columns; see typed_column()."""
+        return {name: typed_column(values) for name, values in self._values.items()}
+
+
+def to_columns(
+    client: Any,
+    path: str,
+    *,
+    result_key: str = "results",
+    flatten: bool = True,
+    **list_kwargs: Any,
+) -> Dict[str, Column]:
+    """
+    Walk ``client.list(path, ...)`` into a dict of columns.
+
+    Args:
+        client: A RideWithGPS client.
+        path: List endpoint, v1 or legacy.
+        result_key: Root key of the items in each page.
+        flatten: Spread nested objects into dotted columns.
+        **list_kwargs: Passed to list(), e.g. ``params``, ``limit``, ``fields``
+            or ``prefetch``.
+
+    Returns:
+        Column name to ``array.array`` (numeric columns) or list.
+    """
+    builder = ColumnBuilder(flatten=flatten)
+    builder.add(client.list(path, result_key=result_key, raw=True, **list_kwargs))
+    return builder.build()
+
+
+def to_frame(columns: Dict[str, Column], index: Optional[str] = None) -> Any:
+    """Return ``columns`` as a pandas DataFrame.
+
+    Numeric columns are passed as NumPy views of their arrays with
+    ``copy=False``, so the frame shares their memory.
+    """
+    try:
+        # pylint: disable=import-outside-toplevel
+        import numpy
+        import pandas
+    except ImportError as exc:
+        raise ImportError(
+            "list_frame() needs pandas: pip install 'pyrwgps[frame]'"
+        ) from exc
+    data = {
+        name: (
+            numpy.frombuffer(values, dtype=values.typecode)
+            if isinstance(values, array)
+            else values
+        )
+        for name, values in columns.items()
+    }
+    frame = pandas.DataFrame(data, copy=False)
+    if index is not None:
+        frame = frame.set_index(index)
+    return frame
+
+
+__all__ = ["ColumnBuilder", "to_columns", "to_frame", "typed_column"]
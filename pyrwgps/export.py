@@ -0,0 +1,325 @@
+"""Streaming export of list() results for the ridewithgps package.
+
+Pages are written as they arrive, straight from the parsed JSON, in batches of
+``batch_size`` records, so memory stays bounded however long the walk and no
+``SimpleNamespace`` objects are ever built::
+
+    client.export("/api/v1/trips.json", "trips.parquet", result_key="trips")
+
+NDJSON and CSV need nothing beyond the standard library; Parquet and Arrow IPC
+files need ``pyarrow`` (``pip install 'pyrwgps[export]'``).
+"""
+
+import csv
+import json
+import os
+from typing import IO, Any, Dict, List, Optional, Sequence, Union
+
+from .projection import flatten
+
+Destination = Union[str, "os.PathLike[str]", IO]
+
+# File suffixes recognised when export() is not given a format.
+FORMATS = {
+    ".ndjson": "ndjson",
+    ".jsonl": "ndjson",
+    ".csv": "csv",
+    ".parquet": "parquet",
+    ".pq": "parquet",
+    ".arrow": "arrow",
+    ".feather": "arrow",
+    ".ipc": "arrow",
+}
+
+
+def _require_pyarrow():
+    """Import pyarrow, or explain how to install it."""
+    try:
+        # pylint: disable=import-outside-toplevel
+        import pyarrow
+        import pyarrow.ipc  # noqa: F401  # pylint: disable=unused-import
+        import pyarrow.parquet  # noqa: F401  # pylint: disable=unused-import
+    except ImportError as exc:
+        raise ImportError(
+            "Parquet and Arrow export need pyarrow: pip install 'pyrwgps[export]'"
+        ) from exc
+    return pyarrow
+
+
+def _scalar(value: Any) -> Any:
+    """Encode lists and objects left after flattening as JSON text."""
+    if isinstance(value, (list, dict)):
+        return json.dumps(value, separators=(",", ":"), ensure_ascii=False)
+    return value
+
+
+class Sink:
+    """Receives batches of raw JSON records and writes them out.
+
+    Sinks given a path open (and close) the file themselves; sinks given an
+    open file leave closing it to the caller.
+    """
+
+    binary = False
+
+    def __init__(self, destination: Destination):
+        if isinstance(destination, (str, os.PathLike)):
+            mode = "wb" if self.binary else "w"
+            encoding = None if self.binary else "utf8"
+            newline = None if self.binary else ""
+            # pylint: disable-next=consider-using-with
+            self._file: IO = open(destination, mode, encoding=encoding, newline=newline)
+            self._owned = True
+        else:
+            self._file = destination
+            self._owned = False
+        self.rows = 0
+
+    def write_batch(self, rows: List[Dict[str, Any]]) -> None:
+        """Write one batch of records."""
+        raise NotImplementedError
+
+    def close(self) -> None:
+        """Flush and, if this sink opened it, close the destination."""
+        if self._owned:
+            self._file.close()
+        else:
+            self._file.flush()
+
+    def __enter__(self) -> "Sink":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+class NDJSONSink(Sink):
+    """Writes one JSON object per line, exactly as the API returned it."""
+
+    def write_batch(self, rows: List[Dict[str, Any]]) -> None:
+        dumps = json.JSONEncoder(separators=(",", ":"), ensure_ascii=False).encode
+        self._file.write("".join(dumps(row) + "\n" for row in rows))
+        self.rows += len(rows)
+
+
+class CSVSink(Sink):
+    """Writes CSV with one column per (flattened) field.
+
+    Unless ``columns`` is given, the columns are the fields seen in the first
+    batch, in order; fields that only appear later are dropped. Nested objects
+    become dotted columns (``user.name``) and lists are written as JSON.
+
+    Args:
+        destination: Path or open text file.
+        columns: Fields to write, in order.
+    """
+
+    def __init__(
+        self, destination: Destination, columns: Optional[Sequence[str]] = None
+    ):
+        super().__init__(destination)
+        self.columns = list(columns) if columns is not None else None
+        self._writer: Optional[csv.DictWriter] = None
+
+    def write_batch(self, rows: List[Dict[str, Any]]) -> None:
+        flat = [flatten(row) for row in rows]
+        if self._writer is None:
+            if self.columns is None:
+                self.columns = list(dict.fromkeys(k for row in flat for k in row))
+            self._writer = csv.DictWriter(
+                self._file, fieldnames=self.columns, extrasaction="ignore"
+            )
+            self._writer.writeheader()
+        self._writer.writerows({k: _scalar(v) for k, v in row.items()} for row in flat)
+        self.rows += len(rows)
+
+
+class ParquetSink(Sink):
+    """Writes a Parquet file, one row group per batch.
+
+    Nested objects become dotted columns and lists are stored as JSON text, so
+    the schema stays flat. Unless ``schema`` (a ``pyarrow.Schema``) is given it
+    is inferred from the first batch, with all-null columns stored as strings;
+    later batches are cast to it, and a column that changes type in a lossy way
+    (e.g. a float in an integer column) raises ValueError.
+
+    Args:
+        destination: Path or open binary file.
+        schema: Arrow schema of the output.
+        compression: Parquet compression codec.
+    """
+
+    binary = True
+
+    def __init__(
+        self,
+        destination: Destination,
+        schema: Any = None,
+        compression: str = "snappy",
+    ):
+        self._pa = _require_pyarrow()
+        super().__init__(destination)
+        self.schema = schema
+        self.compression = compression
+        self._writer: Any = None
+
+    def _open_writer(self, schema: Any) -> Any:
+        return self._pa.parquet.ParquetWriter(
+            self._file, schema, compression=self.compression
+        )
+
+    def _table(self, rows: List[Dict[str, Any]]) -> Any:
+        pa = self._pa
+        table = pa.Table.from_pylist(
+            [{k: _scalar(v) for k, v in flatten(row).items()} for row in rows]
+        )
+        if self.schema is None:
+            self.schema = pa.schema(
+                [
+                    pa.field(f.name, pa.string()) if pa.types.is_null(f.type) else f
+                    for f in table.schema
+                ]
+            )
+        columns = []
+        for field in self.schema:
+            if field.name not in table.column_names:
+                columns.append(pa.nulls(len(table), field.type))
+                continue
+            column = table.column(field.name)
+            if column.type != field.type:
+                try:
+                    column = column.cast(field.type)
+                except (pa.ArrowInvalid, pa.ArrowNotImplementedError) as exc:
+                    raise ValueError(
+                        f"Column {field.name!r} changed type from {field.type} to "
+                        f"{column.type}; pass schema= to export it"
+                    ) from exc
+            columns.append(column)
+        return pa.Table.from_arrays(columns, schema=self.schema)
+
+    def write_batch(self, rows: List[Dict[str, Any]]) -> None:
+        table = self._table(rows)
+        if self._writer is None:
+            self._writer = self._open_writer(self.schema)
+        self._writer.write_table(table)
+        self.rows += len(rows)
+
+    def close(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
+        super().close()
+
+
+class ArrowSink(ParquetSink):
+    """Writes an Arrow IPC (Feather v2) file, one record batch per batch.
+
+    Schema handling is the same as ParquetSink's.
+    """
+
+    def __init__(self, destination: Destination, schema: Any = None):
+        super().__init__(destination, schema=schema)
+
+    def _open_writer(self, schema: Any) -> Any:
+        return self._pa.ipc.new_file(self._file, schema)
+
+
+SINKS = {
+    "ndjson": NDJSONSink,
+    "csv": CSVSink,
+    "parquet": ParquetSink,
+    "arrow": ArrowSink,
+}
+
+
+def format_of(destination: Destination) -> str:
+    """Guess the export format from the destination's file suffix."""
+    name = destination if isinstance(destination, (str, os.PathLike)) else None
+    name = name or getattr(destination, "name", "")
+    suffix = os.path.splitext(os.fspath(name))[1].lower() if name else ""
+    if suffix not in FORMATS:
+        raise ValueError(
+            f"Cannot tell the export format of {destination!r}; pass format= "
+            f"(one of {sorted(SINKS)})"
+        )
+    return FORMATS[suffix]
+
+
+def open_sink(
+    destination: Destination, format: Optional[str] = None, **options: Any
+) -> Sink:
+    """Return the sink for ``format`` (guessed from the file suffix if None)."""
+    # pylint: disable=redefined-builtin
+    format = format or format_of(destination)
+    if format not in SINKS:
+        raise ValueError(f"format must be one of {sorted(SINKS)}, got {format!r}")
+    return SINKS[format](destination, **options)
+
+
+def export(
+    client: Any,
+    path: str,
+    destination: Union[Destination, Sink],
+    *,
+    format: Optional[str] = None,
+    result_key: str = "results",
+    batch_size: int = 1000,
+    columns: Optional[Sequence[str]] = None,
+    schema: Any = None,
+    **list_kwargs: Any,
+) -> int:
+    """
+    Stream every item of ``client.list(path, ...)`` to a file.
+
+    Items are taken as raw JSON (``list(raw=True)``) and written in batches of
+    ``batch_size``, so memory use does not grow with the number of items.
+
+    Args:
+        client: A RideWithGPS client.
+        path: List endpoint, e.g. ``/api/v1/trips.json``.
+        destination: Path, open file, or a Sink.
+        format: ``ndjson``, ``csv``, ``parquet`` or ``arrow``; guessed from the
+            file suffix if omitted.
+        result_key: Root key of the items in each page.
+        batch_size: Records per write (and per Parquet row group).
+        columns: CSV columns to write.
+        schema: Arrow schema for Parquet and Arrow output.
+        **list_kwargs: Passed to list(), e.g. ``params``, ``limit``, ``fields``,
+            ``prefetch`` or ``cursor``.
+
+    Returns:
+        The number of records written.
+    """
+    # pylint: disable=too-many-arguments, redefined-builtin
+    if isinstance(destination, Sink):
+        sink = destination
+    else:
+        options: Dict[str, Any] = {}
+        if columns is not None:
+            options["columns"] = columns
+        if schema is not None:
+            options["schema"] = schema
+        sink = open_sink(destination, format, **options)
+    written = 0
+    with sink:
+        batch: List[Dict[str, Any]] = []
+        for item in client.list(path, result_key=result_key, raw=True, **list_kwargs):
+            batch.append(item)
+            if len(batch) >= batch_size:
+                sink.write_batch(batch)
+                written += len(batch)
+                batch = []
+        if batch:
+            sink.write_batch(batch)
+            written += len(batch)
+    return written
+
+
+__all__ = [
+    "ArrowSink",
+    "CSVSink",
+    "NDJSONSink",
+    "ParquetSink",
+    "Sink",
+    "export",
+    "open_sink",
+]
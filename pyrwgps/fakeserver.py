@@ -0,0 +1,410 @@
+"""In-process fake RideWithGPS server for offline end-to-end and load testing.
+
+The server implements just enough of the API for the client's own features:
+authentication, v1 ``page``/``page_size`` and legacy ``offset``/``limit``
+pagination, single resources (with v1 ``track_points``) and their v1 polylines,
+updates and deletes, and trip file downloads.
+Latency, payload size, 429 responses and server errors are configurable so
+that concurrency and rate limit behaviour can be measured without touching
+the real API::
+
+    with FakeRideWithGPS(trips=5000, latency=0.02) as server:
+        client = server.client(apikey="fake")
+        for trip in client.list("/api/v1/trips.json", result_key="trips"):
+            ...
+"""
+
+import json
+import math
+import random
+import re
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlencode, urlsplit
+
+from .polyline import encode
+
+_V1_COLLECTION = re.compile(r"^/api/v1/(trips|routes)\.json$")
+_V1_MEMBER = re.compile(r"^/api/v1/(trips|routes)/(\d+)\.json$")
+_LEGACY_COLLECTION = re.compile(r"^/users/(\d+)/(trips|routes)\.json$")
+_LEGACY_MEMBER = re.compile(r"^/(trips|routes)/(\d+)(?:\.json)?$")
+_TRIP_FILE = re.compile(r"^/trips/(\d+)\.(gpx|tcx|kml)$")
+_V1_POLYLINE = re.compile(r"^/api/v1/(trips|routes)/(\d+)/polyline\.json$")
+
+_SINGULAR = {"trips": "trip", "routes": "route"}
+
+
+class FakeRideWithGPS:
+    """A threaded HTTP server that imitates the RideWithGPS API.
+
+    Args:
+        trips: Number of trips on the fake account.
+        routes: Number of routes on the fake account.
+        user_id: ID of the fake authenticated user.
+        latency: Seconds to wait before answering each request.
+        jitter: Extra random latency, up to this many seconds.
+        item_latency: Extra seconds per item on list pages, so big pages are slow.
+        padding: Length of the filler ``description`` on each trip and route,
+            to imitate heavy payloads.
+        track_points: Number of points in downloaded trip files and polylines.
+        rate_limit_rate: Fraction of requests answered with ``429``.
+        failure_rate: Fraction of requests answered with ``500``.
+        degraded: Regular expression of paths answered with ``503``, to
+            imitate an outage of some endpoints; can be changed while running.
+        max_page_size: Largest v1 ``page_size`` the server honours.
+        seed: Seed for the random number generator behind jitter and injection.
+    """
+
+    # pylint: disable=too-many-instance-attributes, too-many-arguments
+
+    def __init__(
+        self,
+        *,
+        trips: int = 250,
+        routes: int = 50,
+        user_id: int = 1,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        item_latency: float = 0.0,
+        padding: int = 0,
+        track_points: int = 100,
+        rate_limit_rate: float = 0.0,
+        failure_rate: float = 0.0,
+        degraded: Optional[str] = None,
+        max_page_size: int = 200,
+        seed: Optional[int] = None,
+    ):
+        self.user_id = user_id
+        self.latency = latency
+        self.jitter = jitter
+        self.item_latency = item_latency
+        self.padding = padding
+        self.track_points = track_points
+        self.rate_limit_rate = rate_limit_rate
+        self.failure_rate = failure_rate
+        self.degraded = degraded
+        self.max_page_size = max_page_size
+        self.requests: Counter = Counter()
+        self.statuses: Counter = Counter()
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.records: Dict[str, Dict[int, Dict[str, Any]]] = {
+            "trips": {i: self._make_record("trips", i) for i in range(1, trips + 1)},
+            "routes": {i: self._make_record("routes", i) for i in range(1, routes + 1)},
+        }
+        self._server: Optional[ThreadingHTTPServer] = None
+        self._thread: Optional[threading.Thread] = None
+        # Kept after stop(), for handlers still answering in-flight requests.
+        self._base_url = ""
+
+    # ------------------------------------------------------------------
+    # Lifecycle
+    # ------------------------------------------------------------------
+
+    def start(self) -> "FakeRideWithGPS":
+        """Start serving on a free localhost port in a background thread."""
+        handler = type("Handler", (_Handler,), {"fake": self})
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+        self._server.daemon_threads = True
+        self._base_url = f"http://127.0.0.1:{self._server.server_port}"
+        self._thread = threading.Thread(
+            target=self._server.serve_forever,
+            kwargs={"poll_interval": 0.05},
+            name="fake-ridewithgps",
+            daemon=True,
+        )
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        """Stop the server and wait for its thread to exit."""
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    @property
+    def url(self) -> str:
+        """Base URL of the running server, suitable for ``BASE_URL``."""
+        if self._server is None:
+            raise RuntimeError("FakeRideWithGPS is not running; call start() first")
+        return f"{self._base_url}/"
+
+    def client(self, **kwargs: Any):
+        """Return a RideWithGPS client pointed at this server."""
+        # pylint: disable=import-outside-toplevel
+        from .ridewithgps import RideWithGPS
+
+        client = RideWithGPS(**kwargs)
+        setattr(client, "BASE_URL", self.url)
+        return client
+
+    # ------------------------------------------------------------------
+    # Fake data
+    # ------------------------------------------------------------------
+
+    def _make_record(self, kind: str, item_id: int) -> Dict[str, Any]:
+        record: Dict[str, Any] = {
+            "id": item_id,
+            "name": f"Fake {_SINGULAR[kind]} {item_id}",
+            "user_id": self.user_id,
+            "distance": 1000.0 + item_id * 37.5,
+            "elevation_gain": float(item_id % 700),
+            "created_at": "2026-01-01T00:00:00Z",
+            "updated_at": "2026-01-01T00:00:00Z",
+            "description": "x" * self.padding,
+        }
+        if kind == "trips":
+            record.update(
+                duration=3600 + item_id,
+                moving_time=3400 + item_id,
+                gear_id=None,
+                user={"id": self.user_id, "name": "Fake User"},
+            )
+        return record
+
+    def _track(self, item_id: int) -> List[Tuple[float, float]]:
+        """Points of a trip or route: a diagonal line, offset east by ID."""
+        return [
+            (40.0 + i * 1e-4, -75.0 + (item_id % 100) * 1e-3 + i * 1e-4)
+            for i in range(self.track_points)
+        ]
+
+    def _track_points(self, item_id: int) -> List[Dict[str, Any]]:
+        """v1 ``track_points``: the track with a point every 5 s, rolling
+        elevation, and heart rate and power readings."""
+        return [
+            {
+                "x": lng,
+                "y": lat,
+                "e": round(100 + 20 * math.sin(i / 25), 1),
+                "t": 1767225600 + 5 * i,
+                "h": 120 + i % 50,
+                "p": 150 + 2 * (i % 60),
+            }
+            for i, (lat, lng) in enumerate(self._track(item_id))
+        ]
+
+    def _trip_file(self, trip_id: int, file_format: str) -> Tuple[bytes, str]:
+        points = self._track(trip_id)
+        if file_format == "gpx":
+            body = "".join(f'<trkpt lat="{lat}" lon="{lng}"/>' for lat, lng in points)
+            text = f'<?xml version="1.0"?><gpx><trk><trkseg>{body}</trkseg></trk></gpx>'
+            return text.encode("utf8"), "application/gpx+xml"
+        if file_format == "tcx":
+            body = "".join(
+                f"<Trackpoint><Position><LatitudeDegrees>{lat}</LatitudeDegrees>"
+                f"<LongitudeDegrees>{lng}</LongitudeDegrees></Position></Trackpoint>"
+                for lat, lng in points
+            )
+            text = (
+                '<?xml version="1.0"?><TrainingCenterDatabase><Activities><Activity>'
+                f"<Lap><Track>{body}</Track></Lap></Activity></Activities>"
+                "</TrainingCenterDatabase>"
+            )
+            return text.encode("utf8"), "application/vnd.garmin.tcx+xml"
+        coords = " ".join(f"{lng},{lat}" for lat, lng in points)
+        text = (
+            '<?xml version="1.0"?><kml><Placemark><LineString>'
+            f"<coordinates>{coords}</coordinates></LineString></Placemark></kml>"
+        )
+        return text.encode("utf8"), "application/vnd.google-earth.kml+xml"
+
+    # ------------------------------------------------------------------
+    # Request handling
+    # ------------------------------------------------------------------
+
+    def _inject(self) -> Optional[int]:
+        """Sleep for the configured latency and pick an injected error status."""
+        with self._lock:
+            jitter = self._random.uniform(0, self.jitter) if self.jitter else 0.0
+            roll = self._random.random()
+        if self.latency or jitter:
+            time.sleep(self.latency + jitter)
+        if roll < self.rate_limit_rate:
+            return 429
+        if roll < self.rate_limit_rate + self.failure_rate:
+            return 500
+        return None
+
+    def handle(
+        self, method: str, path: str, query: Dict[str, str], body: Dict[str, Any]
+    ) -> Tuple[int, Any, str]:
+        """Route one request; return ``(status, payload, content_type)``."""
+        # pylint: disable=too-many-return-statements, too-many-locals, too-many-branches
+        with self._lock:
+            self.requests[(method, path)] += 1
+
+        injected = self._inject()
+        if self.degraded and re.search(self.degraded, path):
+            injected = 503
+        if injected == 429:
+            return 429, {"error": "Rate limit exceeded"}, "application/json"
+        if injected:
+            return injected, {"error": "Internal server error"}, "application/json"
+
+        if method == "POST" and path == "/api/v1/auth_tokens.json":
+            user = {"id": self.user_id, "name": "Fake User", "display_name": "FAKE"}
+            token = {"auth_token": "FAKE_TOKEN", "user": user}
+            return 200, {"auth_token": token}, "application/json"
+        if method == "POST" and path == "/oauth/token.json":
+            return 200, {"access_token": "FAKE_ACCESS_TOKEN"}, "application/json"
+        if method == "GET" and path == "/api/v1/users/current.json":
+            return (
+                200,
+                {"user": {"id": self.user_id, "name": "Fake User"}},
+                "application/json",
+            )
+
+        match = _TRIP_FILE.match(path)
+        if match and method == "GET":
+            trip_id = int(match.group(1))
+            if trip_id not in self.records["trips"]:
+                return 404, {"error": "Not found"}, "application/json"
+            data, content_type = self._trip_file(trip_id, match.group(2))
+            return 200, data, content_type
+
+        match = _V1_POLYLINE.match(path)
+        if match and method == "GET":
+            kind, item_id = match.group(1), int(match.group(2))
+            if item_id not in self.records[kind]:
+                return 404, {"error": "Not found"}, "application/json"
+            polyline = {
+                "parent_type": _SINGULAR[kind],
+                "parent_id": item_id,
+                "polyline": encode(self._track(item_id)),
+            }
+            return 200, {"polyline": polyline}, "application/json"
+
+        match = _V1_COLLECTION.match(path)
+        if match and method == "GET":
+            return 200, self._v1_page(match.group(1), path, query), "application/json"
+
+        match = _LEGACY_COLLECTION.match(path)
+        if match and method == "GET":
+            return 200, self._legacy_page(match.group(2), query), "application/json"
+
+        match = _V1_MEMBER.match(path)
+        if match:
+            kind, item_id = match.group(1), int(match.group(2))
+            status, payload, content_type = self._member(method, kind, item_id, body)
+            if status == 200 and method == "GET":
+                payload[_SINGULAR[kind]]["track_points"] = self._track_points(item_id)
+            return status, payload, content_type
+
+        match = _LEGACY_MEMBER.match(path)
+        if match:
+            return self._member(method, match.group(1), int(match.group(2)), body)
+
+        return 404, {"error": "Not found"}, "application/json"
+
+    def _sorted(self, kind: str):
+        with self._lock:
+            return [self.records[kind][k] for k in sorted(self.records[kind])]
+
+    def _slow(self, items: list) -> list:
+        """Sleep ``item_latency`` per item of a list page, then return it."""
+        if self.item_latency and items:
+            time.sleep(self.item_latency * len(items))
+        return items
+
+    def _v1_page(self, kind: str, path: str, query: Dict[str, str]) -> Dict[str, Any]:
+        page = max(int(query.get("page", 1)), 1)
+        page_size = min(max(int(query.get("page_size", 20)), 1), self.max_page_size)
+        records = self._sorted(kind)
+        page_count = max((len(records) + page_size - 1) // page_size, 1)
+        start = (page - 1) * page_size
+        next_page_url = None
+        if page < page_count:
+            next_query = {**query, "page": page + 1}
+            next_page_url = f"{self._base_url}{path}?{urlencode(next_query)}"
+        return {
+            kind: self._slow(records[start:][:page_size]),
+            "meta": {
+                "pagination": {
+                    "record_count": len(records),
+                    "page_count": page_count,
+                    "page_size": page_size,
+                    "next_page_url": next_page_url,
+                }
+            },
+        }
+
+    def _legacy_page(self, kind: str, query: Dict[str, str]) -> Dict[str, Any]:
+        offset = max(int(query.get("offset", 0)), 0)
+        limit = max(int(query.get("limit", 20)), 0)
+        records = self._sorted(kind)
+        return {
+            "results": self._slow(records[offset:][:limit]),
+            "results_count": len(records),
+        }
+
+    def _member(
+        self, method: str, kind: str, item_id: int, body: Dict[str, Any]
+    ) -> Tuple[int, Any, str]:
+        with self._lock:
+            record = self.records[kind].get(item_id)
+            if record is None:
+                return 404, {"error": "Not found"}, "application/json"
+            if method == "DELETE":
+                del self.records[kind][item_id]
+                return 204, b"", "application/json"
+            if method in ("PUT", "PATCH"):
+                changes = body.get(_SINGULAR[kind], body)
+                record.update(
+                    {k: v for k, v in changes.items() if k not in ("id", "user_id")}
+                )
+            return 200, {_SINGULAR[kind]: dict(record)}, "application/json"
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """HTTP adapter between http.server and FakeRideWithGPS.handle()."""
+
+    protocol_version = "HTTP/1.1"
+    # Headers and body go out in separate writes; without TCP_NODELAY a reused
+    # connection stalls ~40 ms on delayed ACKs and distorts latency measurements.
+    disable_nagle_algorithm = True
+    fake: FakeRideWithGPS
+
+    def _dispatch(self):
+        parts = urlsplit(self.path)
+        query = {k: v[-1] for k, v in parse_qs(parts.query).items()}
+        length = int(self.headers.get("Content-Length") or 0)
+        raw = self.rfile.read(length) if length else b""
+        try:
+            body = json.loads(raw) if raw else {}
+        except json.JSONDecodeError:
+            body = {}
+        status, payload, content_type = self.fake.handle(
+            self.command, parts.path, query, body if isinstance(body, dict) else {}
+        )
+        with self.fake._lock:  # pylint: disable=protected-access
+            self.fake.statuses[status] += 1
+        data = payload if isinstance(payload, bytes) else json.dumps(payload).encode()
+        try:
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+        except (BrokenPipeError, ConnectionResetError):
+            # The client gave up waiting (a timeout or deadline); drop the connection.
+            # pylint: disable-next=attribute-defined-outside-init
+            self.close_connection = True
+
+    do_GET = do_POST = do_PUT = do_PATCH = do_DELETE = _dispatch
+
+    def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+        """Keep test and benchmark output quiet."""
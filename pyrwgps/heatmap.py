@@ -0,0 +1,423 @@
+"""Heatmap tiles from route and trip polylines for the ridewithgps package.
+
+Rasterises polylines into slippy-map tiles (the ``{z}/{x}/{y}`` scheme web
+maps use), counting how many trips pass through each pixel::
+
+    from pyrwgps.heatmap import Heatmap
+
+    heatmap = Heatmap("heatmap/", zooms=(10, 12, 14))
+    heatmap.update(client, processes=4)     # draws trips not drawn yet
+    png = heatmap.png(12, 852, 1550)        # or heatmap.tile(12, 852, 1550)
+
+Lines are drawn for all segments of a batch of polylines at once, sampling
+each segment once per pixel it crosses; a trip counts once per pixel however
+often it passes. Batches can be drawn in worker processes, and each tile's
+counts are a uint32 ``.npy`` file updated in place through a memory map, so
+the heatmap grows as trips arrive and only touched tiles are written.
+
+A trip is drawn once: changing or deleting it later does not update the
+counts. Needs numpy (``pip install 'pyrwgps[geo]'``).
+"""
+
+import json
+import math
+import os
+import struct
+import zlib
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import (
+    Any,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+)
+
+try:
+    import numpy as np
+except ImportError as exc:  # pragma: no cover - depends on the environment
+    raise ImportError(
+        "pyrwgps.heatmap needs numpy: pip install 'pyrwgps[geo]'"
+    ) from exc
+
+from .polyline import Point, decode
+
+# An encoded polyline string, or decoded (lat, lng) points.
+Polyline = Union[str, Sequence[Point]]
+
+# Web Mercator cuts off the poles here.
+MAX_LATITUDE = 85.05112878
+
+# Segments longer than this many pixels are recording gaps (a GPS jump, a
+# train ride); only their end points are drawn.
+MAX_SEGMENT = 2048
+
+STATE_FILE = "heatmap.json"
+
+
+def _world_pixels(lat: Any, lng: Any, zoom: int, tile_size: int) -> Tuple[Any, Any]:
+    """Web Mercator pixel coordinates of points at ``zoom``."""
+    world = tile_size * 2**zoom
+    sin = np.sin(np.radians(np.clip(lat, -MAX_LATITUDE, MAX_LATITUDE)))
+    x = (np.asarray(lng) + 180.0) / 360.0 * world
+    y = (0.5 - np.log((1 + sin) / (1 - sin)) / (4 * math.pi)) * world
+    top = np.nextafter(world, 0)
+    return np.clip(x, 0, top), np.clip(y, 0, top)
+
+
+def rasterize(
+    polylines: Sequence[Any],
+    zoom: int,
+    tile_size: int = 256,
+    max_segment: float = MAX_SEGMENT,
+) -> Tuple[Any, Any]:
+    """
+    Draw polylines into one zoom level's pixel grid.
+
+    Args:
+        polylines: Encoded strings, ``(lat, lng)`` points or ``(n, 2)`` arrays.
+        zoom: Zoom level.
+        tile_size: Tile width in pixels.
+        max_segment: Longest segment drawn, in pixels.
+
+    Returns:
+        ``(pixels, counts)``: sorted int64 pixel numbers (``y * world + x`` in
+        world pixels) and how many of the polylines pass through each.
+    """
+    # pylint: disable=too-many-locals
+    tracks = [decode(line) if isinstance(line, str) else line for line in polylines]
+    tracks = [track for track in tracks if len(track)]
+    empty = np.zeros(0, dtype=np.int64)
+    if not tracks:
+        return empty, empty
+    lengths = np.array([len(track) for track in tracks])
+    owner = np.repeat(np.arange(len(tracks)), lengths)
+    points = np.concatenate([np.asarray(track, dtype=np.float64) for track in tracks])
+    x, y = _world_pixels(points[:, 0], points[:, 1], zoom, tile_size)
+
+    # One sample per pixel along each segment, from its start up to (but not
+    # including) its end; every point is also drawn, which closes each line.
+    joined = np.flatnonzero(owner[:-1] == owner[1:])
+    dx = x[joined + 1] - x[joined]
+    dy = y[joined + 1] - y[joined]
+    steps = np.ceil(np.maximum(np.abs(dx), np.abs(dy))).astype(np.int64)
+    steps[steps > max_segment] = 0
+    segment = np.repeat(np.arange(len(joined)), steps)
+    fraction = (
+        np.arange(len(segment)) - np.repeat(np.cumsum(steps) - steps, steps)
+    ) / np.repeat(np.maximum(steps, 1), steps)
+    start = joined[segment]
+    xs = np.concatenate([x[start] + dx[segment] * fraction, x])
+    ys = np.concatenate([y[start] + dy[segment] * fraction, y])
+    owners = np.concatenate([owner[start], owner])
+
+    world = tile_size * 2**zoom
+    pixels = ys.astype(np.int64) * world + xs.astype(np.int64)
+    order = np.lexsort((pixels, owners))
+    pixels, owners = pixels[order], owners[order]
+    first = np.ones(len(pixels), dtype=bool)
+    first[1:] = (pixels[1:] != pixels[:-1]) | (owners[1:] != owners[:-1])
+    pixels, counts = np.unique(pixels[first], return_counts=True)
+    return pixels, counts.astype(np.int64)
+
+
+def _rasterize_batch(
+    polylines: Sequence[Polyline], zooms: Sequence[int], tile_size: int
+) -> List[Tuple[Any, Any]]:
+    """Decode a batch once and draw it at every zoom; runs in worker processes."""
+    tracks = [
+        np.asarray(decode(line) if isinstance(line, str) else line, dtype=np.float64)
+        for line in polylines
+    ]
+    return [rasterize(tracks, zoom, tile_size) for zoom in zooms]
+
+
+def _batches(items: Iterable[Any], size: int) -> Iterator[List[Any]]:
+    batch: List[Any] = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _png_chunk(kind: bytes, data: bytes) -> bytes:
+    return (
+        struct.pack(">I", len(data))
+        + kind
+        + data
+        + struct.pack(">I", zlib.crc32(kind + data))
+    )
+
+
+def encode_png(rgba: Any) -> bytes:
+    """Encode an ``(height, width, 4)`` uint8 array as a PNG."""
+    height, width = rgba.shape[:2]
+    rows = np.zeros((height, width * 4 + 1), dtype=np.uint8)
+    rows[:, 1:] = rgba.reshape(height, width * 4)
+    header = struct.pack(">IIBBBBB", width, height, 8, 6, 0, 0, 0)
+    return (
+        b"\x89PNG\r\n\x1a\n"
+        + _png_chunk(b"IHDR", header)
+        + _png_chunk(b"IDAT", zlib.compress(rows.tobytes(), 6))
+        + _png_chunk(b"IEND", b"")
+    )
+
+
+class Heatmap:
+    """Per-pixel trip counts for a set of zoom levels, stored as tiles.
+
+    A directory holds ``heatmap.json`` (zoom levels, tile size and the IDs
+    already drawn) and one ``{z}/{x}/{y}.npy`` count grid per touched tile.
+    Opening an existing directory uses its stored zooms and tile size. One
+    process should update a heatmap at a time; any number can read tiles.
+
+    Args:
+        directory: Where the tiles go; created if missing.
+        zooms: Zoom levels to draw; each level has four times the pixels of
+            the one before.
+        tile_size: Tile width and height in pixels.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        zooms: Optional[Iterable[int]] = None,
+        tile_size: int = 256,
+    ):
+        self.directory = directory
+        zooms = None if zooms is None else tuple(sorted(zooms))
+        state_path = os.path.join(directory, STATE_FILE)
+        if os.path.exists(state_path):
+            with open(state_path, encoding="utf8") as handle:
+                state = json.load(handle)
+            self.zooms: Tuple[int, ...] = tuple(state["zooms"])
+            self.tile_size: int = state["tile_size"]
+            self.trips = set(state["trips"])
+        else:
+            self.zooms = zooms or (12,)
+            self.tile_size = tile_size
+            self.trips = set()
+        # IDs the last update() could not fetch, and why.
+        self.failed: Dict[int, BaseException] = {}
+        if zooms is not None and zooms != self.zooms:
+            raise ValueError(f"{directory} holds zoom levels {list(self.zooms)}")
+
+    def __repr__(self):
+        return f"Heatmap({self.directory!r}, zooms={list(self.zooms)}, trips={len(self.trips)})"
+
+    def __contains__(self, trip_id: object) -> bool:
+        return trip_id in self.trips
+
+    # ------------------------------------------------------------------
+    # Drawing
+    # ------------------------------------------------------------------
+
+    def add(self, trip_id: int, polyline: Polyline) -> bool:
+        """Draw one trip; returns False if it was already drawn."""
+        return self.add_many([(trip_id, polyline)]) == 1
+
+    def add_many(
+        self,
+        items: Iterable[Tuple[int, Polyline]],
+        *,
+        processes: Optional[int] = None,
+        batch_size: int = 256,
+    ) -> int:
+        """
+        Draw ``(trip_id, polyline)`` pairs, skipping trips already drawn.
+
+        Args:
+            items: Trip IDs with encoded polylines or ``(lat, lng)`` points.
+            processes: Draw batches in this many worker processes; by default
+                they are drawn in this one.
+            batch_size: Polylines drawn together, and sent to a worker at once.
+
+        Returns:
+            The number of trips drawn.
+        """
+        seen = set(self.trips)
+        fresh: List[Tuple[int, Polyline]] = []
+        for trip_id, polyline in items:
+            if trip_id not in seen:
+                seen.add(trip_id)
+                fresh.append((trip_id, polyline))
+        batches = list(_batches(fresh, max(batch_size, 1)))
+        polylines = [[line for _, line in batch] for batch in batches]
+        zooms = [self.zooms] * len(batches)
+        sizes = [self.tile_size] * len(batches)
+        if processes and len(batches) > 1:
+            with ProcessPoolExecutor(max_workers=processes) as pool:
+                for batch, drawn in zip(
+                    batches, pool.map(_rasterize_batch, polylines, zooms, sizes)
+                ):
+                    self._accumulate(batch, drawn)
+        else:
+            for batch, drawn in zip(
+                batches, map(_rasterize_batch, polylines, zooms, sizes)
+            ):
+                self._accumulate(batch, drawn)
+        return len(fresh)
+
+    def update(
+        self,
+        client: Any,
+        ids: Optional[Iterable[int]] = None,
+        *,
+        kind: str = "trips",
+        max_workers: int = 4,
+        processes: Optional[int] = None,
+        batch_size: int = 256,
+    ) -> int:
+        """
+        Fetch and draw the polylines of trips (or routes) not drawn yet.
+
+        Args:
+            client: A RideWithGPS client.
+            ids: IDs to draw; by default every item of ``/api/v1/{kind}.json``.
+            kind: ``"trips"`` or ``"routes"``.
+            max_workers: Polylines fetched at once; each fetch takes a rate limit slot.
+            processes: Worker processes for drawing, as in add_many().
+            batch_size: Polylines fetched, then drawn, per batch.
+
+        Returns:
+            The number of polylines drawn. Items that could not be fetched
+            (e.g. deleted ones) are skipped and listed in ``failed``.
+        """
+        # pylint: disable=too-many-arguments
+        if ids is None:
+            walk = client.list(
+                f"/api/v1/{kind}.json", result_key=kind, fields=["id"], raw=True
+            )
+            ids = (item["id"] for item in walk)
+        wanted = [item_id for item_id in ids if item_id not in self.trips]
+
+        def fetch(item_id: int) -> Optional[Tuple[int, Polyline]]:
+            try:
+                return item_id, client.get_polyline(kind, item_id, encoded=True)
+            except Exception as exc:  # pylint: disable=broad-exception-caught
+                # Skip the item and carry on with the others.
+                self.failed[item_id] = exc
+                return None
+
+        self.failed = {}
+        drawn = 0
+        with ThreadPoolExecutor(max_workers=max(max_workers, 1)) as pool:
+            for batch in _batches(wanted, max(batch_size, 1) * (processes or 1)):
+                fetched = (item for item in pool.map(fetch, batch) if item is not None)
+                drawn += self.add_many(
+                    fetched, processes=processes, batch_size=batch_size
+                )
+        return drawn
+
+    def _tile_path(self, zoom: int, x: int, y: int) -> str:
+        return os.path.join(self.directory, str(zoom), str(x), f"{y}.npy")
+
+    def _accumulate(
+        self, batch: List[Tuple[int, Polyline]], drawn: List[Tuple[Any, Any]]
+    ) -> None:
+        """Add a batch's pixel counts into the tile files, then record its trips."""
+        for zoom, (pixels, counts) in zip(self.zooms, drawn):
+            self._add_counts(zoom, pixels, counts)
+        self.trips.update(trip_id for trip_id, _ in batch)
+        self._save_state()
+
+    def _add_counts(self, zoom: int, pixels: Any, counts: Any) -> None:
+        # pylint: disable=too-many-locals
+        size = self.tile_size
+        world = size * 2**zoom
+        column, row = pixels % world, pixels // world
+        tile = (row // size) * (world // size) + column // size
+        local = (row % size) * size + column % size
+        order = np.argsort(tile, kind="stable")
+        tile, local, counts = tile[order], local[order], counts[order]
+        bounds = np.flatnonzero(np.diff(tile)) + 1
+        starts = np.concatenate([[0], bounds]).astype(np.int64)
+        ends = np.concatenate([bounds, [len(tile)]]).astype(np.int64)
+        for start, end in zip(starts, ends):
+            y, x = divmod(int(tile[start]), world // size)
+            grid = self._open_tile(zoom, x, y)
+            # Pixels are unique within a batch, so plain fancy-index adds work.
+            grid.reshape(-1)[local[start:end]] += counts[start:end].astype(np.uint32)
+            grid.flush()
+            del grid
+
+    def _open_tile(self, zoom: int, x: int, y: int) -> Any:
+        path = self._tile_path(zoom, x, y)
+        if os.path.exists(path):
+            return np.load(path, mmap_mode="r+")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        return np.lib.format.open_memmap(
+            path, mode="w+", dtype=np.uint32, shape=(self.tile_size, self.tile_size)
+        )
+
+    def _save_state(self) -> None:
+        state = {
+            "zooms": list(self.zooms),
+            "tile_size": self.tile_size,
+            "trips": sorted(self.trips),
+        }
+        path = os.path.join(self.directory, STATE_FILE)
+        os.makedirs(self.directory, exist_ok=True)
+        with open(path + ".part", "w", encoding="utf8") as handle:
+            json.dump(state, handle)
+        os.replace(path + ".part", path)
+
+    # ------------------------------------------------------------------
+    # Reading
+    # ------------------------------------------------------------------
+
+    def tiles(self, zoom: int) -> List[Tuple[int, int]]:
+        """The ``(x, y)`` of every tile with counts at ``zoom``, sorted."""
+        root = os.path.join(self.directory, str(zoom))
+        if not os.path.isdir(root):
+            return []
+        found = []
+        for x in os.listdir(root):
+            for name in os.listdir(os.path.join(root, x)):
+                if name.endswith(".npy"):
+                    found.append((int(x), int(name[:-4])))
+        return sorted(found)
+
+    def tile(self, zoom: int, x: int, y: int) -> Any:
+        """A tile's ``(tile_size, tile_size)`` counts, read-only; rows run north to south."""
+        path = self._tile_path(zoom, x, y)
+        if not os.path.exists(path):
+            return np.zeros((self.tile_size, self.tile_size), dtype=np.uint32)
+        return np.load(path, mmap_mode="r")
+
+    def png(
+        self,
+        zoom: int,
+        x: int,
+        y: int,
+        *,
+        saturate: Optional[int] = None,
+        color: Tuple[int, int, int] = (255, 64, 0),
+    ) -> bytes:
+        """
+        Render a tile as a transparent PNG for a map overlay.
+
+        Opacity grows with the logarithm of the count and is full at
+        ``saturate`` trips. Pass the same value for every tile so they match
+        at the seams; by default it is the tile's own maximum.
+        """
+        # pylint: disable=too-many-arguments, too-many-locals
+        counts = np.asarray(self.tile(zoom, x, y), dtype=np.float64)
+        top = float(saturate if saturate is not None else counts.max())
+        alpha = np.log1p(counts) / math.log1p(max(top, 1.0))
+        rgba = np.empty(counts.shape + (4,), dtype=np.uint8)
+        rgba[..., :3] = color
+        rgba[..., 3] = np.rint(np.clip(alpha, 0, 1) * 255)
+        return encode_png(rgba)
+
+    def tile_of(self, lat: float, lng: float, zoom: int) -> Tuple[int, int]:
+        """The ``(x, y)`` of the tile containing a point."""
+        x, y = _world_pixels(lat, lng, zoom, self.tile_size)
+        return int(x) // self.tile_size, int(y) // self.tile_size
@@ -0,0 +1,88 @@
+"""Request lifecycle hooks for the ridewithgps package."""
+
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+
+# Events fired by APIClient, in the order they occur for a single request.
+HOOK_EVENTS = (
+    "rate_limit_wait",
+    "cache_hit",
+    "before_request",
+    "response",
+    "handled",
+    "converted",
+    # Fired before sleeping ahead of a retry; ctx.attempt is the failed attempt.
+    "retry",
+)
+
+
+class RequestContext:
+    """Per-request state handed to every lifecycle hook.
+
+    All timestamps come from ``time.monotonic()``. ``timings`` maps each event
+    name to the moment it fired, so ``ctx.elapsed("response")`` is the time from
+    the start of the call until the response arrived.
+    """
+
+    # pylint: disable=too-many-instance-attributes, too-few-public-methods
+
+    __slots__ = (
+        "method",
+        "path",
+        "params",
+        "url",
+        "status",
+        "response_bytes",
+        "rate_limit_wait",
+        "priority",
+        "attempt",
+        "retry_after",
+        "timeout",
+        "deadline",
+        "started",
+        "timings",
+        "result",
+        "extra",
+    )
+
+    def __init__(self, method: str, path: str, params: Optional[dict] = None):
+        self.method = method.upper()
+        self.path = path
+        self.params = params
+        self.url: Optional[str] = None
+        self.status: Optional[int] = None
+        self.response_bytes: Optional[int] = None
+        self.rate_limit_wait = 0.0
+        # Rate limiter lane of the request; see pyrwgps.ratelimiter.PRIORITIES.
+        self.priority = "normal"
+        self.attempt = 0
+        self.retry_after: Optional[float] = None
+        # Per-call (connect, read) timeout, and the monotonic time the call must
+        # finish by; None means the client's timeout and no deadline.
+        self.timeout: Optional[Tuple[float, float]] = None
+        self.deadline: Optional[float] = None
+        self.started = time.monotonic()
+        self.timings: Dict[str, float] = {}
+        self.result: Any = None
+        self.extra: Dict[str, Any] = {}
+
+    def mark(self, event: str) -> float:
+        """Record the current monotonic time for ``event`` and return it."""
+        now = time.monotonic()
+        self.timings[event] = now
+        return now
+
+    def elapsed(self, event: Optional[str] = None) -> float:
+        """Seconds from the start of the call to ``event`` (or to now)."""
+        if event is None:
+            return time.monotonic() - self.started
+        return self.timings[event] - self.started
+
+    def __repr__(self):
+        return (
+            f"RequestContext(method={self.method!r}, path={self.path!r}, "
+            f"elapsed={self.elapsed():.4f})"
+        )
+
+
+Hook = Callable[[RequestContext], None]
@@ -0,0 +1,316 @@
+"""Resumable pagination state for RideWithGPS.list()."""
+
+import json
+from concurrent.futures import Future, ThreadPoolExecutor
+from itertools import islice
+from typing import Any, Callable, Dict, Iterable, Iterator, Optional, Tuple
+
+from .hooks import RequestContext
+
+DEFAULT_PAGE_SIZE = 100
+
+
+class ListCursor:
+    """Position of a list() walk, serializable for checkpoints.
+
+    ``offset`` is the index in the collection of the next item to fetch, so it
+    works for both the v1 API (``page = offset // page_size + 1``) and the
+    legacy API (``offset``). ``yielded`` counts the items already handed out,
+    which ``limit`` is counted against when a walk is resumed.
+
+    Save a cursor with ``to_json()`` and resume with::
+
+        cursor = ListCursor.from_json(saved)
+        for item in client.list(cursor.path, cursor=cursor):
+            ...
+    """
+
+    # pylint: disable=too-many-instance-attributes, too-many-arguments
+
+    __slots__ = (
+        "path",
+        "params",
+        "result_key",
+        "page_size",
+        "offset",
+        "yielded",
+        "done",
+    )
+
+    def __init__(
+        self,
+        path: str,
+        params: Optional[Dict[str, Any]] = None,
+        result_key: str = "results",
+        *,
+        page_size: int = DEFAULT_PAGE_SIZE,
+        offset: int = 0,
+        yielded: int = 0,
+        done: bool = False,
+    ):
+        self.path = path
+        self.params = dict(params or {})
+        self.result_key = result_key
+        self.page_size = page_size
+        self.offset = offset
+        self.yielded = yielded
+        self.done = done
+
+    @classmethod
+    def start(
+        cls, path: str, params: Optional[Dict[str, Any]], result_key: str
+    ) -> "ListCursor":
+        """Return the cursor for a new walk, honouring ``page``/``offset`` params."""
+        params = dict(params or {})
+        if "/api/v1/" in path:
+            page_size = int(params.pop("page_size", DEFAULT_PAGE_SIZE))
+            offset = (int(params.pop("page", 1)) - 1) * page_size
+            return cls(path, params, result_key, page_size=page_size, offset=offset)
+        offset = int(params.pop("offset", 0))
+        params.pop("limit", None)
+        return cls(path, params, result_key, offset=offset)
+
+    @property
+    def page(self) -> int:
+        """The v1 page holding the next item (1-based)."""
+        return self.offset // self.page_size + 1
+
+    def copy(self) -> "ListCursor":
+        """Return an independent copy of this cursor."""
+        return ListCursor.from_dict(self.to_dict())
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Return the cursor as a JSON-compatible dict."""
+        return {
+            "path": self.path,
+            "params": dict(self.params),
+            "result_key": self.result_key,
+            "page_size": self.page_size,
+            "offset": self.offset,
+            "yielded": self.yielded,
+            "done": self.done,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "ListCursor":
+        """Rebuild a cursor from to_dict() output."""
+        return cls(
+            data["path"],
+            data.get("params"),
+            data.get("result_key", "results"),
+            page_size=int(data.get("page_size", DEFAULT_PAGE_SIZE)),
+            offset=int(data.get("offset", 0)),
+            yielded=int(data.get("yielded", 0)),
+            done=bool(data.get("done", False)),
+        )
+
+    def to_json(self) -> str:
+        """Serialize the cursor to a JSON string."""
+        return json.dumps(self.to_dict(), sort_keys=True)
+
+    @classmethod
+    def from_json(cls, text: str) -> "ListCursor":
+        """Rebuild a cursor from to_json() output."""
+        return cls.from_dict(json.loads(text))
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, ListCursor):
+            return NotImplemented
+        return self.to_dict() == other.to_dict()
+
+    def __repr__(self):
+        return (
+            f"ListCursor(path={self.path!r}, offset={self.offset}, "
+            f"yielded={self.yielded}, done={self.done})"
+        )
+
+
+class ListIterator:
+    """Iterator returned by RideWithGPS.list().
+
+    ``cursor`` is a snapshot of the position just past the latest item yielded;
+    pass it back to list() to resume there.
+    """
+
+    def __init__(self, items: Iterator[Any], cursor: ListCursor):
+        self._items = items
+        self._cursor = cursor
+
+    def __iter__(self) -> "ListIterator":
+        return self
+
+    def __next__(self) -> Any:
+        return next(self._items)
+
+    @property
+    def cursor(self) -> ListCursor:
+        """A copy of the current position, safe to keep or serialize."""
+        return self._cursor.copy()
+
+    def close(self) -> None:
+        """Stop the walk; no further pages are requested."""
+        close = getattr(self._items, "close", None)
+        if close is not None:
+            close()
+
+
+class PageFetcher:
+    """Fetches list pages, optionally fetching upcoming ones in the background.
+
+    With ``depth`` > 0, prefetch() starts requests for up to ``depth`` pages on
+    background threads, so they download while the caller works through the
+    current page; get() then returns the prefetched response. Every request
+    still goes through ``fetch`` (normally ``client.get``), so the rate limiter
+    and the cache apply as usual.
+    """
+
+    def __init__(self, fetch: Callable[[Dict[str, Any]], Any], depth: int = 0):
+        self._fetch = fetch
+        self.depth = max(depth, 0)
+        self._pending: Dict[str, Future] = {}
+        self._pool: Optional[ThreadPoolExecutor] = None
+        if self.depth:
+            self._pool = ThreadPoolExecutor(
+                max_workers=self.depth, thread_name_prefix="pyrwgps-prefetch"
+            )
+
+    @staticmethod
+    def _key(params: Dict[str, Any]) -> str:
+        return json.dumps(params, sort_keys=True, default=str)
+
+    def get(self, params: Dict[str, Any]) -> Any:
+        """Return the response for ``params``, waiting for a prefetch if one is running."""
+        future = self._pending.pop(self._key(params), None)
+        if future is None:
+            return self._fetch(params)
+        return future.result()
+
+    def prefetch(self, upcoming: Iterable[Dict[str, Any]]) -> None:
+        """Start fetching the first ``depth`` of ``upcoming`` page params."""
+        if self._pool is None:
+            return
+        for params in islice(upcoming, self.depth):
+            key = self._key(params)
+            if key not in self._pending:
+                self._pending[key] = self._pool.submit(self._fetch, params)
+
+    def discard(self) -> None:
+        """Forget prefetches, e.g. after the page size changed; cancel unstarted ones."""
+        for future in self._pending.values():
+            future.cancel()
+        self._pending.clear()
+
+    def close(self) -> None:
+        """Cancel prefetches that have not started and wait for those in flight,
+        so no request outlives the walk (or the client it goes through)."""
+        self.discard()
+        if self._pool is not None:
+            self._pool.shutdown(wait=True, cancel_futures=True)
+
+
+class PageSizer:
+    """Adapts list() page sizes to observed response sizes and latency.
+
+    Bigger pages need fewer requests, which is what counts under a rate limit;
+    smaller pages keep memory and per-request latency in bounds. After each
+    full page the page size doubles while responses stay under ``max_bytes``
+    and ``max_latency`` and items per second keep improving, and is halved
+    until it fits when a response goes over either bound. Items per second are estimated as
+    ``items / max(latency, min_interval)``, where ``min_interval`` is the
+    spacing the client's rate limit enforces between requests.
+
+    Pass ``adaptive=PageSizer(...)`` (or ``adaptive=True`` for the defaults)
+    to list(). Each walk starts from its own copy, so one instance can be
+    reused.
+
+    Args:
+        min_size: Smallest page size to use.
+        max_size: Largest page size to try; servers may cap it further.
+        max_bytes: Largest response body, in bytes, to aim for.
+        max_latency: Slowest response, in seconds, to aim for.
+    """
+
+    # pylint: disable=too-many-instance-attributes
+
+    def __init__(
+        self,
+        *,
+        min_size: int = 10,
+        max_size: int = 1000,
+        max_bytes: int = 4_000_000,
+        max_latency: float = 5.0,
+    ):
+        self.min_size = min_size
+        self.max_size = max_size
+        self.max_bytes = max_bytes
+        self.max_latency = max_latency
+        self.min_interval = 0.0
+        self.size = min_size
+        self._ceiling: Optional[int] = None
+        self._grown: Optional[Tuple[int, float]] = None
+
+    def __repr__(self):
+        return (
+            f"PageSizer(min_size={self.min_size}, max_size={self.max_size}, "
+            f"max_bytes={self.max_bytes}, max_latency={self.max_latency})"
+        )
+
+    def start(self, page_size: int, min_interval: float = 0.0) -> "PageSizer":
+        """Return a fresh sizer for a walk starting at ``page_size``."""
+        sizer = PageSizer(
+            min_size=self.min_size,
+            max_size=self.max_size,
+            max_bytes=self.max_bytes,
+            max_latency=self.max_latency,
+        )
+        sizer.size = page_size
+        sizer.min_interval = min_interval
+        return sizer
+
+    def cap(self, size: int) -> None:
+        """Never go above ``size`` again, e.g. because the server caps pages there."""
+        self.max_size = min(self.max_size, size)
+        self.size = min(self.size, size)
+
+    def observe(self, size: int, served: int, ctx: Optional[RequestContext]) -> int:
+        """Record a page of ``served`` items requested at ``size``; return the next size.
+
+        Short pages and cache hits say nothing about the cost of a size and are
+        ignored.
+        """
+        if (
+            served < size
+            or ctx is None
+            or ctx.response_bytes is None
+            or "before_request" not in ctx.timings
+        ):
+            return self.size
+        latency = ctx.timings["response"] - ctx.timings["before_request"]
+        nbytes = ctx.response_bytes
+        rate = served / max(latency, self.min_interval, 1e-6)
+        grown, self._grown = self._grown, None
+        if nbytes > self.max_bytes or latency > self.max_latency:
+            # Halve (keeping v1 pages aligned) until the page should fit.
+            fit = size * min(
+                self.max_bytes / nbytes, self.max_latency / max(latency, 1e-6)
+            )
+            self._ceiling = size
+            while size > fit and size // 2 >= self.min_size:
+                size //= 2
+            self.size = size
+        elif grown is not None and grown[0] != size and rate < grown[1]:
+            # The bigger page moved fewer items per second; go back and stay.
+            self._ceiling = size
+            self.size = grown[0]
+        else:
+            bigger = min(self.max_size, size * 2)
+            if (
+                bigger > size
+                and (self._ceiling is None or bigger < self._ceiling)
+                and nbytes * bigger <= self.max_bytes * size
+            ):
+                self._grown = (size, rate)
+                self.size = bigger
+            else:
+                self.size = size
+        return self.size
@@ -0,0 +1,57 @@
+"""Encoded polyline codec for the ridewithgps package.
+
+The v1 ``/api/v1/routes/{id}/polyline.json`` and ``/api/v1/trips/{id}/polyline.json``
+endpoints return tracks in Google's encoded polyline format: latitude and
+longitude deltas at 1e-5 degree precision, packed into printable characters.
+"""
+
+from typing import List, Sequence, Tuple
+
+Point = Tuple[float, float]
+
+
+def decode(encoded: str, precision: int = 5) -> List[Point]:
+    """Decode an encoded polyline into ``(lat, lng)`` pairs."""
+    factor = 10.0**precision
+    points: List[Point] = []
+    lat = lng = 0
+    index = 0
+    length = len(encoded)
+    coords = [0, 0]
+    while index < length:
+        for axis in (0, 1):
+            shift = result = 0
+            while True:
+                byte = ord(encoded[index]) - 63
+                index += 1
+                result |= (byte & 0x1F) << shift
+                shift += 5
+                if byte < 0x20:
+                    break
+            coords[axis] = ~(result >> 1) if result & 1 else result >> 1
+        lat += coords[0]
+        lng += coords[1]
+        points.append((lat / factor, lng / factor))
+    return points
+
+
+def _encode_value(value: int, out: List[str]) -> None:
+    value = ~(value << 1) if value < 0 else value << 1
+    while value >= 0x20:
+        out.append(chr((0x20 | (value & 0x1F)) + 63))
+        value >>= 5
+    out.append(chr(value + 63))
+
+
+def encode(points: Sequence[Point], precision: int = 5) -> str:
+    """Encode ``(lat, lng)`` pairs as a polyline; the inverse of decode()."""
+    factor = 10**precision
+    out: List[str] = []
+    last_lat = last_lng = 0
+    for lat, lng in points:
+        lat_e = round(lat * factor)
+        lng_e = round(lng * factor)
+        _encode_value(lat_e - last_lat, out)
+        _encode_value(lng_e - last_lng, out)
+        last_lat, last_lng = lat_e, lng_e
+    return "".join(out)
@@ -0,0 +1,74 @@
+"""Field projection for API responses in the ridewithgps package."""
+
+from functools import lru_cache
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+# A compiled projection: field name -> sub-projection, or None to keep the whole value.
+FieldTree = Dict[str, Optional["FieldTree"]]
+
+
+def normalize_fields(fields: Iterable[str]) -> Tuple[str, ...]:
+    """Return ``fields`` as a sorted, de-duplicated tuple (hashable, order-free)."""
+    if isinstance(fields, str):
+        fields = (fields,)
+    return tuple(sorted(set(fields)))
+
+
+@lru_cache(maxsize=256)
+def compile_fields(fields: Tuple[str, ...]) -> FieldTree:
+    """Compile dotted field paths into a tree, e.g. ``("id", "user.name")`` to
+    ``{"id": None, "user": {"name": None}}``.
+
+    Selecting a field keeps its whole subtree, so ``("user", "user.name")``
+    keeps all of ``user``.
+    """
+    tree: FieldTree = {}
+    for field in fields:
+        node = tree
+        *parents, leaf = field.split(".")
+        for name in parents:
+            child = node.get(name, {})
+            if child is None:
+                break  # a parent is already kept whole
+            node[name] = child
+            node = child
+        else:
+            node[leaf] = None
+    return tree
+
+
+def project(data: Any, tree: Optional[FieldTree]) -> Any:
+    """Return ``data`` with only the fields selected by ``tree``.
+
+    Lists are projected item by item, so ``gear.name`` works whether ``gear`` is
+    one object or a list of them. Selected fields missing from ``data`` are left
+    out; values that are not objects are returned as they are.
+    """
+    if tree is None:
+        return data
+    if isinstance(data, dict):
+        return {
+            name: project(data[name], subtree)
+            for name, subtree in tree.items()
+            if name in data
+        }
+    if isinstance(data, list):
+        return [project(item, tree) for item in data]
+    return data
+
+
+def flatten(record: Dict[str, Any], sep: str = ".", prefix: str = "") -> Dict[str, Any]:
+    """Flatten nested objects into dotted keys.
+
+    ``{"id": 1, "user": {"id": 9, "name": "u"}}`` becomes
+    ``{"id": 1, "user.id": 9, "user.name": "u"}``. Lists and empty objects are
+    kept as values.
+    """
+    flat: Dict[str, Any] = {}
+    for key, value in record.items():
+        name = prefix + key
+        if isinstance(value, dict) and value:
+            flat.update(flatten(value, sep, name + sep))
+        else:
+            flat[name] = value
+    return flat
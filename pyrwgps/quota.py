@@ -0,0 +1,382 @@
+"""Hourly and daily request quotas for the ridewithgps package.
+
+The client's RateLimiter only sees a window of a second or so. A QuotaLedger
+counts every request per API key per hour and per day, in a JSON file that
+survives restarts and is shared by processes using the same key::
+
+    from pyrwgps.quota import QuotaLedger, QuotaPlanner
+
+    ledger = QuotaLedger("~/.cache/pyrwgps/quota.json", hourly=2000, daily=20000)
+    client = RideWithGPS(apikey="...", quota=ledger)
+
+    planner = QuotaPlanner(client)
+    cost = planner.estimate_list("/api/v1/trips.json", result_key="trips")
+    planner.defer(cost.requests)        # sleeps until the walk fits in the quota
+    for trip in client.list("/api/v1/trips.json", result_key="trips", priority="bulk"):
+        ...
+
+``reserve`` of each quota is kept for interactive and normal calls: bulk
+calls (``priority="bulk"``) are refused with QuotaExceededError once the rest
+is used. With ``pace_bulk=True`` bulk calls are also spread evenly over what
+is left of the hour and day instead of spending their share up front.
+
+Every request sent counts, so each retry attempt spends quota too.
+
+Counts are written every ``flush_interval`` seconds and on flush(), so other
+processes see them that late. Only a digest of each key is stored.
+"""
+
+import json
+import math
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows: no cross-process locking
+    fcntl = None  # type: ignore[assignment]
+
+from .pagination import DEFAULT_PAGE_SIZE
+from .ratelimiter import RateExceededError
+
+# Quota windows: name and length in seconds, aligned to UTC.
+WINDOWS: Tuple[Tuple[str, int], ...] = (("hour", 3600), ("day", 86400))
+
+
+class QuotaExceededError(Exception):
+    """Raised instead of a request that would exceed an hourly or daily quota.
+
+    Attributes:
+        window: ``"hour"`` or ``"day"``.
+        used: Requests counted in the window so far.
+        limit: Requests allowed in the window at the call's priority.
+        retry_after: Seconds until the window starts over.
+    """
+
+    def __init__(self, window: str, used: int, limit: int, retry_after: float):
+        super().__init__(
+            f"Request quota for this {window} used up ({used}/{limit}); "
+            f"resets in {retry_after:.0f}s"
+        )
+        self.window = window
+        self.used = used
+        self.limit = limit
+        self.retry_after = retry_after
+
+
+class QuotaLedger:
+    """Persistent per-key request counts with hourly and daily limits.
+
+    Args:
+        path: JSON file the counts are kept in; created if missing.
+        hourly: Requests allowed per clock hour (UTC), or None.
+        daily: Requests allowed per day (UTC), or None.
+        reserve: Fraction of each limit bulk calls may not use.
+        pace_bulk: Space out bulk calls so their remaining share lasts until
+            the end of the hour and the day.
+        flush_interval: Seconds between writes of the counts to ``path``.
+        clock: Returns the current time in seconds since the epoch.
+    """
+
+    # pylint: disable=too-many-instance-attributes
+
+    def __init__(
+        self,
+        path: str,
+        *,
+        hourly: Optional[int] = None,
+        daily: Optional[int] = None,
+        reserve: float = 0.2,
+        pace_bulk: bool = False,
+        flush_interval: float = 5.0,
+        clock: Callable[[], float] = time.time,
+    ):
+        # pylint: disable=too-many-arguments
+        self.path = os.path.expanduser(path)
+        self.limits = {"hour": hourly, "day": daily}
+        self.reserve = reserve
+        self.pace_bulk = pace_bulk
+        self.flush_interval = flush_interval
+        self.clock = clock
+        self._lock = threading.Lock()
+        # scope -> window -> [window index, count], as last read from disk
+        self._stored: Dict[str, Dict[str, list]] = {}
+        # (scope, window, window index) -> requests not yet written
+        self._pending: Dict[Tuple[str, str, int], int] = {}
+        self._next_bulk: Dict[str, float] = {}
+        self._flushed = clock()
+        self._sync()
+
+    def __repr__(self):
+        return (
+            f"QuotaLedger({self.path!r}, hourly={self.limits['hour']}, "
+            f"daily={self.limits['day']})"
+        )
+
+    # ------------------------------------------------------------------
+    # Counting
+    # ------------------------------------------------------------------
+
+    def _used(self, scope: str, window: str, index: int) -> int:
+        stored = self._stored.get(scope, {}).get(window)
+        base = stored[1] if stored and stored[0] == index else 0
+        return base + self._pending.get((scope, window, index), 0)
+
+    def limit(self, window: str, priority: str = "normal") -> Optional[int]:
+        """Requests allowed in ``window`` for calls of ``priority``."""
+        limit = self.limits[window]
+        if limit is None or priority != "bulk":
+            return limit
+        return int(limit * (1 - self.reserve))
+
+    def usage(self, scope: str) -> Dict[str, int]:
+        """Requests counted for ``scope`` in the current hour and day."""
+        now = self.clock()
+        with self._lock:
+            return {
+                window: self._used(scope, window, int(now // length))
+                for window, length in WINDOWS
+            }
+
+    def remaining(
+        self, scope: str, priority: str = "normal"
+    ) -> Dict[str, Optional[int]]:
+        """Requests ``scope`` may still make this hour and day (None: unlimited)."""
+        used = self.usage(scope)
+        remaining: Dict[str, Optional[int]] = {}
+        for window, _ in WINDOWS:
+            limit = self.limit(window, priority)
+            remaining[window] = None if limit is None else max(limit - used[window], 0)
+        return remaining
+
+    def spend(
+        self, scope: str, priority: str = "normal", timeout: Optional[float] = None
+    ) -> float:
+        """
+        Count one request for ``scope``, waiting first if bulk calls are paced.
+
+        Args:
+            scope: Whose quota to count against, e.g. a digest of the API key.
+            priority: The request's priority.
+            timeout: Longest pacing wait allowed, in seconds; None waits as long
+                as needed.
+
+        Returns:
+            Seconds spent pacing.
+
+        Raises:
+            QuotaExceededError: If the request would go over a quota.
+            RateExceededError: If pacing would wait longer than ``timeout``;
+                the request is not counted.
+        """
+        now = self.clock()
+        delay = 0.0
+        with self._lock:
+            windows = [
+                (window, length, int(now // length)) for window, length in WINDOWS
+            ]
+            for window, length, index in windows:
+                limit = self.limit(window, priority)
+                used = self._used(scope, window, index)
+                if limit is not None and used >= limit:
+                    raise QuotaExceededError(
+                        window, used, limit, (index + 1) * length - now
+                    )
+            if priority == "bulk" and self.pace_bulk:
+                delay = self._pace(scope, windows, now, timeout)
+            for window, _, index in windows:
+                key = (scope, window, index)
+                self._pending[key] = self._pending.get(key, 0) + 1
+            # Read the clock again: another thread may have synced since ``now``.
+            if self.clock() - self._flushed >= self.flush_interval:
+                self._sync()
+        if delay > 0:
+            time.sleep(delay)
+        return delay
+
+    def _pace(
+        self, scope: str, windows: list, now: float, timeout: Optional[float]
+    ) -> float:
+        """Reserve the next bulk start time for ``scope``; return the wait until it.
+
+        Nothing is reserved if the wait would be longer than ``timeout``.
+        """
+        interval = 0.0
+        for window, length, index in windows:
+            limit = self.limit(window, "bulk")
+            if limit is None:
+                continue
+            left = max(limit - self._used(scope, window, index), 1)
+            interval = max(interval, ((index + 1) * length - now) / left)
+        start = max(now, self._next_bulk.get(scope, now))
+        if timeout is not None and start - now > timeout:
+            raise RateExceededError(f"Paced bulk request would wait {start - now:.1f}s")
+        self._next_bulk[scope] = start + interval
+        return start - now
+
+    # ------------------------------------------------------------------
+    # Persistence
+    # ------------------------------------------------------------------
+
+    def flush(self) -> None:
+        """Write pending counts to disk and read other processes' counts."""
+        with self._lock:
+            self._sync()
+
+    def _sync(self) -> None:
+        """Merge pending counts into the file under a lock; call with _lock held."""
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(self.path + ".lock", "a", encoding="utf8") as lock:
+            if fcntl is not None:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                with open(self.path, encoding="utf8") as handle:
+                    scopes: Dict[str, Any] = json.load(handle).get("scopes", {})
+            except (FileNotFoundError, ValueError):
+                scopes = {}
+            if self._pending:
+                for (scope, window, index), count in self._pending.items():
+                    entry = scopes.setdefault(scope, {})
+                    stored = entry.get(window)
+                    if not stored or stored[0] < index:
+                        entry[window] = [index, count]
+                    elif stored[0] == index:
+                        stored[1] += count
+                partial = f"{self.path}.{os.getpid()}.part"
+                with open(partial, "w", encoding="utf8") as handle:
+                    json.dump({"scopes": scopes}, handle, sort_keys=True)
+                os.replace(partial, self.path)
+            self._pending = {}
+            self._stored = scopes
+        self._flushed = self.clock()
+
+
+class Estimate:
+    """Requests a job is expected to make.
+
+    Attributes:
+        items: Items the job will walk or fetch.
+        pages: List pages to fetch.
+        requests: Total requests, pages included.
+    """
+
+    # pylint: disable=too-few-public-methods
+
+    __slots__ = ("items", "pages", "requests")
+
+    def __init__(self, items: int, pages: int, requests: int):
+        self.items = items
+        self.pages = pages
+        self.requests = requests
+
+    def __repr__(self):
+        return (
+            f"Estimate(items={self.items}, pages={self.pages}, "
+            f"requests={self.requests})"
+        )
+
+
+class QuotaPlanner:
+    """Estimates what jobs cost and holds bulk jobs back until they fit.
+
+    Args:
+        client: A RideWithGPS client with a ``quota`` ledger.
+    """
+
+    def __init__(self, client: Any):
+        if client.quota is None:
+            raise ValueError("client has no quota ledger; pass quota= to the client")
+        self.client = client
+        self.ledger: QuotaLedger = client.quota
+
+    def estimate_list(
+        self,
+        path: str,
+        params: Optional[Dict[str, Any]] = None,
+        *,
+        result_key: str = "results",
+        limit: Optional[int] = None,
+        page_size: int = DEFAULT_PAGE_SIZE,
+    ) -> Estimate:
+        """
+        Estimate a list() walk from the collection's size.
+
+        Costs one request: a one-item page, whose pagination block (v1
+        ``record_count`` or legacy ``results_count``) gives the total.
+        """
+        # pylint: disable=too-many-arguments
+        params = dict(params or {})
+        if "/api/v1/" in path:
+            probe = {**params, "page": 1, "page_size": 1}
+        else:
+            probe = {**params, "offset": 0, "limit": 1}
+        data = self.client.get(path=path, params=probe, raw=True)
+        pagination = (data.get("meta") or {}).get("pagination") or {}
+        total = pagination.get("record_count", data.get("results_count"))
+        if total is None:
+            total = len(data.get(result_key) or [])
+        items = int(total) if limit is None else min(int(total), limit)
+        pages = max(math.ceil(items / page_size), 1)
+        return Estimate(items, pages, pages)
+
+    def estimate_sync(
+        self, downloads: Optional[int] = None, known: int = 0
+    ) -> Estimate:
+        """
+        Estimate ``pyrwgps sync``: the trip listing plus one download per new trip.
+
+        Args:
+            downloads: Trips expected to be downloaded, if known.
+            known: Otherwise, trips synced before; the rest are downloaded.
+        """
+        walk = self.estimate_list("/api/v1/trips.json", result_key="trips")
+        if downloads is None:
+            downloads = max(walk.items - known, 0)
+        return Estimate(walk.items, walk.pages, walk.pages + downloads)
+
+    def fits(self, requests: int, priority: str = "bulk") -> bool:
+        """True if ``requests`` more calls of ``priority`` fit in this hour and day."""
+        remaining = self.ledger.remaining(self.client.quota_scope(), priority)
+        return all(left is None or requests <= left for left in remaining.values())
+
+    def defer(
+        self, requests: int, priority: str = "bulk", max_wait: Optional[float] = None
+    ) -> float:
+        """
+        Sleep until ``requests`` calls of ``priority`` fit, at most ``max_wait`` seconds.
+
+        Returns:
+            Seconds slept.
+
+        Raises:
+            QuotaExceededError: If the job is larger than a whole window
+                allows, or would have to wait longer than ``max_wait``.
+        """
+        for window, length in WINDOWS:
+            limit = self.ledger.limit(window, priority)
+            if limit is not None and requests > limit:
+                raise QuotaExceededError(window, requests, limit, float(length))
+        slept = 0.0
+        while not self.fits(requests, priority):
+            now = self.ledger.clock()
+            remaining = self.ledger.remaining(self.client.quota_scope(), priority)
+            # Wait for the longest window that is short of room to start over.
+            short = []
+            for name, length in WINDOWS:
+                left = remaining[name]
+                if left is not None and left < requests:
+                    short.append((length, name))
+            length, window = max(short)
+            wait = (now // length + 1) * length - now
+            if max_wait is not None and slept + wait > max_wait:
+                used = self.ledger.usage(self.client.quota_scope())[window]
+                limit = self.ledger.limit(window, priority) or 0
+                raise QuotaExceededError(window, used, limit, wait)
+            time.sleep(wait)
+            slept += wait
+            self.ledger.flush()
+        return slept
@@ -1,71 +1,282 @@
 """Rate limiting utilities for the ridewithgps package."""
 
 import time
-from threading import Lock
-from typing import Optional
+from collections import deque
+from fnmatch import fnmatchcase
+from functools import lru_cache
+from threading import Condition, Lock
+from typing import Deque, Dict, FrozenSet, List, Mapping, Optional, Tuple
+
+# Priority lanes, highest first. Interactive calls are a person waiting on a
+# page; bulk calls are exports, syncs and other background walks.
+PRIORITIES = ("interactive", "normal", "bulk")
 
 
 class RateExceededError(Exception):
     """Exception raised when the rate limit is exceeded."""
 
 
-class RateLimiter:
-    """A simple thread-safe rate limiter."""
+class LaneStats:
+    """Wait-time counters of one priority lane."""
 
     # pylint: disable=too-few-public-methods
 
-    def __init__(self, max_messages: int = 10, every_seconds: int = 1):
+    __slots__ = ("acquired", "waited", "wait_total", "wait_max")
+
+    def __init__(self):
+        self.acquired = 0
+        self.waited = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def as_dict(self) -> Dict[str, float]:
+        """The counters, plus ``wait_mean`` over all acquisitions."""
+        return {
+            "acquired": self.acquired,
+            "waited": self.waited,
+            "wait_total": self.wait_total,
+            "wait_max": self.wait_max,
+            "wait_mean": self.wait_total / self.acquired if self.acquired else 0.0,
+        }
+
+
+class RateLimiter:
+    """A thread-safe rate limiter with priority lanes.
+
+    Callers that have to wait for a slot queue in the lane of their priority
+    (see PRIORITIES). Each free slot goes to the oldest caller of the highest
+    waiting priority, except that while bulk callers wait they get at least
+    ``bulk_share`` of the slots, so background jobs slow down but never stall.
+    """
+
+    # pylint: disable=too-many-instance-attributes
+
+    def __init__(
+        self,
+        max_messages: int = 10,
+        every_seconds: float = 1,
+        bulk_share: float = 0.1,
+    ):
         """
         Initialize the rate limiter.
 
         Args:
             max_messages: Maximum number of messages allowed per window.
             every_seconds: Length of the rate window in seconds.
+            bulk_share: Minimum fraction of slots given to waiting bulk
+                callers while higher priorities are queued too.
         """
         self.max_messages = max_messages
         self.every_seconds = every_seconds
+        self.bulk_share = bulk_share
         self.lock = Lock()
+        # The condition and the lanes are made when a caller first has to wait,
+        # so the many limiters of a ClientPool that never fill up stay small.
+        self._ready: Optional[Condition] = None
+        self._lanes: Dict[str, Deque[object]] = {}
+        self._queued = 0
+        # Slots granted while bulk callers were waiting, and how many went to bulk.
+        self._contended = 0
+        self._bulk_granted = 0
+        self._stats = {name: LaneStats() for name in PRIORITIES}
         self._reset_window()
 
+    @classmethod
+    def per_second(
+        cls, rate: float, burst: Optional[int] = None, bulk_share: float = 0.1
+    ) -> "RateLimiter":
+        """
+        A limiter averaging ``rate`` calls per second that lets ``burst`` of
+        them (default: one second's worth) go at once.
+        """
+        if burst is None:
+            burst = max(int(rate), 1)
+        return cls(burst, burst / rate, bulk_share)
+
     def _reset_window(self):
         """Reset the rate window."""
         self.window_num = 0
         self.window_time = time.time()
 
-    def acquire(self, block: bool = True, timeout: Optional[float] = None):
+    def _next_lane(self) -> Optional[Deque[object]]:
+        """The lane whose oldest caller gets the next slot."""
+        bulk = self._lanes.get("bulk")
+        if bulk and self._bulk_granted < self.bulk_share * self._contended:
+            return bulk
+        for name in PRIORITIES:
+            lane = self._lanes.get(name)
+            if lane:
+                return lane
+        return None
+
+    def _record(self, priority: str, waited: float) -> None:
+        stats = self._stats[priority]
+        stats.acquired += 1
+        if waited > 0:
+            stats.waited += 1
+            stats.wait_total += waited
+            stats.wait_max = max(stats.wait_max, waited)
+
+    def acquire(
+        self,
+        block: bool = True,
+        timeout: Optional[float] = None,
+        priority: str = "normal",
+    ) -> float:
         """
         Acquire permission to proceed, enforcing the rate limit.
 
         Args:
             block: If False, raise immediately if rate limit is exceeded.
             timeout: Maximum time to wait for a slot.
+            priority: One of PRIORITIES.
+
+        Returns:
+            Seconds spent waiting for the slot (0.0 if none was needed).
 
         Raises:
             RateExceededError: If the rate limit is exceeded and block is False or timeout reached.
         """
+        if priority not in PRIORITIES:
+            raise ValueError(
+                f"priority must be one of {PRIORITIES!r}, got {priority!r}"
+            )
         with self.lock:
             now = time.time()
-            if now - self.window_time > self.every_seconds:
+            if now - self.window_time >= self.every_seconds:
                 # New rate window
                 self._reset_window()
+            if not self._queued and self.window_num < self.max_messages:
+                self.window_num += 1
+                self._record(priority, 0.0)
+                return 0.0
+            if not block:
+                raise RateExceededError()
 
-            if self.window_num >= self.max_messages:
-                # Rate exceeding
-                if not block:
-                    raise RateExceededError()
+            start = now
+            if self._ready is None:
+                self._ready = Condition(self.lock)
+            ready = self._ready
+            lane = self._lanes.get(priority)
+            if lane is None:
+                lane = self._lanes[priority] = deque()
+            ticket = object()
+            lane.append(ticket)
+            self._queued += 1
+            try:
+                self._wait_turn(
+                    ready, lane, ticket, None if timeout is None else now + timeout
+                )
+            except BaseException:
+                lane.remove(ticket)
+                self._queued -= 1
+                ready.notify_all()
+                raise
 
-                wait_time = self.window_time + self.every_seconds - now
-                if timeout and wait_time > timeout:
-                    time.sleep(timeout)
-                    raise RateExceededError()
+            if self._lanes.get("bulk"):
+                self._contended += 1
+                self._bulk_granted += priority == "bulk"
+            lane.popleft()
+            self._queued -= 1
+            if not self._lanes.get("bulk"):
+                self._contended = self._bulk_granted = 0
+            self.window_num += 1
+            waited = time.time() - start
+            self._record(priority, waited)
+            # The next caller may still fit in this window.
+            ready.notify_all()
+        return waited
 
-                # Release lock while sleeping, then reacquire using 'with'
-                self.lock.release()
-                try:
-                    time.sleep(wait_time)
-                finally:
-                    # pylint: disable=consider-using-with
-                    self.lock.acquire()
+    def _wait_turn(
+        self,
+        ready: Condition,
+        lane: Deque[object],
+        ticket: object,
+        end: Optional[float],
+    ):
+        """Wait, holding the lock, until ``ticket`` is next and a slot is free."""
+        while True:
+            now = time.time()
+            if now - self.window_time >= self.every_seconds:
                 self._reset_window()
+            wait: Optional[float] = None
+            if self.window_num < self.max_messages:
+                if self._next_lane() is lane and lane[0] is ticket:
+                    return
+                # A slot is free but another caller is next in line.
+                ready.notify_all()
+            else:
+                wait = self.window_time + self.every_seconds - now
+            if end is not None:
+                if now >= end:
+                    raise RateExceededError()
+                wait = end - now if wait is None else min(wait, end - now)
+            ready.wait(wait)
 
-            self.window_num += 1
+    def wait_stats(self) -> Dict[str, Dict[str, float]]:
+        """Per-lane counters: slots ``acquired``, how many ``waited``, and wait seconds."""
+        with self.lock:
+            return {name: stats.as_dict() for name, stats in self._stats.items()}
+
+
+class RateBuckets:
+    """Rate limiters chosen by route pattern, with a default for the rest.
+
+    Each pattern is ``"[METHODS ]GLOB"``: optional methods separated by ``|``,
+    and a shell-style pattern for the path, e.g. ``"GET /api/v1/*"``,
+    ``"POST|PUT|PATCH|DELETE *"`` or ``"/trips/*.gpx"``. The first matching
+    pattern picks the limiter; matches are cached per method and path.
+
+    Args:
+        default: Limiter for requests no pattern matches.
+        buckets: Pattern to limiter, in the order they are tried. A limiter
+            may serve several patterns, or be shared with other clients.
+    """
+
+    def __init__(
+        self,
+        default: RateLimiter,
+        buckets: Optional[Mapping[str, RateLimiter]] = None,
+    ):
+        self.default = default
+        self.buckets: Dict[str, RateLimiter] = {}
+        self._rules: List[Tuple[Optional[FrozenSet[str]], str, RateLimiter]] = []
+        self.limiter_for = lru_cache(maxsize=4096)(self._match)
+        for pattern, limiter in (buckets or {}).items():
+            self.add(pattern, limiter)
+
+    def __len__(self) -> int:
+        return len(self._rules)
+
+    def add(self, pattern: str, limiter: RateLimiter) -> RateLimiter:
+        """Route requests matching ``pattern`` to ``limiter``, after the
+        patterns added before it."""
+        methods, sep, glob = pattern.strip().partition(" ")
+        if sep and methods.replace("|", "").isalpha() and methods.isupper():
+            allowed: Optional[FrozenSet[str]] = frozenset(methods.split("|"))
+        else:
+            allowed, glob = None, pattern.strip()
+        glob = glob.strip()
+        if not glob.startswith(("/", "*")):
+            glob = "/" + glob
+        self._rules.append((allowed, glob, limiter))
+        self.buckets[pattern] = limiter
+        self.limiter_for.cache_clear()
+        return limiter
+
+    def _match(self, method: str, path: str) -> RateLimiter:
+        """The limiter for a ``method`` request of ``path``; see limiter_for()."""
+        path = "/" + path.split("?", 1)[0].lstrip("/")
+        method = method.upper()
+        for allowed, glob, limiter in self._rules:
+            if (allowed is None or method in allowed) and fnmatchcase(path, glob):
+                return limiter
+        return self.default
+
+    def wait_stats(self) -> Dict[str, Dict[str, Dict[str, float]]]:
+        """RateLimiter.wait_stats() of every bucket, and of the default as ``"default"``."""
+        stats = {
+            pattern: limiter.wait_stats() for pattern, limiter in self.buckets.items()
+        }
+        stats["default"] = self.default.wait_stats()
+        return stats
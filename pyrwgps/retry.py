@@ -0,0 +1,81 @@
+"""Retry policy with exponential backoff for the ridewithgps package."""
+
+import random
+from typing import Iterable, Optional
+
+import urllib3
+
+from .ratelimiter import RateExceededError
+
+# HTTP statuses worth retrying: rate limited, or the server had a bad moment.
+TRANSIENT_STATUSES = frozenset((429, 500, 502, 503, 504))
+
+# Exceptions worth retrying: dropped connections, timeouts, local rate limit timeouts.
+TRANSIENT_ERRORS = (urllib3.exceptions.HTTPError, OSError, RateExceededError)
+
+# Methods that can be repeated without changing the outcome.
+IDEMPOTENT_METHODS = frozenset(("GET", "HEAD", "OPTIONS", "PUT", "DELETE"))
+
+
+class RetryPolicy:
+    """When and how long to wait before retrying a failed request.
+
+    Idempotent methods (GET, PUT, DELETE, and file downloads) are retried by
+    default. POST and PATCH are only retried when the caller opts in, e.g. by
+    passing an ``idempotency_key`` to ``post()``.
+
+    The delay before retry ``n`` is ``backoff_factor * 2 ** (n - 1)``, capped at
+    ``backoff_max``; with ``jitter`` a random value between half and all of it
+    is used, so concurrent workers do not retry in lockstep. A ``Retry-After``
+    header from the server takes precedence when it asks for longer.
+
+    Args:
+        total: Maximum number of retries after the first attempt.
+        backoff_factor: Base delay in seconds.
+        backoff_max: Upper bound for a single delay.
+        jitter: Randomise delays.
+        statuses: HTTP statuses that trigger a retry.
+        methods: Methods retried without opting in.
+    """
+
+    # pylint: disable=too-many-arguments
+
+    def __init__(
+        self,
+        *,
+        total: int = 3,
+        backoff_factor: float = 0.5,
+        backoff_max: float = 30.0,
+        jitter: bool = True,
+        statuses: Iterable[int] = TRANSIENT_STATUSES,
+        methods: Iterable[str] = IDEMPOTENT_METHODS,
+    ):
+        self.total = total
+        self.backoff_factor = backoff_factor
+        self.backoff_max = backoff_max
+        self.jitter = jitter
+        self.statuses = frozenset(statuses)
+        self.methods = frozenset(m.upper() for m in methods)
+
+    def __repr__(self):
+        return (
+            f"RetryPolicy(total={self.total}, backoff_factor={self.backoff_factor}, "
+            f"backoff_max={self.backoff_max})"
+        )
+
+    def allows(self, method: str, attempt: int, opted_in: bool = False) -> bool:
+        """True if a request that failed on ``attempt`` (1-based) may be retried."""
+        return attempt <= self.total and (opted_in or method.upper() in self.methods)
+
+    def retry_status(self, status: Optional[int]) -> bool:
+        """True if a response with ``status`` should be retried."""
+        return status in self.statuses
+
+    def backoff(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        """Seconds to wait before retrying after failed ``attempt`` (1-based)."""
+        delay = min(self.backoff_max, self.backoff_factor * (2 ** (attempt - 1)))
+        if self.jitter:
+            delay = random.uniform(delay / 2, delay)
+        if retry_after is not None:
+            delay = max(delay, min(retry_after, self.backoff_max))
+        return delay
@@ -1,11 +1,26 @@
 """Main RideWithGPS API client."""
 
 import json
+import time
 from types import SimpleNamespace
-from typing import Any, Dict, Optional
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
 from urllib.parse import urlencode
 
-from pyrwgps.apiclient import APIClient
+from pyrwgps.apiclient import (
+    APIClient,
+    APIError,
+    DeadlineExceededError,
+    TimeoutSpec,
+    deadline_after,
+)
+from pyrwgps.bulk import BulkReport, Change, bulk_update
+from pyrwgps.cache import ResponseCache, identity_scope
+from pyrwgps.pagination import ListCursor, ListIterator, PageFetcher, PageSizer
+from pyrwgps.polyline import decode as decode_polyline
+from pyrwgps.projection import normalize_fields
+
+# Page-level fields the paginators need, kept when list() projects items.
+_PAGINATION_FIELDS = ("meta.pagination", "results_count")
 
 
 class RideWithGPS(APIClient):
@@ -41,8 +56,8 @@ class RideWithGPS(APIClient):
         client_secret: Optional[str] = None,
         access_token: Optional[str] = None,
         version: int = 2,
-        cache: bool = False,
-        **kwargs: object,
+        cache: Union[bool, ResponseCache] = False,
+        **kwargs: Any,
     ):
         if apikey is None and client_id is None:
             raise ValueError(
@@ -137,6 +152,20 @@ class RideWithGPS(APIClient):
     # HTTP layer
     # ------------------------------------------------------------------
 
+    def _cache_scope(self, params=None) -> Optional[str]:
+        """Scope cached responses to the OAuth token, session token or API key
+        sent with the request; ``params`` may override the client's own."""
+        scope = super()._cache_scope(params)
+        if scope is not None:
+            return scope
+        if self._oauth:
+            return identity_scope(self.access_token)
+        return identity_scope(self.auth_token or self.apikey)
+
+    def quota_scope(self) -> str:
+        """Count quotas per API key, or per OAuth application."""
+        return identity_scope(self.apikey or self.client_id) or "default"
+
     def _compose_url(self, path, params=None):
         """For API key auth, inject apikey into every GET/DELETE URL."""
         if self._oauth:
@@ -262,13 +291,142 @@ class RideWithGPS(APIClient):
         """Make a DELETE request to the API and return a Python object."""
         return self.call(*args, path=path, params=params, method="DELETE", **kwargs)
 
+    def bulk_update(
+        self, changes: Iterable[Change], method: str = "PUT", **kwargs: Any
+    ) -> BulkReport:
+        """Apply many ``(path, params)`` changes concurrently; see pyrwgps.bulk.
+
+        Typical use is renaming or re-gearing trips through the legacy API::
+
+            report = client.bulk_update(
+                (f"/trips/{trip_id}.json", {"name": name}) for trip_id, name in renames
+            )
+            for failure in report.failed:
+                print(failure.path, failure.error)
+        """
+        return bulk_update(self, changes, method=method, **kwargs)
+
+    def export(self, path: str, destination: Any, **kwargs: Any) -> int:
+        """Stream a list() walk to an NDJSON, CSV, Parquet or Arrow file; see pyrwgps.export.
+
+        Returns the number of records written::
+
+            client.export("/api/v1/trips.json", "trips.parquet", result_key="trips")
+        """
+        # Imported here so plain API use never loads the export machinery.
+        from pyrwgps.export import export  # pylint: disable=import-outside-toplevel
+
+        return export(self, path, destination, **kwargs)
+
+    def to_columns(self, path: str, **kwargs: Any) -> Dict[str, Any]:
+        """Walk a list endpoint into typed columns; see pyrwgps.columns.
+
+        Numeric fields become ``array.array`` columns and, with ``flatten=True``
+        (the default), nested objects become dotted columns such as
+        ``user.name``. Other keyword arguments are passed to list().
+        """
+        # pylint: disable=import-outside-toplevel
+        from pyrwgps.columns import to_columns
+
+        return to_columns(self, path, **kwargs)
+
+    def list_frame(self, path: str, index: Optional[str] = None, **kwargs: Any) -> Any:
+        """Walk a list endpoint into a pandas DataFrame; see to_columns().
+
+        Needs pandas (``pip install 'pyrwgps[frame]'``)::
+
+            frame = client.list_frame("/api/v1/trips.json", result_key="trips", index="id")
+        """
+        # pylint: disable=import-outside-toplevel
+        from pyrwgps.columns import to_frame
+
+        return to_frame(self.to_columns(path, **kwargs), index=index)
+
+    def get_polyline(
+        self, kind: str, item_id: int, *, encoded: bool = False, **kwargs: Any
+    ) -> Union[str, List[Tuple[float, float]]]:
+        """Return the track of a route or trip as decoded ``(lat, lng)`` points.
+
+        Uses the v1 polyline endpoint (``GET /api/v1/{kind}/{id}/polyline.json``),
+        which is far smaller than the full detail or a GPX download.
+
+        Args:
+            kind: ``"routes"`` or ``"trips"``.
+            item_id: Numeric route or trip ID.
+            encoded: Return the encoded polyline string instead, e.g. to decode
+                it in another process.
+            **kwargs: Passed to get(), e.g. ``timeout`` or ``deadline``.
+
+        Raises:
+            APIError: If the response has no polyline, e.g. for a deleted or
+                private item.
+        """
+        if kind not in ("routes", "trips"):
+            raise ValueError(f"kind must be 'routes' or 'trips', got {kind!r}")
+        data = self.get(
+            path=f"/api/v1/{kind}/{item_id}/polyline.json", raw=True, **kwargs
+        )
+        polyline = data.get("polyline") if isinstance(data, dict) else None
+        if not isinstance(polyline, dict) or not isinstance(
+            polyline.get("polyline"), str
+        ):
+            ctx = self.last_context
+            status = None if ctx is None else ctx.status
+            error = data.get("error") if isinstance(data, dict) else None
+            raise APIError(
+                f"No polyline for {kind} {item_id} (HTTP {status}): "
+                f"{error or 'unexpected response'}"
+            )
+        polyline = polyline["polyline"]
+        return polyline if encoded else decode_polyline(polyline)
+
+    def get_pyramid(self, kind: str, item_id: int, **kwargs: Any) -> Any:
+        """Return a route's or trip's polyline simplified for each map zoom level.
+
+        With caching on, the pyramid is kept with the cached responses under the
+        route's (or trip's) ID, so serving a zoom level is a lookup, and a change
+        to the route through this client drops it like its other responses.
+        Needs numpy (``pip install 'pyrwgps[geo]'``); see pyrwgps.simplify.
+
+        Args:
+            kind: ``"routes"`` or ``"trips"``.
+            item_id: Numeric route or trip ID.
+            **kwargs: ``zooms`` and ``pixel_tolerance`` for LODPyramid; the
+                rest are passed to get_polyline().
+        """
+        # pylint: disable=import-outside-toplevel
+        from pyrwgps.simplify import DEFAULT_ZOOMS, LODPyramid
+
+        options = {
+            "zooms": tuple(sorted(kwargs.pop("zooms", DEFAULT_ZOOMS))),
+            "pixel_tolerance": kwargs.pop("pixel_tolerance", 1.0),
+        }
+        path = f"/api/v1/{kind}/{item_id}/pyramid"
+        key = self._cache_key(path, options)
+        if self._cache is not None and self.cache_enabled:
+            cached = self._cache.get(key)
+            if cached is not None:
+                return cached
+        pyramid = LODPyramid(self.get_polyline(kind, item_id, **kwargs), **options)
+        if self._cache is not None and self.cache_enabled:
+            self._cache.set(key, path, pyramid)
+        return pyramid
+
     # ------------------------------------------------------------------
     # File download
     # ------------------------------------------------------------------
 
     _DOWNLOAD_FORMATS = ("gpx", "tcx", "kml")
 
-    def download_trip_file(self, trip_id: int, file_format: str) -> bytes:
+    def download_trip_file(
+        self,
+        trip_id: int,
+        file_format: str,
+        timeout: Optional[TimeoutSpec] = None,
+        deadline: Optional[float] = None,
+        *,
+        priority: str = "normal",
+    ) -> bytes:
         """Download a trip as a raw file (GPX, TCX, or KML).
 
         File downloads are not available in the v1 API; this uses the legacy
@@ -277,16 +435,22 @@ class RideWithGPS(APIClient):
         Args:
             trip_id: Numeric trip ID.
             file_format: One of ``"gpx"``, ``"tcx"``, or ``"kml"``.
+            timeout: Connect/read timeout instead of the client's.
+            deadline: Seconds the download may take, including retries.
+            priority: Rate limiter lane, as for call().
 
         Returns:
             Raw file content as bytes.
         """
+        # pylint: disable=too-many-arguments
         if file_format not in self._DOWNLOAD_FORMATS:
             raise ValueError(
                 f"file_format must be one of {self._DOWNLOAD_FORMATS!r}, got {file_format!r}"
             )
         path = f"/trips/{trip_id}.{file_format}"
-        self.ratelimiter.acquire()
+        ctx = self._begin(
+            "GET", path, timeout=timeout, deadline=deadline, priority=priority
+        )
         if self._oauth:
             url = self._compose_url(path)
             headers: Dict[str, Any] = {}
@@ -300,62 +464,178 @@ class RideWithGPS(APIClient):
             headers = {"x-rwgps-api-key": self.apikey}
             if self.auth_token:
                 headers["x-rwgps-auth-token"] = self.auth_token
-        r = self._urlopen("GET", url, headers=headers)
+        r = self._send(ctx, lambda: self._urlopen("GET", url, headers=headers))
+        ctx.result = r.data
         return r.data
 
-    def _list_v1(self, path, params, limit, result_key, **kwargs):
-        """Yield items from a v1 API endpoint using page/page_size pagination."""
-        page_size = params.get("page_size", 100)
-        page = params.get("page", 1)
-        fetched = 0
+    def _get_page(self, path, params, end, **kwargs):
+        """GET one page of a list as raw JSON, within the time left before ``end``.
 
+        Returns:
+            The response dict and the RequestContext of the request.
+        """
+        if end is not None:
+            remaining = end - time.monotonic()
+            if remaining <= 0:
+                raise DeadlineExceededError(f"Deadline passed while listing {path}")
+            kwargs["deadline"] = remaining
+        response = self.get(path=path, params=params, raw=True, **kwargs)
+        if not isinstance(response, dict):
+            response = {}
+        return response, self.last_context
+
+    @staticmethod
+    def _upcoming_v1(params, page, size, needed, page_count):
+        """Params of the v1 pages after 0-based ``page``, for prefetching."""
+        page += 1
+        while (page_count is None or page < page_count) and (
+            needed is None or needed > 0
+        ):
+            yield {**params, "page": page + 1, "page_size": size}
+            page += 1
+            if needed is not None:
+                needed -= size
+
+    @staticmethod
+    def _upcoming_legacy(params, offset, size, needed, results_count):
+        """Params of the legacy pages starting at ``offset``, for prefetching."""
+        while (results_count is None or offset < results_count) and (
+            needed is None or needed > 0
+        ):
+            yield {
+                **params,
+                "offset": offset,
+                "limit": size if needed is None else min(size, needed),
+            }
+            offset += size
+            if needed is not None:
+                needed -= size
+
+    def _list_v1(self, cursor, limit, fetcher, sizer=None):
+        """Yield items from a v1 API endpoint using page/page_size pagination."""
+        # pylint: disable=too-many-branches, too-many-locals
         while True:
-            this_page_size = (
-                page_size if limit is None else min(page_size, limit - fetched)
+            remaining = None if limit is None else limit - cursor.yielded
+            if remaining is not None and remaining <= 0:
+                return
+            size = cursor.page_size
+            if cursor.offset == 0 and remaining is not None:
+                # Only the first page can shrink without shifting later pages.
+                size = min(size, remaining)
+            page, skip = divmod(cursor.offset, size)
+            response, ctx = fetcher.get(
+                {**cursor.params, "page": page + 1, "page_size": size}
             )
-            if limit is not None and this_page_size <= 0:
-                break
-            page_params = {**params, "page": page, "page_size": this_page_size}
-            response = self.get(path=path, params=page_params, **kwargs)
-            items = getattr(response, result_key, None)
-            if not items:
-                break
+            served = response.get(cursor.result_key)
+            if not served:
+                cursor.done = True
+                return
+            pagination = (response.get("meta") or {}).get("pagination") or {}
+            has_next = bool(pagination.get("next_page_url"))
+            if has_next and len(served) < size:
+                # The server capped page_size; number pages by its size from now on.
+                cursor.page_size = len(served)
+                fetcher.discard()
+                if sizer is not None:
+                    sizer.cap(len(served))
+                if page:
+                    continue  # this page was numbered by the larger size
+            elif sizer is not None:
+                resized = sizer.observe(size, len(served), ctx)
+                # Keep pages aligned: the next page must start on a page boundary.
+                if (
+                    resized != cursor.page_size
+                    and (page * size + len(served)) % resized == 0
+                ):
+                    cursor.page_size = resized
+                    fetcher.discard()
+            items = served[skip:]
+            if has_next:
+                fetcher.prefetch(
+                    self._upcoming_v1(
+                        cursor.params,
+                        page,
+                        cursor.page_size,
+                        None if remaining is None else remaining - len(items),
+                        pagination.get("page_count"),
+                    )
+                )
             for item in items:
+                cursor.offset += 1
+                cursor.yielded += 1
                 yield item
-                fetched += 1
-                if limit is not None and fetched >= limit:
+                if limit is not None and cursor.yielded >= limit:
                     return
-            pagination = getattr(getattr(response, "meta", None), "pagination", None)
-            if not getattr(pagination, "next_page_url", None):
-                break
-            page += 1
+            if not has_next:
+                cursor.done = True
+                return
 
-    def _list_legacy(self, path, params, limit, result_key, **kwargs):
+    def _list_legacy(self, cursor, limit, fetcher, sizer=None):
         """Yield items from a legacy API endpoint using offset/limit pagination."""
-        offset = params.get("offset", 0)
-        page_limit = 100
-        fetched = 0
-
         while True:
-            this_limit = (
-                page_limit if limit is None else min(page_limit, limit - fetched)
+            remaining = None if limit is None else limit - cursor.yielded
+            if remaining is not None and remaining <= 0:
+                return
+            size = (
+                cursor.page_size
+                if remaining is None
+                else min(cursor.page_size, remaining)
             )
-            if limit is not None and this_limit <= 0:
-                break
-            page_params = {**params, "offset": offset, "limit": this_limit}
-            response = self.get(path=path, params=page_params, **kwargs)
-            items = getattr(response, result_key, None)
+            response, ctx = fetcher.get(
+                {**cursor.params, "offset": cursor.offset, "limit": size}
+            )
+            items = response.get(cursor.result_key)
             if not items:
-                break
+                cursor.done = True
+                return
+            if sizer is not None:
+                resized = sizer.observe(size, len(items), ctx)
+                if resized != cursor.page_size:
+                    cursor.page_size = resized
+                    fetcher.discard()
+            results_count = response.get("results_count")
+            fetcher.prefetch(
+                self._upcoming_legacy(
+                    cursor.params,
+                    cursor.offset + len(items),
+                    cursor.page_size,
+                    None if remaining is None else remaining - len(items),
+                    results_count,
+                )
+            )
             for item in items:
+                cursor.offset += 1
+                cursor.yielded += 1
                 yield item
-                fetched += 1
-                if limit is not None and fetched >= limit:
+                if limit is not None and cursor.yielded >= limit:
                     return
-            offset += len(items)
-            results_count = getattr(response, "results_count", None)
-            if results_count is not None and offset >= results_count:
-                break
+            if results_count is not None and cursor.offset >= results_count:
+                cursor.done = True
+                return
+
+    def _walk(self, cursor, limit, deadline, *, prefetch, sizer, raw, **kwargs):
+        """Run the paginator for ``cursor``; the deadline starts on the first item.
+
+        Pages are fetched as raw JSON; items are turned into objects one at a
+        time as they are yielded, unless ``raw``.
+        """
+        # pylint: disable=too-many-arguments
+        if cursor.done:
+            return
+        end = deadline_after(deadline)
+        fetcher = PageFetcher(
+            lambda params: self._get_page(cursor.path, params, end, **kwargs),
+            prefetch,
+        )
+        paginator = self._list_v1 if "/api/v1/" in cursor.path else self._list_legacy
+        try:
+            if raw:
+                yield from paginator(cursor, limit, fetcher, sizer)
+            else:
+                for item in paginator(cursor, limit, fetcher, sizer):
+                    yield self._to_obj(item)
+        finally:
+            fetcher.close()
 
     def list(
         self,
@@ -363,8 +643,15 @@ class RideWithGPS(APIClient):
         params: Optional[dict] = None,
         limit: Optional[int] = None,
         result_key: str = "results",
+        *,
+        cursor: Optional[ListCursor] = None,
+        deadline: Optional[float] = None,
+        prefetch: int = 0,
+        adaptive: Union[bool, PageSizer] = False,
+        fields: Optional[Iterable[str]] = None,
+        raw: bool = False,
         **kwargs,
-    ):
+    ) -> ListIterator:
         """Yield up to `limit` items from a RideWithGPS list/search endpoint (auto-paginates).
 
         If limit is None, yield all available results.
@@ -372,8 +659,62 @@ class RideWithGPS(APIClient):
         Supports both the legacy API (offset/limit/results_count) and the v1 API
         (page/page_size/meta.pagination). For v1 endpoints (e.g. /api/v1/trips.json),
         pass the root key of the response as ``result_key`` (e.g. ``result_key="trips"``).
+
+        The returned iterator's ``cursor`` marks the position just past the latest
+        item. Pass a saved cursor back as ``cursor`` to resume a walk; its params
+        and result key are used, and ``limit`` counts the items yielded before.
+
+        ``deadline`` is a budget in seconds for the whole iteration, counted from
+        the first item requested and including rate limit waits and retries.
+        Once it has passed no further page is requested and DeadlineExceededError
+        is raised; items already yielded stay valid. Other keyword arguments
+        (e.g. ``timeout``) are passed to every page request.
+
+        With ``prefetch`` > 0, up to that many upcoming pages are fetched on
+        background threads while the caller works through the current one, so
+        a slow consumer and the network overlap. Prefetches take rate limit
+        slots and use the cache like any other request.
+
+        With ``adaptive=True`` (or a configured PageSizer) the page size is
+        tuned during the walk from observed response sizes and latency, to move
+        as many items per second as the rate limit allows while keeping each
+        response within bounds.
+
+        ``fields`` selects the (optionally dotted) item fields to keep, e.g.
+        ``["id", "name", "user.name"]``; other fields are dropped from each page
+        before any objects are built.
+
+        With ``raw=True`` items are yielded as parsed JSON dicts, skipping object
+        conversion entirely (see export()).
         """
-        if params is None:
-            params = {}
-        paginator = self._list_v1 if "/api/v1/" in path else self._list_legacy
-        yield from paginator(path, params, limit, result_key, **kwargs)
+        # pylint: disable=too-many-arguments
+        if cursor is None:
+            cursor = ListCursor.start(path, params, result_key)
+        elif cursor.path != path:
+            raise ValueError(f"cursor is for {cursor.path!r}, not {path!r}")
+        else:
+            cursor = cursor.copy()
+        if fields is not None:
+            kwargs["fields"] = [
+                f"{cursor.result_key}.{field}" for field in normalize_fields(fields)
+            ] + list(_PAGINATION_FIELDS)
+        sizer = None
+        if adaptive:
+            if not isinstance(adaptive, PageSizer):
+                adaptive = PageSizer()
+            limiter = self.rate_buckets.limiter_for("GET", path)
+            sizer = adaptive.start(
+                cursor.page_size, limiter.every_seconds / limiter.max_messages
+            )
+        return ListIterator(
+            self._walk(
+                cursor,
+                limit,
+                deadline,
+                prefetch=prefetch,
+                sizer=sizer,
+                raw=raw,
+                **kwargs,
+            ),
+            cursor,
+        )
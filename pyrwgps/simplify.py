@@ -0,0 +1,229 @@
+"""Polyline simplification and level-of-detail pyramids for the ridewithgps package.
+
+Long tracks have far more points than a zoomed-out map can show::
+
+    from pyrwgps.simplify import LODPyramid, douglas_peucker
+
+    points = client.get_polyline("routes", 123)
+    douglas_peucker(points, tolerance=10)      # points at most 10 m off the track
+
+    pyramid = client.get_pyramid("routes", 123)  # cached with the client's responses
+    pyramid.at(10)                               # points to draw at zoom 10
+    pyramid.encoded(10)                          # the same, as an encoded polyline
+
+Both simplifiers work on all points of a level at once rather than one point
+at a time, in metres on a local equirectangular projection. Douglas-Peucker
+ranks every point once by the tolerance at which it would be dropped, so a
+pyramid's levels are selections from that ranking. Needs numpy
+(``pip install 'pyrwgps[geo]'``).
+"""
+
+import math
+from bisect import bisect_left
+from typing import Any, Dict, Iterable, Optional, Sequence, Tuple
+
+try:
+    import numpy as np
+except ImportError as exc:  # pragma: no cover - depends on the environment
+    raise ImportError(
+        "pyrwgps.simplify needs numpy: pip install 'pyrwgps[geo]'"
+    ) from exc
+
+from .polyline import Point, encode
+from .spatial import EARTH_RADIUS
+
+# Zoom levels of a pyramid by default: whole-region views down to street level.
+DEFAULT_ZOOMS = range(4, 19)
+
+# Web Mercator metres per pixel at zoom 0 on the equator, for 256-pixel tiles.
+_EQUATOR_RESOLUTION = 2 * math.pi * EARTH_RADIUS / 256
+
+
+def _project(points: Any) -> Tuple[Any, Any, Any]:
+    """``(lat, lng)`` points as an array, and as x, y metres from the first point."""
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+    if points.size == 0:
+        return points, points[:, 0], points[:, 1]
+    metres = math.radians(EARTH_RADIUS)  # per degree of latitude
+    coslat = math.cos(math.radians(float(points[:, 0].mean())))
+    x = (points[:, 1] - points[0, 1]) * coslat * metres
+    y = (points[:, 0] - points[0, 0]) * metres
+    return points, x, y
+
+
+def _segment_distance(px: Any, py: Any, start: Tuple, end: Tuple) -> Any:
+    """Distance of points from segments; measures to ``start`` for zero-length ones."""
+    (ax, ay), (bx, by) = start, end
+    dx, dy = bx - ax, by - ay
+    dot = (px - ax) * dx + (py - ay) * dy
+    length = np.broadcast_to(dx * dx + dy * dy, dot.shape)
+    t = np.divide(dot, length, out=np.zeros_like(dot), where=length > 0)
+    t = np.clip(t, 0, 1)
+    return np.hypot(px - ax - t * dx, py - ay - t * dy)
+
+
+def importance(points: Any, min_tolerance: float = 0.0) -> Any:
+    """
+    Rank points by the Douglas-Peucker tolerance that would drop them.
+
+    ``douglas_peucker(points, t)`` keeps exactly the points ranked above
+    ``t``; the end points rank infinite. Every open range of the recursion is
+    split in the same vectorised pass, so a level costs one pass over the
+    points still in play.
+
+    Args:
+        points: ``(lat, lng)`` points or an ``(n, 2)`` array.
+        min_tolerance: Stop refining ranges whose points are all within this
+            many metres; those points rank 0. Saves work on dense tracks.
+
+    Returns:
+        A float64 array of metres, one per point.
+    """
+    # pylint: disable=too-many-locals
+    _, x, y = _project(points)
+    size = len(x)
+    ranks = np.zeros(size)
+    if size == 0:
+        return ranks
+    ranks[[0, -1]] = np.inf
+    starts = np.array([0])
+    ends = np.array([size - 1])
+    caps = np.array([np.inf])
+    while starts.size:
+        inner = ends - starts - 1
+        busy = inner > 0
+        starts, ends, caps, inner = starts[busy], ends[busy], caps[busy], inner[busy]
+        if starts.size == 0:
+            break
+        owner = np.repeat(np.arange(len(starts)), inner)
+        offsets = np.cumsum(inner) - inner
+        index = np.arange(len(owner)) - offsets[owner] + starts[owner] + 1
+        a, b = starts[owner], ends[owner]
+        distance = _segment_distance(x[index], y[index], (x[a], y[a]), (x[b], y[b]))
+        # The farthest point of each range: sort by range, then distance down.
+        order = np.lexsort((-distance, owner))
+        farthest = order[offsets]
+        worst = distance[farthest]
+        split = worst > min_tolerance
+        chosen = index[farthest][split]
+        rank = np.minimum(worst[split], caps[split])
+        ranks[chosen] = rank
+        starts = np.concatenate([starts[split], chosen])
+        ends = np.concatenate([chosen, ends[split]])
+        caps = np.concatenate([rank, rank])
+    return ranks
+
+
+def douglas_peucker(points: Any, tolerance: float) -> Any:
+    """Points of a track kept by Douglas-Peucker at ``tolerance`` metres, as ``(m, 2)``."""
+    array, _, _ = _project(points)
+    return array[importance(array, min_tolerance=tolerance) > tolerance]
+
+
+def visvalingam(points: Any, tolerance: float) -> Any:
+    """
+    Simplify by Visvalingam-Whyatt: drop points whose triangle with their
+    neighbours is under ``tolerance ** 2`` square metres, smallest first.
+
+    Each round drops every such point whose area is a local minimum, which
+    never removes two neighbours at once; rounds repeat until none is left.
+
+    Returns:
+        The kept points as an ``(m, 2)`` array.
+    """
+    array, x, y = _project(points)
+    keep = np.arange(len(x))
+    threshold = tolerance * tolerance
+    while len(keep) > 2:
+        px, py = x[keep], y[keep]
+        area = 0.5 * np.abs(
+            (px[:-2] - px[2:]) * (py[1:-1] - py[2:])
+            - (px[1:-1] - px[2:]) * (py[:-2] - py[2:])
+        )
+        padded = np.concatenate([[np.inf], area, [np.inf]])
+        # Ties go to the earlier point, so neighbours are never dropped together.
+        minimum = (area < padded[:-2]) & (area <= padded[2:])
+        drop = np.flatnonzero(minimum & (area < threshold)) + 1
+        if drop.size == 0:
+            break
+        keep = np.delete(keep, drop)
+    return array[keep]
+
+
+def pixel_metres(zoom: int, latitude: float = 0.0) -> float:
+    """Ground size in metres of one 256-pixel-tile map pixel at ``zoom``."""
+    return _EQUATOR_RESOLUTION * math.cos(math.radians(latitude)) / 2**zoom
+
+
+class LODPyramid:
+    """A track simplified for a range of map zoom levels.
+
+    Each level keeps the points a map needs at that zoom: none of the dropped
+    ones is more than ``pixel_tolerance`` pixels from the drawn line. Levels
+    are computed up front, so at() is a lookup.
+
+    Args:
+        points: ``(lat, lng)`` points or an ``(n, 2)`` array.
+        zooms: Zoom levels to precompute. A zoom in between is served by the
+            next deeper level; above the deepest one, at() returns every
+            point; below the shallowest, the shallowest level.
+        pixel_tolerance: How far, in screen pixels, a level may stray from the
+            full track.
+    """
+
+    __slots__ = ("zooms", "pixel_tolerance", "points", "ranks", "_levels", "_encoded")
+
+    def __init__(
+        self,
+        points: Any,
+        zooms: Iterable[int] = DEFAULT_ZOOMS,
+        pixel_tolerance: float = 1.0,
+    ):
+        self.points, _, _ = _project(points)
+        self.zooms: Tuple[int, ...] = tuple(sorted(zooms))
+        self.pixel_tolerance = pixel_tolerance
+        latitude = float(self.points[:, 0].mean()) if len(self.points) else 0.0
+        tolerances = {
+            zoom: pixel_tolerance * pixel_metres(zoom, latitude) for zoom in self.zooms
+        }
+        finest = min(tolerances.values(), default=0.0)
+        self.ranks = importance(self.points, min_tolerance=finest)
+        self._levels: Dict[int, Any] = {
+            zoom: self.points[self.ranks > tolerance]
+            for zoom, tolerance in tolerances.items()
+        }
+        self._encoded: Dict[int, str] = {}
+
+    def __len__(self) -> int:
+        return len(self.points)
+
+    def __repr__(self):
+        sizes = ", ".join(f"{zoom}: {len(self._levels[zoom])}" for zoom in self.zooms)
+        return f"LODPyramid(points={len(self)}, levels={{{sizes}}})"
+
+    def _zoom(self, zoom: int) -> Optional[int]:
+        """The precomputed level serving ``zoom``, or None for the full track.
+
+        That is the shallowest precomputed zoom at or deeper than ``zoom``,
+        so the levels need not be contiguous and a level never strays further
+        than ``pixel_tolerance`` pixels at the zoom it serves.
+        """
+        if not self.zooms or zoom > self.zooms[-1]:
+            return None
+        return self.zooms[bisect_left(self.zooms, zoom)]
+
+    def at(self, zoom: int) -> Any:
+        """Points to draw at ``zoom``, as a read-only ``(m, 2)`` array."""
+        level = self._zoom(zoom)
+        points = self.points if level is None else self._levels[level]
+        points.flags.writeable = False
+        return points
+
+    def encoded(self, zoom: int) -> str:
+        """Points to draw at ``zoom`` as an encoded polyline (computed once)."""
+        level = self._zoom(zoom)
+        key = -1 if level is None else level
+        if key not in self._encoded:
+            points: Sequence[Point] = self.at(zoom).tolist()
+            self._encoded[key] = encode(points)
+        return self._encoded[key]
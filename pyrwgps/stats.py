@@ -0,0 +1,385 @@
+"""Vectorised ride statistics for the ridewithgps package.
+
+Computes distance, elapsed and moving time, smoothed elevation gain and loss,
+climbs, and heart rate and power zone times from Track arrays. Many tracks are
+processed together: batch_stats() concatenates them and reduces per track, so
+the work is a fixed number of NumPy operations however many trips there are::
+
+    from pyrwgps.stats import batch_stats, compare
+    from pyrwgps.track import Track
+
+    tracks = [Track.fetch(client, trip_id) for trip_id in trip_ids]
+    for stats in batch_stats(tracks, hr_zones=(120, 140, 155, 170)):
+        print(stats.trip_id, stats.distance, stats.moving_time, stats.elevation_gain)
+
+compare() checks computed values against the ones the API reports for a trip.
+Needs numpy (``pip install 'pyrwgps[geo]'``).
+"""
+
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+try:
+    import numpy as np
+except ImportError as exc:  # pragma: no cover - depends on the environment
+    raise ImportError("pyrwgps.stats needs numpy: pip install 'pyrwgps[geo]'") from exc
+
+from .spatial import EARTH_RADIUS
+from .track import Track
+
+# RideStats fields and the trip detail keys the API reports them under.
+API_FIELDS = {
+    "distance": "distance",
+    "duration": "duration",
+    "moving_time": "moving_time",
+    "elevation_gain": "elevation_gain",
+    "elevation_loss": "elevation_loss",
+    "avg_hr": "avg_hr",
+    "avg_power": "avg_watts",
+}
+
+
+class Climb:
+    """A sustained rise in a track.
+
+    Attributes:
+        start, end: Indexes of the points at the bottom and the top.
+        distance: Metres along the track to the bottom.
+        length: Length in metres.
+        gain: Height gained (top minus bottom), in metres.
+        grade: Average grade in percent.
+    """
+
+    # pylint: disable=too-few-public-methods, too-many-arguments
+
+    __slots__ = ("start", "end", "distance", "length", "gain", "grade")
+
+    def __init__(
+        self,
+        start: int,
+        end: int,
+        *,
+        distance: float,
+        length: float,
+        gain: float,
+        grade: float,
+    ):
+        self.start = start
+        self.end = end
+        self.distance = distance
+        self.length = length
+        self.gain = gain
+        self.grade = grade
+
+    def __repr__(self):
+        return (
+            f"Climb(start={self.start}, end={self.end}, length={self.length:.0f}m, "
+            f"gain={self.gain:.0f}m, grade={self.grade:.1f}%)"
+        )
+
+
+class RideStats:
+    """Statistics of one track; NaN where the track lacks the data.
+
+    Distances are in metres, times in seconds, speeds in metres per second.
+    ``hr_zones`` and ``power_zones`` hold the seconds spent in each zone (one
+    more zone than boundaries), or are empty when no boundaries were given.
+    """
+
+    # pylint: disable=too-few-public-methods, too-many-instance-attributes
+
+    __slots__ = (
+        "trip_id",
+        "points",
+        "distance",
+        "duration",
+        "moving_time",
+        "elevation_gain",
+        "elevation_loss",
+        "max_speed",
+        "avg_hr",
+        "avg_power",
+        "climbs",
+        "hr_zones",
+        "power_zones",
+    )
+
+    def __init__(self, trip_id: Optional[int], points: int):
+        self.trip_id = trip_id
+        self.points = points
+        self.distance = 0.0
+        self.duration = float("nan")
+        self.moving_time = float("nan")
+        self.elevation_gain = float("nan")
+        self.elevation_loss = float("nan")
+        self.max_speed = float("nan")
+        self.avg_hr = float("nan")
+        self.avg_power = float("nan")
+        self.climbs: List[Climb] = []
+        self.hr_zones: List[float] = []
+        self.power_zones: List[float] = []
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Return the statistics as a dict; climbs become dicts too."""
+        data = {name: getattr(self, name) for name in self.__slots__}
+        data["climbs"] = [
+            {name: getattr(climb, name) for name in Climb.__slots__}
+            for climb in self.climbs
+        ]
+        return data
+
+    def __repr__(self):
+        return (
+            f"RideStats(trip_id={self.trip_id}, distance={self.distance:.0f}m, "
+            f"moving_time={self.moving_time:.0f}s, "
+            f"elevation_gain={self.elevation_gain:.0f}m, climbs={len(self.climbs)})"
+        )
+
+
+def haversine(lat0: Any, lng0: Any, lat1: Any, lng1: Any) -> Any:
+    """Great-circle distance in metres between arrays of points in degrees."""
+    lat0, lng0, lat1, lng1 = (np.radians(a) for a in (lat0, lng0, lat1, lng1))
+    a = (
+        np.sin((lat1 - lat0) / 2) ** 2
+        + np.cos(lat0) * np.cos(lat1) * np.sin((lng1 - lng0) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+def _smooth(values: Any, starts: Any, ends: Any, window: int) -> Any:
+    """Centred moving average of ``values`` that stops at track boundaries.
+
+    ``starts``/``ends`` give each point's track bounds; NaNs are skipped, and a
+    window without any value stays NaN.
+    """
+    if window <= 1:
+        return values
+    half = window // 2
+    finite = np.isfinite(values)
+    total = np.concatenate(([0.0], np.cumsum(np.where(finite, values, 0.0))))
+    count = np.concatenate(([0], np.cumsum(finite)))
+    index = np.arange(len(values))
+    low = np.maximum(index - half, starts)
+    high = np.minimum(index + half + 1, ends)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return (total[high] - total[low]) / (count[high] - count[low])
+
+
+def _zone_times(
+    values: Any, bounds: Sequence[float], seconds: Any, owner: Any, tracks: int
+) -> Any:
+    """Seconds per (track, zone); a segment counts in the zone of its first point."""
+    zones = len(bounds) + 1
+    ok = np.isfinite(values) & (seconds > 0)
+    zone = np.digitize(values[ok], np.asarray(bounds, dtype=np.float64))
+    times = np.bincount(
+        owner[ok] * zones + zone, weights=seconds[ok], minlength=tracks * zones
+    )
+    return times.reshape(tracks, zones)
+
+
+def _climbs(
+    rise: Any, dist: Any, valid: Any, owner: Any, options: Dict[str, float]
+) -> List[Tuple[int, int, int]]:
+    """Find climbs as ``(track, bottom point, top point)`` in concatenated indexes.
+
+    Rising runs separated by drops of at most ``tolerance`` metres are merged,
+    then runs that gain ``min_gain`` at ``min_grade`` percent or more are kept.
+    """
+    # pylint: disable=too-many-locals
+    rising = valid & (rise > 0)
+    edges = np.diff(np.concatenate(([0], rising.astype(np.int8), [0])))
+    starts = np.nonzero(edges == 1)[0]
+    ends = np.nonzero(edges == -1)[0]
+    if starts.size == 0:
+        return []
+    elevation = np.concatenate(([0.0], np.cumsum(np.where(valid, rise, 0.0))))
+    along = np.concatenate(([0.0], np.cumsum(np.where(valid, dist, 0.0))))
+    run_owner = owner[starts]
+    # Merge a run into the previous one if the dip between them is small.
+    dip = elevation[ends[:-1]] - elevation[starts[1:]]
+    merge = (run_owner[1:] == run_owner[:-1]) & (dip <= options["tolerance"])
+    group = np.concatenate(([0], np.cumsum(~merge)))
+    first = np.unique(group, return_index=True)[1]
+    last = np.append(first[1:], len(group)) - 1
+    starts, ends, run_owner = starts[first], ends[last], run_owner[first]
+    gain = elevation[ends] - elevation[starts]
+    length = along[ends] - along[starts]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        grade = np.where(length > 0, gain / length * 100, np.inf)
+    keep = (gain >= options["min_gain"]) & (grade >= options["min_grade"])
+    return list(
+        zip(run_owner[keep].tolist(), starts[keep].tolist(), ends[keep].tolist())
+    )
+
+
+def batch_stats(
+    tracks: Sequence[Track],
+    *,
+    min_speed: float = 1.0,
+    max_gap: float = 60.0,
+    smoothing: int = 5,
+    min_climb_gain: float = 30.0,
+    min_climb_grade: float = 3.0,
+    climb_tolerance: float = 5.0,
+    hr_zones: Optional[Sequence[float]] = None,
+    power_zones: Optional[Sequence[float]] = None,
+) -> List[RideStats]:
+    """
+    Compute RideStats for many tracks in one vectorised pass.
+
+    Args:
+        tracks: Tracks to analyse; times must be in ascending order.
+        min_speed: Metres per second below which a segment counts as stopped.
+        max_gap: Seconds between points above which the gap counts as a pause
+            (not moving, and not counted in zone times).
+        smoothing: Points in the moving average applied to elevation before
+            summing gain and loss and finding climbs.
+        min_climb_gain: Metres a rise must gain to count as a climb.
+        min_climb_grade: Average grade, in percent, a climb must reach.
+        climb_tolerance: Metres a rise may dip and still count as one climb.
+        hr_zones: Heart rate zone boundaries in bpm, ascending, e.g.
+            ``(120, 140, 155, 170)`` for five zones.
+        power_zones: Power zone boundaries in watts, ascending.
+
+    Returns:
+        One RideStats per track, in order.
+    """
+    # pylint: disable=too-many-arguments, too-many-locals, too-many-statements
+    count = len(tracks)
+    lengths = np.array([len(track) for track in tracks], dtype=np.int64)
+    offsets = np.concatenate(([0], np.cumsum(lengths)))
+    results = [RideStats(track.trip_id, len(track)) for track in tracks]
+    total = int(offsets[-1])
+    if total == 0:
+        return results
+
+    def column(name: str) -> Any:
+        return np.concatenate([getattr(track, name) for track in tracks])
+
+    lat, lng, ele, time = column("lat"), column("lng"), column("ele"), column("time")
+    point_owner = np.repeat(np.arange(count), lengths)
+    track_start, track_end = offsets[:-1][point_owner], offsets[1:][point_owner]
+
+    # Segment i joins points i and i + 1; it is invalid where a track ends.
+    owner = point_owner[:-1]
+    valid = point_owner[1:] == owner
+    dist = np.where(valid, haversine(lat[:-1], lng[:-1], lat[1:], lng[1:]), 0.0)
+    seconds = np.where(valid, np.diff(time), np.nan)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        speed = dist / seconds
+    timed = np.isfinite(seconds) & (seconds > 0) & (seconds <= max_gap)
+    moving = timed & (speed >= min_speed)
+
+    distance = np.bincount(owner, weights=dist, minlength=count)
+    moving_time = np.bincount(
+        owner, weights=np.where(moving, seconds, 0.0), minlength=count
+    )
+    has_time = np.bincount(owner, weights=np.isfinite(seconds), minlength=count) > 0
+    max_speed = np.full(count, np.nan)
+    np.fmax.at(max_speed, owner[moving], speed[moving])
+
+    smoothed = _smooth(ele, track_start, track_end, smoothing)
+    rise = np.diff(smoothed)
+    climbing = valid & np.isfinite(rise)
+    gain = np.bincount(
+        owner, weights=np.where(climbing & (rise > 0), rise, 0.0), minlength=count
+    )
+    loss = np.bincount(
+        owner, weights=np.where(climbing & (rise < 0), -rise, 0.0), minlength=count
+    )
+    has_ele = np.bincount(point_owner, weights=np.isfinite(ele), minlength=count) > 0
+
+    averages = {}
+    for name in ("hr", "power"):
+        values = column(name)
+        finite = np.isfinite(values)
+        sums = np.bincount(
+            point_owner, weights=np.where(finite, values, 0.0), minlength=count
+        )
+        counts = np.bincount(point_owner, weights=finite, minlength=count)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            averages[name] = sums / counts
+    zone_seconds = np.where(timed, seconds, 0.0)
+    hr_times = (
+        _zone_times(column("hr")[:-1], hr_zones, zone_seconds, owner, count)
+        if hr_zones
+        else None
+    )
+    power_times = (
+        _zone_times(column("power")[:-1], power_zones, zone_seconds, owner, count)
+        if power_zones
+        else None
+    )
+
+    along = np.concatenate(([0.0], np.cumsum(dist)))
+    for index, stats in enumerate(results):
+        if not stats.points:
+            continue
+        first, last = int(offsets[index]), int(offsets[index + 1]) - 1
+        stats.distance = float(distance[index])
+        if has_time[index]:
+            stats.duration = float(time[last] - time[first])
+            stats.moving_time = float(moving_time[index])
+            stats.max_speed = float(max_speed[index])
+        if has_ele[index]:
+            stats.elevation_gain = float(gain[index])
+            stats.elevation_loss = float(loss[index])
+        stats.avg_hr = float(averages["hr"][index])
+        stats.avg_power = float(averages["power"][index])
+        if hr_times is not None:
+            stats.hr_zones = hr_times[index].tolist()
+        if power_times is not None:
+            stats.power_zones = power_times[index].tolist()
+
+    options = {
+        "tolerance": climb_tolerance,
+        "min_gain": min_climb_gain,
+        "min_grade": min_climb_grade,
+    }
+    for index, first, end in _climbs(rise, dist, climbing, owner, options):
+        base = int(offsets[index])
+        height = smoothed[end] - smoothed[first]
+        length = along[end] - along[first]
+        results[index].climbs.append(
+            Climb(
+                start=first - base,
+                end=end - base,
+                distance=float(along[first] - along[base]),
+                length=float(length),
+                gain=float(height),
+                grade=float(height / length * 100) if length else float("inf"),
+            )
+        )
+    return results
+
+
+def ride_stats(track: Track, **options: Any) -> RideStats:
+    """Compute the RideStats of one track; see batch_stats() for the options."""
+    return batch_stats([track], **options)[0]
+
+
+def compare(
+    stats: RideStats, trip: Dict[str, Any]
+) -> Dict[str, Tuple[float, float, float]]:
+    """
+    Check computed statistics against the values a trip detail reports.
+
+    Args:
+        stats: Statistics computed from the trip's track.
+        trip: The trip detail (raw JSON), e.g. from ``get(..., raw=True)["trip"]``.
+
+    Returns:
+        For each statistic the trip reports: ``(computed, reported,
+        relative difference)``, where the difference is
+        ``(computed - reported) / reported`` (NaN if reported is 0).
+    """
+    report = {}
+    for name, key in API_FIELDS.items():
+        reported = trip.get(key)
+        if reported is None:
+            continue
+        computed = getattr(stats, name)
+        reported = float(reported)
+        difference = (computed - reported) / reported if reported else float("nan")
+        report[name] = (computed, reported, difference)
+    return report
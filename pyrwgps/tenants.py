@@ -0,0 +1,170 @@
+"""Clients for many OAuth users sharing one set of resources.
+
+A RideWithGPS client per user builds its own connection pool, rate limiter
+and cache, so sockets, TLS handshakes and memory grow with the number of
+users. A ClientPool builds them once::
+
+    from pyrwgps.tenants import ClientPool
+
+    pool = ClientPool(client_id="...", client_secret="...",
+                      rate_limit_max=5, global_rate_limit_max=50)
+    client = pool.client(user.access_token)   # a RideWithGPS for this user
+    client.get(path="/api/v1/trips.json")
+
+Every tenant client shares the pool's connections, response cache (scoped
+per token), hooks, metrics, retry policy, circuit breaker and quota. What is
+its own is in ``__slots__``: the access token and a RateLimiter, so one busy
+user cannot take the whole global rate limit. Each request waits for a slot
+of its user's limiter, then for one of the global limiter (or of the route's
+bucket, with ``rate_limits``).
+"""
+
+import threading
+from collections import OrderedDict
+from typing import Any, Optional, Tuple
+
+from .cache import ResponseCache
+from .hooks import RequestContext
+from .ratelimiter import RateLimiter
+from .ridewithgps import RideWithGPS
+
+
+class TenantClient(RideWithGPS):
+    """A RideWithGPS client for one access token of a ClientPool.
+
+    Attributes not kept per tenant are read from ``pool.shared``. Setting
+    one on a tenant client overrides it for that tenant only. Tenants share
+    the per-thread ``last_context``, which a thread serving one user at a
+    time can still rely on.
+    """
+
+    __slots__ = ("_pool", "BASE_URL", "access_token", "ratelimiter")
+
+    def __init__(  # pylint: disable=super-init-not-called
+        self, pool: "ClientPool", access_token: str
+    ):
+        self._pool = pool
+        self.BASE_URL = pool.shared.BASE_URL  # pylint: disable=invalid-name
+        self.access_token = access_token
+        self.ratelimiter = RateLimiter(
+            max_messages=pool.rate_limit_max,
+            every_seconds=pool.rate_limit_seconds,
+            bulk_share=pool.shared.ratelimiter.bulk_share,
+        )
+
+    def __getattr__(self, name: str) -> Any:
+        # Only called for attributes a tenant does not have itself.
+        if name in TenantClient.__slots__ or name.startswith("__"):
+            raise AttributeError(name)
+        return getattr(self._pool.shared, name)
+
+    def __repr__(self):
+        return f"TenantClient(scope={self._cache_scope()!r})"
+
+    def _limiters(self, ctx: Optional[RequestContext]) -> Tuple[RateLimiter, ...]:
+        """This tenant's limiter, then the pool's global one or route bucket."""
+        # pylint: disable=protected-access
+        return (self.ratelimiter,) + self._pool.shared._limiters(ctx)
+
+
+class ClientPool:
+    """A factory of RideWithGPS clients for many OAuth users.
+
+    Clients are kept for the ``max_clients`` most recently used tokens, so
+    asking again for a token returns the same client and its rate limit
+    state. Older ones are dropped; a client still in use keeps working.
+
+    Args:
+        client_id: OAuth application ID.
+        client_secret: OAuth application secret.
+        rate_limit_max: Requests each token may make per ``rate_limit_seconds``.
+        rate_limit_seconds: Window of the per-token limit.
+        global_rate_limit_max: Requests all tokens together may make per
+            ``global_rate_limit_seconds``.
+        global_rate_limit_seconds: Window of the global limit.
+        max_clients: Tenant clients kept for reuse.
+        cache: As for RideWithGPS; one store shared by all tenants, with
+            entries scoped per token. With True, the store keeps the
+            ``max_cache_entries`` most recently used responses.
+        max_cache_entries: Size of the store made for ``cache=True``.
+        pool_maxsize: Connections kept open per host, for all tenants.
+        **kwargs: Other RideWithGPS options (retry, timeout, breaker, quota,
+            rate_limits, ...), shared by all tenants.
+    """
+
+    # pylint: disable=too-many-instance-attributes
+
+    def __init__(
+        self,
+        *,
+        client_id: str,
+        client_secret: Optional[str] = None,
+        rate_limit_max: int = 10,
+        rate_limit_seconds: float = 1,
+        global_rate_limit_max: int = 100,
+        global_rate_limit_seconds: float = 1,
+        max_clients: int = 10000,
+        cache: Any = True,
+        max_cache_entries: int = 10000,
+        pool_maxsize: int = 50,
+        **kwargs: Any,
+    ):
+        # pylint: disable=too-many-arguments
+        if cache is True:
+            cache = ResponseCache(max_entries=max_cache_entries)
+        self.shared = RideWithGPS(
+            client_id=client_id,
+            client_secret=client_secret,
+            cache=cache,
+            rate_limit_max=global_rate_limit_max,
+            rate_limit_seconds=global_rate_limit_seconds,
+            pool_maxsize=pool_maxsize,
+            **kwargs,
+        )
+        self.rate_limit_max = rate_limit_max
+        self.rate_limit_seconds = rate_limit_seconds
+        self.max_clients = max_clients
+        self._clients: "OrderedDict[str, TenantClient]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return f"ClientPool(clients={len(self)}, max_clients={self.max_clients})"
+
+    def __len__(self) -> int:
+        return len(self._clients)
+
+    def __contains__(self, access_token: object) -> bool:
+        return access_token in self._clients
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def client(self, access_token: str) -> TenantClient:
+        """The client for ``access_token``, created on first use."""
+        if not access_token:
+            raise ValueError("access_token is required")
+        with self._lock:
+            client = self._clients.get(access_token)
+            if client is None:
+                client = TenantClient(self, access_token)
+                self._clients[access_token] = client
+                if len(self._clients) > self.max_clients:
+                    self._clients.popitem(last=False)
+            else:
+                self._clients.move_to_end(access_token)
+            return client
+
+    def discard(self, access_token: str) -> bool:
+        """Forget the client of ``access_token`` (e.g. after the user revokes
+        it); return True if there was one."""
+        with self._lock:
+            return self._clients.pop(access_token, None) is not None
+
+    def close(self) -> None:
+        """Drop all tenant clients and close the shared connections."""
+        with self._lock:
+            self._clients.clear()
+        self.shared.connection_pool.clear()
@@ -0,0 +1,226 @@
+"""Track points as NumPy arrays for the ridewithgps package.
+
+A Track holds one recording column by column (latitude, longitude, elevation,
+time, heart rate, cadence, power), ready for vectorised analysis. Build one
+from a v1 trip or route detail (its ``track_points``), or from a GPX or TCX
+file downloaded with ``download_trip_file()``::
+
+    from pyrwgps.track import Track
+
+    track = Track.fetch(client, 123456)
+    track = Track.from_gpx(client.download_trip_file(123456, "gpx"))
+
+Missing values are NaN. Needs numpy (``pip install 'pyrwgps[geo]'``).
+"""
+
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional
+from xml.etree import ElementTree
+
+try:
+    import numpy as np
+except ImportError as exc:  # pragma: no cover - depends on the environment
+    raise ImportError("pyrwgps.track needs numpy: pip install 'pyrwgps[geo]'") from exc
+
+from .apiclient import APIError
+
+# Track columns, in storage order.
+COLUMNS = ("lat", "lng", "ele", "time", "hr", "cadence", "power")
+
+# v1 track_points keys for each column.
+_TRACK_POINT_KEYS = {
+    "lat": "y",
+    "lng": "x",
+    "ele": "e",
+    "time": "t",
+    "hr": "h",
+    "cadence": "c",
+    "power": "p",
+}
+
+
+def _epoch(text: Optional[str]) -> float:
+    """Seconds since the epoch of an ISO 8601 timestamp, or NaN."""
+    if not text:
+        return float("nan")
+    text = text.strip()
+    if text.endswith("Z"):
+        text = text[:-1] + "+00:00"
+    return datetime.fromisoformat(text).timestamp()
+
+
+def _number(text: Optional[str]) -> float:
+    return float(text) if text and text.strip() else float("nan")
+
+
+def _local(tag: str) -> str:
+    """Tag name without its XML namespace."""
+    return tag.rsplit("}", 1)[-1]
+
+
+class Track:
+    """One recorded or planned track as parallel float64 arrays.
+
+    Attributes:
+        lat, lng: Position in degrees.
+        ele: Elevation in metres.
+        time: Seconds since the epoch.
+        hr: Heart rate in beats per minute.
+        cadence: Cadence in revolutions per minute.
+        power: Power in watts.
+        trip_id: ID of the trip or route, if known.
+    """
+
+    # pylint: disable=too-many-instance-attributes, too-many-arguments
+
+    __slots__ = COLUMNS + ("trip_id",)
+
+    def __init__(
+        self,
+        lat: Any,
+        lng: Any,
+        *,
+        ele: Any = None,
+        time: Any = None,
+        hr: Any = None,
+        cadence: Any = None,
+        power: Any = None,
+        trip_id: Optional[int] = None,
+    ):
+        self.lat = np.asarray(lat, dtype=np.float64)
+        self.lng = np.asarray(lng, dtype=np.float64)
+        size = len(self.lat)
+        if len(self.lng) != size:
+            raise ValueError("lat and lng must have the same length")
+        for name, values in (
+            ("ele", ele),
+            ("time", time),
+            ("hr", hr),
+            ("cadence", cadence),
+            ("power", power),
+        ):
+            column = (
+                np.full(size, np.nan)
+                if values is None
+                else np.asarray(values, dtype=np.float64)
+            )
+            if len(column) != size:
+                raise ValueError(f"{name} must have one value per point")
+            setattr(self, name, column)
+        self.trip_id = trip_id
+
+    def __len__(self) -> int:
+        return len(self.lat)
+
+    def __repr__(self):
+        return f"Track(trip_id={self.trip_id}, points={len(self)})"
+
+    def has(self, column: str) -> bool:
+        """True if any point has a value for ``column``."""
+        return bool(np.isfinite(getattr(self, column)).any())
+
+    @classmethod
+    def from_columns(
+        cls, columns: Dict[str, Any], trip_id: Optional[int] = None
+    ) -> "Track":
+        """Build a track from a mapping of column name to values."""
+        return cls(**{name: columns.get(name) for name in COLUMNS}, trip_id=trip_id)
+
+    @classmethod
+    def from_track_points(
+        cls, points: Iterable[Dict[str, Any]], trip_id: Optional[int] = None
+    ) -> "Track":
+        """Build a track from v1 ``track_points`` (``x``, ``y``, ``e``, ``t``, ``h``, ...)."""
+        points = list(points)
+        nan = float("nan")
+        columns = {}
+        for name, key in _TRACK_POINT_KEYS.items():
+            values = [point.get(key) for point in points]
+            columns[name] = [nan if value is None else value for value in values]
+        return cls.from_columns(columns, trip_id=trip_id)
+
+    @classmethod
+    def from_trip(cls, trip: Dict[str, Any]) -> "Track":
+        """Build a track from a v1 trip or route detail (raw JSON)."""
+        return cls.from_track_points(trip.get("track_points") or [], trip.get("id"))
+
+    @classmethod
+    def fetch(cls, client: Any, item_id: int, kind: str = "trips") -> "Track":
+        """Fetch a trip (or, with ``kind="routes"``, a route) and return its track.
+
+        Raises:
+            APIError: If the API answered with an error, e.g. for a deleted or
+                private item.
+        """
+        data = client.get(path=f"/api/v1/{kind}/{item_id}.json", raw=True)
+        ctx = getattr(client, "last_context", None)
+        status = None if ctx is None else ctx.status
+        if (status is not None and status >= 400) or not isinstance(data, dict):
+            error = data.get("error") if isinstance(data, dict) else None
+            raise APIError(
+                f"No track for {kind} {item_id} (HTTP {status}): "
+                f"{error or 'unexpected response'}"
+            )
+        detail = data[kind[:-1]] if kind[:-1] in data else data
+        return cls.from_trip(detail)
+
+    @classmethod
+    def from_gpx(cls, data: bytes, trip_id: Optional[int] = None) -> "Track":
+        """Parse the track points of a GPX file.
+
+        Heart rate, cadence and power are read from Garmin's
+        TrackPointExtension (``hr``, ``cad``) and the common ``power`` extension.
+        """
+        columns: Dict[str, List[float]] = {name: [] for name in COLUMNS}
+        for point in ElementTree.fromstring(data).iter():
+            if _local(point.tag) not in ("trkpt", "rtept"):
+                continue
+            values = {
+                "lat": _number(point.get("lat")),
+                "lng": _number(point.get("lon")),
+            }
+            for child in point.iter():
+                name = _local(child.tag)
+                if name == "ele":
+                    values["ele"] = _number(child.text)
+                elif name == "time":
+                    values["time"] = _epoch(child.text)
+                elif name == "hr":
+                    values["hr"] = _number(child.text)
+                elif name == "cad":
+                    values["cadence"] = _number(child.text)
+                elif name == "power":
+                    values["power"] = _number(child.text)
+            for name, column in columns.items():
+                column.append(values.get(name, np.nan))
+        return cls.from_columns(columns, trip_id=trip_id)
+
+    @classmethod
+    def from_tcx(cls, data: bytes, trip_id: Optional[int] = None) -> "Track":
+        """Parse the trackpoints of a TCX file; points without a position are skipped."""
+        columns: Dict[str, List[float]] = {name: [] for name in COLUMNS}
+        for point in ElementTree.fromstring(data).iter():
+            if _local(point.tag) != "Trackpoint":
+                continue
+            values: Dict[str, float] = {}
+            for child in point.iter():
+                name = _local(child.tag)
+                if name == "LatitudeDegrees":
+                    values["lat"] = _number(child.text)
+                elif name == "LongitudeDegrees":
+                    values["lng"] = _number(child.text)
+                elif name == "AltitudeMeters":
+                    values["ele"] = _number(child.text)
+                elif name == "Time":
+                    values["time"] = _epoch(child.text)
+                elif name == "HeartRateBpm":
+                    values["hr"] = _number(child.findtext("{*}Value") or child.text)
+                elif name == "Cadence":
+                    values["cadence"] = _number(child.text)
+                elif name == "Watts":
+                    values["power"] = _number(child.text)
+            if "lat" not in values or "lng" not in values:
+                continue
+            for name, column in columns.items():
+                column.append(values.get(name, np.nan))
+        return cls.from_columns(columns, trip_id=trip_id)
@@ -0,0 +1,279 @@
+"""Memory-mapped binary track store for the ridewithgps package.
+
+Keeps decoded tracks of a whole archive in one compact file, so reloading a
+track is a lookup instead of parsing JSON or GPX::
+
+    from pyrwgps.trackstore import TrackStore
+
+    with TrackStore("tracks/", mode="a") as store:
+        store.fetch(client, trip_ids, max_workers=4)   # only trips not stored yet
+
+    store = TrackStore("tracks/")
+    columns = store.columns(123456)   # zero-copy views into the mapped file
+    track = store.track(123456)       # as a Track, for pyrwgps.stats
+
+Layout: ``tracks.bin`` is a 16-byte header followed by one block per trip,
+each block holding the trip's columns back to back (see BLOCK_COLUMNS) at 32
+bytes per point. ``index.npy`` maps trip IDs to block offsets, sorted by ID.
+Readers map both files with ``mmap``, so opening is O(1), a lookup is a
+binary search, and processes reading the same store share the page cache.
+
+One writer at a time: appends go to the end of ``tracks.bin`` and the index
+is replaced atomically on flush(), so readers never see a partial block.
+Re-adding a trip leaves its old block as dead space. Needs numpy
+(``pip install 'pyrwgps[geo]'``).
+"""
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+try:
+    import numpy as np
+except ImportError as exc:  # pragma: no cover - depends on the environment
+    raise ImportError(
+        "pyrwgps.trackstore needs numpy: pip install 'pyrwgps[geo]'"
+    ) from exc
+
+from .track import Track
+
+MAGIC = b"PYRWTRK1"
+HEADER_SIZE = 16
+
+# Columns of a block in storage order; 8-byte columns first keeps every column
+# aligned, since a block is a multiple of 8 bytes. Positions are in 1e-7 degrees.
+BLOCK_COLUMNS: Tuple[Tuple[str, str], ...] = (
+    ("time", "<f8"),
+    ("lat", "<i4"),
+    ("lng", "<i4"),
+    ("ele", "<f4"),
+    ("hr", "<f4"),
+    ("cadence", "<f4"),
+    ("power", "<f4"),
+)
+POINT_SIZE = sum(np.dtype(kind).itemsize for _, kind in BLOCK_COLUMNS)
+POSITION_SCALE = 1e7
+# Stored in place of a missing (NaN) latitude or longitude.
+MISSING_POSITION = np.iinfo(np.int32).min
+
+INDEX_DTYPE = np.dtype([("id", "<i8"), ("offset", "<i8"), ("count", "<i8")])
+
+
+def encode_block(track: Track) -> bytes:
+    """Serialise a track into one block."""
+    parts = []
+    for name, kind in BLOCK_COLUMNS:
+        values = getattr(track, name)
+        if name in ("lat", "lng"):
+            values = np.where(
+                np.isfinite(values),
+                np.rint(np.nan_to_num(values) * POSITION_SCALE),
+                MISSING_POSITION,
+            )
+        parts.append(np.ascontiguousarray(values, dtype=kind).tobytes())
+    return b"".join(parts)
+
+
+class TrackStore:
+    """A directory holding ``tracks.bin`` and its ``index.npy``.
+
+    Args:
+        directory: Location of the store; created in mode ``"a"``.
+        mode: ``"r"`` to read, ``"a"`` to read and append.
+    """
+
+    # pylint: disable=too-many-instance-attributes
+
+    def __init__(self, directory: str, mode: str = "r"):
+        if mode not in ("r", "a"):
+            raise ValueError(f"mode must be 'r' or 'a', got {mode!r}")
+        self.directory = directory
+        self.mode = mode
+        self.data_path = os.path.join(directory, "tracks.bin")
+        self.index_path = os.path.join(directory, "index.npy")
+        self._writer: Optional[Any] = None
+        self._pending: Dict[int, Tuple[int, int]] = {}
+        # Trips the last fetch() could not store, with the reason.
+        self.failed: Dict[int, BaseException] = {}
+        if mode == "a":
+            os.makedirs(directory, exist_ok=True)
+            if not os.path.exists(self.data_path):
+                with open(self.data_path, "wb") as handle:
+                    handle.write(MAGIC.ljust(HEADER_SIZE, b"\0"))
+            # pylint: disable-next=consider-using-with
+            self._writer = open(self.data_path, "ab")
+        self._data: Any = None
+        self._index: Any = None
+        self.refresh()
+
+    def refresh(self) -> None:
+        """Map the files again, to see trips another process has added since."""
+        with open(self.data_path, "rb") as handle:
+            if handle.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"{self.data_path} is not a pyrwgps track store")
+        self._data = np.memmap(self.data_path, dtype=np.uint8, mode="r")
+        if os.path.exists(self.index_path):
+            self._index = np.load(self.index_path, mmap_mode="r")
+        else:
+            self._index = np.zeros(0, dtype=INDEX_DTYPE)
+
+    def __repr__(self):
+        return f"TrackStore({self.directory!r}, mode={self.mode!r}, trips={len(self)})"
+
+    # ------------------------------------------------------------------
+    # Reading
+    # ------------------------------------------------------------------
+
+    def _locate(self, trip_id: int) -> Optional[Tuple[int, int]]:
+        """Return ``(offset, points)`` of a trip's block, or None."""
+        if trip_id in self._pending:
+            return self._pending[trip_id]
+        ids = self._index["id"]
+        where = int(np.searchsorted(ids, trip_id))
+        if where < len(ids) and ids[where] == trip_id:
+            entry = self._index[where]
+            return int(entry["offset"]), int(entry["count"])
+        return None
+
+    def __contains__(self, trip_id: object) -> bool:
+        if not isinstance(trip_id, (int, np.integer)):
+            return False
+        return self._locate(int(trip_id)) is not None
+
+    def __len__(self) -> int:
+        return len(self.ids())
+
+    def ids(self) -> Any:
+        """Sorted array of the stored trip IDs."""
+        stored = np.asarray(self._index["id"])
+        if not self._pending:
+            return stored
+        return np.union1d(stored, np.fromiter(self._pending, np.int64))
+
+    def columns(self, trip_id: int) -> Dict[str, Any]:
+        """Return a trip's columns as read-only views into the mapped file.
+
+        Nothing is copied or decoded: ``lat`` and ``lng`` are int32 in 1e-7
+        degrees (divide by POSITION_SCALE; MISSING_POSITION marks a gap), the
+        rest are floats with NaN for missing values.
+        """
+        location = self._locate(trip_id)
+        if location is None:
+            raise KeyError(trip_id)
+        offset, count = location
+        if offset + count * POINT_SIZE > len(self._data):
+            if self._writer is not None:
+                self._writer.flush()
+            self._data = np.memmap(self.data_path, dtype=np.uint8, mode="r")
+        columns = {}
+        for name, kind in BLOCK_COLUMNS:
+            dtype = np.dtype(kind)
+            columns[name] = np.frombuffer(self._data, dtype, count, offset)
+            offset += count * dtype.itemsize
+        return columns
+
+    def track(self, trip_id: int) -> Track:
+        """Return a trip as a Track (decoded into float64 arrays)."""
+        columns = dict(self.columns(trip_id))
+        for name in ("lat", "lng"):
+            stored = columns[name]
+            columns[name] = np.where(
+                stored == MISSING_POSITION, np.nan, stored / POSITION_SCALE
+            )
+        return Track.from_columns(columns, trip_id=trip_id)
+
+    # ------------------------------------------------------------------
+    # Writing
+    # ------------------------------------------------------------------
+
+    def add(self, track: Track) -> None:
+        """Append a track, replacing any stored one with the same ``trip_id``."""
+        if self._writer is None:
+            raise ValueError("TrackStore was opened read-only; use mode='a'")
+        if track.trip_id is None:
+            raise ValueError("track.trip_id must be set to store a track")
+        offset = self._writer.tell()
+        self._writer.write(encode_block(track))
+        self._pending[int(track.trip_id)] = (offset, len(track))
+
+    def extend(self, tracks: Iterable[Track]) -> None:
+        """Append several tracks."""
+        for track in tracks:
+            self.add(track)
+
+    def fetch(
+        self,
+        client: Any,
+        trip_ids: Iterable[int],
+        *,
+        max_workers: int = 4,
+        refresh: bool = False,
+    ) -> int:
+        """
+        Fetch trip details through ``client`` and store their tracks.
+
+        Args:
+            client: A RideWithGPS client.
+            trip_ids: Trips to store.
+            max_workers: Trips fetched at once; each takes a rate limit slot.
+            refresh: Fetch trips that are already stored, replacing them.
+
+        Returns:
+            The number of trips stored. Trips that could not be fetched (e.g.
+            deleted ones) are skipped and listed in ``failed``.
+        """
+        wanted = [trip_id for trip_id in trip_ids if refresh or trip_id not in self]
+
+        def fetch(trip_id: int) -> Any:
+            try:
+                return Track.fetch(client, trip_id)
+            except Exception as exc:  # pylint: disable=broad-exception-caught
+                # Skip the trip and carry on with the others.
+                return exc
+
+        self.failed = {}
+        try:
+            with ThreadPoolExecutor(max_workers=max(max_workers, 1)) as pool:
+                for trip_id, track in zip(wanted, pool.map(fetch, wanted)):
+                    if isinstance(track, Exception):
+                        self.failed[trip_id] = track
+                    else:
+                        self.add(track)
+        finally:
+            # Index whatever was appended, even if the batch was interrupted.
+            self.flush()
+        return len(wanted) - len(self.failed)
+
+    def flush(self) -> None:
+        """Make appended tracks visible to new readers."""
+        if self._writer is None or not self._pending:
+            return
+        self._writer.flush()
+        os.fsync(self._writer.fileno())
+        pending = np.array(
+            [(k, offset, count) for k, (offset, count) in self._pending.items()],
+            dtype=INDEX_DTYPE,
+        )
+        kept = np.asarray(self._index)
+        kept = kept[~np.isin(kept["id"], pending["id"])]
+        index = np.concatenate([kept, pending])
+        index = index[np.argsort(index["id"], kind="stable")]
+        partial = self.index_path + ".part"
+        with open(partial, "wb") as handle:
+            np.save(handle, index)
+        os.replace(partial, self.index_path)
+        self._pending = {}
+        self.refresh()
+
+    def close(self) -> None:
+        """Flush and close the store."""
+        self.flush()
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+    def __enter__(self) -> "TrackStore":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
@@ -1,7 +1,16 @@
+import socket
+import threading
+import time
 import unittest
+from http.server import BaseHTTPRequestHandler, HTTPServer
 from types import SimpleNamespace
-from unittest.mock import MagicMock
-from pyrwgps.apiclient import APIClient
+from unittest.mock import ANY, MagicMock, patch
+from pyrwgps.apiclient import APIClient, DeadlineExceededError
+import urllib3
+from urllib3.exceptions import ProtocolError
+
+from pyrwgps.hooks import HOOK_EVENTS
+from pyrwgps.retry import RetryPolicy
 
 
 class TestAPIClient(unittest.TestCase):
@@ -18,8 +27,39 @@ class TestAPIClient(unittest.TestCase):
         result = self.client.call(path="/test/path", params={"foo": "bar"})
         self.assertEqual(result, SimpleNamespace(result="success"))
         self.client.connection_pool.urlopen.assert_called_once_with(
-            "GET", "https://ridewithgps.com/test/path?foo=bar", headers={}
+            "GET",
+            "https://ridewithgps.com/test/path?foo=bar",
+            headers={},
+            timeout=ANY,
         )
+        timeout = self.client.connection_pool.urlopen.call_args[1]["timeout"]
+        self.assertEqual((timeout.connect_timeout, timeout.read_timeout), (10.0, 60.0))
+
+    def test_per_call_timeout_and_deadline(self):
+        self.client.connection_pool = MagicMock()
+        self.client.connection_pool.urlopen.return_value = MagicMock(data=b"{}")
+        self.client.call(path="/test/path", timeout=(1, 2), deadline=30)
+        timeout = self.client.connection_pool.urlopen.call_args[1]["timeout"]
+        self.assertEqual((timeout._connect, timeout._read), (1.0, 2.0))
+        self.assertLessEqual(timeout.total, 30)
+
+    def test_no_timeout(self):
+        client = APIClient(timeout=None)
+        client.connection_pool = MagicMock()
+        client.connection_pool.urlopen.return_value = MagicMock(data=b"{}")
+        client.call(path="/test/path")
+        self.assertNotIn("timeout", client.connection_pool.urlopen.call_args[1])
+
+    def test_deadline_covers_rate_limit_wait(self):
+        client = APIClient(rate_limit_max=1, rate_limit_seconds=10)
+        client.connection_pool = MagicMock()
+        client.connection_pool.urlopen.return_value = MagicMock(data=b"{}")
+        client.call(path="/one")
+        started = time.monotonic()
+        with self.assertRaises(DeadlineExceededError):
+            client.call(path="/two", deadline=0.05)
+        self.assertLess(time.monotonic() - started, 1)
+        self.assertEqual(client.connection_pool.urlopen.call_count, 1)
 
 
 class TestAPIClientCaching(unittest.TestCase):
@@ -74,6 +114,192 @@ class TestAPIClientCaching(unittest.TestCase):
             [r.id for r in result2_page1.results + result2_page2.results], [1, 2, 3, 4]
         )
 
+    def test_mutation_invalidates_only_affected_entries(self):
+        self.client.call(path="/trips.json", params={"offset": 0, "limit": 2})
+        self.client.call(path="/routes/7.json")
+        self.client.call(path="/trips/1.json", method="PUT")
+        self.urlopen_calls.clear()
+
+        self.client.call(path="/routes/7.json")
+        self.assertEqual(self.urlopen_calls, [])
+        self.client.call(path="/trips.json", params={"offset": 0, "limit": 2})
+        self.assertEqual(len(self.urlopen_calls), 1)
+
+    def test_invalidate_cache(self):
+        self.client.call(path="/routes/7.json")
+        self.assertEqual(self.client.invalidate_cache("/api/v1/routes/7.json"), 1)
+        self.assertEqual(self.client.invalidate_cache("/api/v1/routes/7.json"), 0)
+
+
+class TestAPIClientHooks(unittest.TestCase):
+    def setUp(self):
+        self.client = APIClient(cache=True)
+        self.client.connection_pool = MagicMock()
+        mock_response = MagicMock()
+        mock_response.data = b'{"result": "success"}'
+        mock_response.status = 200
+        self.client.connection_pool.urlopen.return_value = mock_response
+        self.events = []
+        for event in HOOK_EVENTS:
+            self.client.add_hook(
+                event, lambda ctx, event=event: self.events.append((event, ctx))
+            )
+
+    def test_hooks_fire_in_order_with_timings(self):
+        self.client.call(path="/test/path", params={"foo": "bar"})
+        names = [name for name, _ in self.events]
+        self.assertEqual(names, ["before_request", "response", "handled", "converted"])
+        ctx = self.events[-1][1]
+        self.assertEqual(ctx.url, "https://ridewithgps.com/test/path?foo=bar")
+        self.assertEqual(ctx.status, 200)
+        self.assertEqual(ctx.response_bytes, len(b'{"result": "success"}'))
+        self.assertEqual(ctx.result, SimpleNamespace(result="success"))
+        self.assertLessEqual(ctx.elapsed("before_request"), ctx.elapsed("converted"))
+
+    def test_cache_hit_hook(self):
+        self.client.call(path="/test/path")
+        self.events.clear()
+        self.client.call(path="/test/path")
+        self.assertEqual([name for name, _ in self.events], ["cache_hit"])
+
+    def test_rate_limit_wait_hook(self):
+        self.client.ratelimiter.acquire = MagicMock(return_value=0.25)
+        self.client.call(path="/test/path")
+        event, ctx = self.events[0]
+        self.assertEqual(event, "rate_limit_wait")
+        self.assertEqual(ctx.rate_limit_wait, 0.25)
+
+    def test_add_hook_rejects_unknown_event(self):
+        with self.assertRaises(ValueError):
+            self.client.add_hook("nope", lambda ctx: None)
+
+    def test_remove_hook(self):
+        callback = MagicMock()
+        self.client.add_hook("converted", callback)
+        self.client.remove_hook("converted", callback)
+        self.client.call(path="/test/path")
+        callback.assert_not_called()
+
+
+class TestAPIClientRetries(unittest.TestCase):
+    def setUp(self):
+        self.client = APIClient(retry=RetryPolicy(total=2, backoff_factor=0))
+        self.client.connection_pool = MagicMock()
+        self.client.ratelimiter.acquire = MagicMock(return_value=0.0)
+        self.statuses = []
+
+        def urlopen(method, url, **kwargs):
+            status = self.statuses.pop(0)
+            if isinstance(status, Exception):
+                raise status
+            return SimpleNamespace(status=status, data=b'{"ok": true}', headers={})
+
+        self.client.connection_pool.urlopen.side_effect = urlopen
+
+    def test_get_retries_transient_status(self):
+        retried = MagicMock()
+        self.client.add_hook("retry", retried)
+        self.statuses = [503, 502, 200]
+        result = self.client.call(path="/trips.json")
+        self.assertEqual(result, SimpleNamespace(ok=True))
+        self.assertEqual(self.client.last_context.attempt, 3)
+        self.assertEqual(self.client.ratelimiter.acquire.call_count, 3)
+        self.assertEqual(self.client.metrics["retries"], 2)
+        self.assertEqual(self.client.metrics["retries.503"], 1)
+        self.assertEqual(retried.call_count, 2)
+
+    def test_gives_up_after_total(self):
+        self.statuses = [500, 500, 500]
+        self.client.call(path="/trips.json")
+        self.assertEqual(self.client.last_context.status, 500)
+        self.assertEqual(self.client.last_context.attempt, 3)
+
+    def test_retries_connection_errors(self):
+        self.statuses = [ProtocolError("reset"), 200]
+        self.client.call(path="/trips.json", method="DELETE")
+        self.assertEqual(self.client.metrics["retries.ProtocolError"], 1)
+
+    def test_post_needs_idempotency_key(self):
+        self.statuses = [503]
+        self.client.call(path="/trips.json", method="POST")
+        self.assertEqual(self.client.last_context.attempt, 1)
+
+        self.statuses = [503, 200]
+        self.client.call(path="/trips.json", method="POST", idempotency_key="abc")
+        self.assertEqual(self.client.last_context.attempt, 2)
+        headers = self.client.connection_pool.urlopen.call_args[1]["headers"]
+        self.assertEqual(headers["Idempotency-Key"], "abc")
+
+    def test_no_retry_past_deadline(self):
+        self.client.retry = RetryPolicy(total=5, backoff_factor=10, jitter=False)
+        self.statuses = [503, 200]
+        self.client.call(path="/trips.json", deadline=1)
+        self.assertEqual(self.client.last_context.status, 503)
+        self.assertEqual(self.client.metrics["retries"], 0)
+
+    def test_retry_disabled(self):
+        client = APIClient(retry=False)
+        self.assertIsNone(client.retry)
+
+    def test_per_call_retry_flags(self):
+        self.statuses = [503]
+        self.client.call(path="/trips.json", retry=False)
+        self.assertEqual(self.client.last_context.attempt, 1)
+        self.assertEqual(self.client.last_context.status, 503)
+
+        self.client.retry = None
+        self.statuses = [503, 200]
+        with patch("pyrwgps.retry.random.uniform", return_value=0):
+            self.assertEqual(
+                self.client.call(path="/trips.json", retry=True),
+                SimpleNamespace(ok=True),
+            )
+        self.assertEqual(self.client.last_context.attempt, 2)
+
+
+class _RedirectHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.startswith("/old"):
+            self.send_response(302)
+            self.send_header("Location", "/new.json")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        body = b'{"moved": true}'
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TestConnectionPool(unittest.TestCase):
+    def test_follows_redirects(self):
+        server = HTTPServer(("127.0.0.1", 0), _RedirectHandler)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        try:
+            client = APIClient(retry=False)
+            client.BASE_URL = f"http://127.0.0.1:{server.server_port}"
+            self.assertEqual(client.call(path="/old.json"), SimpleNamespace(moved=True))
+            self.assertEqual(client.last_context.status, 200)
+        finally:
+            server.shutdown()
+            server.server_close()
+
+    def test_connection_errors_are_not_retried_by_urllib3(self):
+        with socket.socket() as sock:
+            sock.bind(("127.0.0.1", 0))
+            port = sock.getsockname()[1]
+        client = APIClient(retry=False)
+        client.BASE_URL = f"http://127.0.0.1:{port}"
+        with self.assertRaises(urllib3.exceptions.HTTPError):
+            client.call(path="/trips.json")
+        self.assertEqual(client.last_context.attempt, 1)
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,92 @@
+import pytest
+
+from pyrwgps.breaker import (
+    CircuitBreaker,
+    CircuitOpenError,
+    endpoint_family,
+    endpoint_template,
+)
+from pyrwgps.fakeserver import FakeRideWithGPS
+from pyrwgps.retry import RetryPolicy
+
+
+class Clock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_keys():
+    assert endpoint_family("/api/v1/trips/1.json") == "v1"
+    assert endpoint_family("api/v1/routes.json") == "v1"
+    assert endpoint_family("/trips/1.tcx") == "legacy"
+    assert endpoint_template("/trips/123.tcx") == "/trips/{id}.tcx"
+    assert endpoint_template("users/42/gear.json?x=1") == "/users/{id}/gear.json"
+    assert endpoint_template("/api/v1/routes/5/polyline.json") == (
+        "/api/v1/routes/{id}/polyline.json"
+    )
+    assert CircuitBreaker(key=str.upper).key_for("/a") == "/A"
+    with pytest.raises(ValueError):
+        CircuitBreaker(key="host")
+
+
+def test_opens_probes_and_closes():
+    clock = Clock()
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=10, clock=clock)
+    for healthy in (False, False, True, False, False):
+        breaker.before("legacy")
+        breaker.after("legacy", healthy)
+    assert breaker.state("legacy") == "closed"
+    breaker.before("legacy")
+    breaker.after("legacy", False)
+    assert breaker.states() == {"legacy": "open"}
+    with pytest.raises(CircuitOpenError) as caught:
+        breaker.before("legacy")
+    assert caught.value.retry_after == pytest.approx(10)
+    breaker.before("v1")  # other groups are unaffected
+
+    clock.now += 10
+    assert breaker.state("legacy") == "half_open"
+    breaker.before("legacy")  # the probe
+    with pytest.raises(CircuitOpenError):
+        breaker.before("legacy")  # one probe at a time
+    breaker.after("legacy", False)
+    assert breaker.state("legacy") == "open"
+
+    clock.now += 10
+    breaker.before("legacy")
+    breaker.after("legacy", None)  # never sent: the probe slot is freed
+    breaker.before("legacy")
+    breaker.after("legacy", True)
+    assert breaker.state("legacy") == "closed"
+    breaker.reset()
+    assert breaker.states() == {}
+
+
+def test_client_fails_fast_on_a_degraded_family():
+    with FakeRideWithGPS(trips=5, track_points=5, degraded=r"^/trips/") as server:
+        breaker = CircuitBreaker(failure_threshold=3, reset_timeout=60)
+        retry = RetryPolicy(total=1, backoff_factor=0, jitter=False)
+        client = server.client(
+            apikey="fake", rate_limit_max=1000, breaker=breaker, retry=retry
+        )
+        with pytest.raises(CircuitOpenError):
+            for _ in range(3):
+                client.download_trip_file(1, "tcx")
+        assert server.requests[("GET", "/trips/1.tcx")] == 3
+        with pytest.raises(CircuitOpenError):
+            client.download_trip_file(2, "gpx")
+        assert server.requests[("GET", "/trips/2.gpx")] == 0
+        assert client.metrics["circuit_open"] == 2
+        assert breaker.states() == {"legacy": "open"}
+
+        # The v1 API keeps working.
+        assert client.get(path="/api/v1/trips/1.json").trip.id == 1
+        assert breaker.state("v1") == "closed"
+
+        server.degraded = None
+        breaker.reset_timeout = 0
+        assert client.download_trip_file(2, "gpx")
+        assert breaker.state("legacy") == "closed"
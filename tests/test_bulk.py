@@ -0,0 +1,64 @@
+from pyrwgps.apiclient import DeadlineExceededError
+from pyrwgps.bulk import bulk_update
+from pyrwgps.fakeserver import FakeRideWithGPS
+
+
+def test_bulk_update_renames_trips_concurrently():
+    progress = []
+    with FakeRideWithGPS(trips=40, latency=0.01) as server:
+        client = server.client(apikey="fake", rate_limit_max=1000)
+        report = client.bulk_update(
+            ((f"/trips/{i}.json", {"name": f"Trip #{i}"}) for i in range(1, 41)),
+            max_workers=8,
+            progress=lambda done, item: progress.append(done),
+        )
+        names = {t["name"] for t in server.records["trips"].values()}
+    assert len(report) == 40
+    assert not report.failed
+    assert [r.index for r in report] == list(range(40))
+    assert report.results[4].result.trip.name == "Trip #5"
+    assert names == {f"Trip #{i}" for i in range(1, 41)}
+    assert sorted(progress) == list(range(1, 41))
+
+
+def test_bulk_update_retries_transient_failures():
+    with FakeRideWithGPS(trips=20, failure_rate=0.3, seed=7) as server:
+        client = server.client(apikey="fake", rate_limit_max=1000)
+        report = bulk_update(
+            client,
+            [(f"/trips/{i}.json", {"name": "x"}) for i in range(1, 21)],
+            retries=10,
+            backoff=0.001,
+        )
+        assert server.statuses[500] > 0
+    assert not report.failed
+    assert max(r.attempts for r in report) > 1
+
+
+def test_bulk_update_records_permanent_failures():
+    with FakeRideWithGPS(trips=3) as server:
+        client = server.client(apikey="fake", rate_limit_max=1000)
+        report = client.bulk_update(
+            [("/trips/1.json", {"name": "a"}), ("/trips/999.json", {"name": "b"})],
+            method="PATCH",
+        )
+    assert [r.ok for r in report] == [True, False]
+    missing = report.failed[0]
+    assert missing.status == 404
+    assert missing.attempts == 1
+
+
+def test_bulk_update_deadline_covers_rate_limit_waits():
+    with FakeRideWithGPS(trips=50) as server:
+        client = server.client(apikey="fake", rate_limit_max=5, rate_limit_seconds=10)
+        report = client.bulk_update(
+            ((f"/trips/{i}.json", {"name": "x"}) for i in range(1, 51)),
+            max_workers=2,
+            deadline=0.2,
+        )
+        assert server.requests[("PUT", "/trips/1.json")] == 1
+    assert not report.complete
+    assert len(report.succeeded) == 5
+    assert report.failed
+    assert all(isinstance(r.error, DeadlineExceededError) for r in report.failed)
+    assert report.elapsed < 1
@@ -0,0 +1,125 @@
+import pytest
+
+from pyrwgps.cache import ResponseCache, cache_key, identity_scope, resource_of
+from pyrwgps.fakeserver import FakeRideWithGPS
+
+
+@pytest.mark.parametrize(
+    "path, expected",
+    [
+        ("/api/v1/trips/123.json", ("trips", "123")),
+        ("/trips/123.json", ("trips", "123")),
+        ("/trips/123", ("trips", "123")),
+        ("/trips/123.gpx", ("trips", "123")),
+        ("/api/v1/routes/5/polyline.json", ("routes", "5")),
+        ("/api/v1/trips.json", ("trips", None)),
+        ("/users/1/trips.json", ("trips", None)),
+        ("/users/1/gear.json", ("gear", None)),
+        ("/api/v1/sync.json?since=2026-01-01", ("sync", None)),
+    ],
+)
+def test_resource_of(path, expected):
+    assert resource_of(path) == expected
+
+
+@pytest.fixture
+def cache():
+    cache = ResponseCache()
+    for path in [
+        "/api/v1/trips/1.json",
+        "/trips/1.json",
+        "/api/v1/trips/2.json",
+        "/api/v1/trips.json",
+        "/users/9/trips.json",
+        "/api/v1/routes/1.json",
+        "/api/v1/routes.json",
+        "/api/v1/sync.json",
+        "/api/v1/collections/4.json",
+    ]:
+        cache.set((path, ()), path, object())
+    return cache
+
+
+def _paths(cache):
+    return sorted(key[0] for key in cache._entries)
+
+
+def test_update_drops_resource_and_its_lists(cache):
+    assert cache.invalidate("/trips/1.json") == 5
+    assert _paths(cache) == [
+        "/api/v1/collections/4.json",
+        "/api/v1/routes.json",
+        "/api/v1/routes/1.json",
+        "/api/v1/trips/2.json",
+    ]
+
+
+def test_create_drops_only_lists(cache):
+    cache.invalidate("/routes.json")
+    assert "/api/v1/routes/1.json" in _paths(cache)
+    assert "/api/v1/routes.json" not in _paths(cache)
+    assert "/api/v1/trips/1.json" in _paths(cache)
+
+
+def test_add_dependency_rule(cache):
+    cache.add_dependency("/routes/*", "/api/v1/collections/*")
+    cache.invalidate("/routes/1.json")
+    assert "/api/v1/collections/4.json" not in _paths(cache)
+
+
+def test_clear(cache):
+    cache.clear()
+    assert len(cache) == 0
+    assert cache.invalidate("/trips/1.json") == 0
+
+
+def test_max_entries_drops_least_recently_used():
+    cache = ResponseCache(max_entries=2)
+    for trip_id in (1, 2):
+        path = f"/api/v1/trips/{trip_id}.json"
+        cache.set((path, ()), path, trip_id)
+    assert cache.get(("/api/v1/trips/1.json", ())) == 1
+    cache.set(("/api/v1/trips/3.json", ()), "/api/v1/trips/3.json", 3)
+    assert _paths(cache) == ["/api/v1/trips/1.json", "/api/v1/trips/3.json"]
+    assert cache.get(("/api/v1/trips/2.json", ()), "gone") == "gone"
+    assert cache.invalidate("/trips/1.json") == 1 and len(cache) == 1
+
+
+def test_cache_key_is_canonical_for_nested_params():
+    a = cache_key("/x.json", {"b": [1, {"z": 1, "y": 2}], "a": {"q": 1}})
+    b = cache_key("/x.json", {"a": {"q": 1}, "b": [1, {"y": 2, "z": 1}]})
+    assert a == b
+    hash(a)
+
+
+def test_cache_key_drops_credentials_and_keeps_scope():
+    plain = cache_key("/x.json", {"version": 2}, scope="u1")
+    assert cache_key("/x.json", {"version": 2, "auth_token": "t"}, "u1") == plain
+    assert cache_key("/x.json", {"version": 2}, scope="u2") != plain
+    assert cache_key("/x.json", {"version": 3}, scope="u1") != plain
+
+
+def test_identity_scope_hides_secret():
+    scope = identity_scope("secret-token")
+    assert scope == identity_scope("secret-token")
+    assert "secret" not in scope
+    assert identity_scope(None) is None
+
+
+def test_shared_paths_drop_scope():
+    cache = ResponseCache(shared=["/api/v1/routes/*"])
+    assert cache.key("/api/v1/routes/1.json", None, "u1") == cache.key(
+        "/api/v1/routes/1.json", None, "u2"
+    )
+    assert cache.key("/api/v1/trips/1.json", None, "u1") != cache.key(
+        "/api/v1/trips/1.json", None, "u2"
+    )
+
+
+def test_client_scopes_by_the_credential_sent():
+    with FakeRideWithGPS(trips=3) as server:
+        client = server.client(apikey="fake", cache=True, rate_limit_max=1000)
+        for token in ("userA", "userB", "userA"):
+            client.get(path="/api/v1/trips/1.json", params={"auth_token": token})
+        client.get(path="/api/v1/trips/1.json")
+        assert server.requests[("GET", "/api/v1/trips/1.json")] == 3
@@ -0,0 +1,105 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+from pyrwgps.cli import main
+from pyrwgps.fakeserver import FakeRideWithGPS
+
+
+@pytest.fixture
+def server():
+    with FakeRideWithGPS(trips=25, track_points=5, seed=1) as fake:
+        yield fake
+
+
+def run(server, *argv):
+    return main(
+        ["--apikey", "fake", "--base-url", server.url, "--rate-limit", "1000", *argv]
+    )
+
+
+def test_help_does_not_load_the_http_client():
+    code = (
+        "import sys, pyrwgps.cli; pyrwgps.cli.build_parser().format_help(); "
+        "print('urllib3' in sys.modules, 'pyrwgps.ridewithgps' in sys.modules)"
+    )
+    out = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, check=True
+    )
+    assert out.stdout.split() == ["False", "False"]
+
+
+def test_missing_credentials_exit(server, monkeypatch):
+    monkeypatch.delenv("RIDEWITHGPS_KEY", raising=False)
+    with pytest.raises(SystemExit, match="RIDEWITHGPS_KEY"):
+        main(["--base-url", server.url, "list", "/api/v1/trips.json"])
+
+
+def test_list_writes_ndjson(server, capsys):
+    assert (
+        run(server, "list", "/api/v1/trips.json", "--limit", "3", "--fields", "id,name")
+        == 0
+    )
+    lines = capsys.readouterr().out.splitlines()
+    assert [json.loads(line) for line in lines] == [
+        {"id": i, "name": f"Fake trip {i}"} for i in range(1, 4)
+    ]
+
+
+def test_list_legacy_csv(server, capsys):
+    argv = ["list", "/users/1/trips.json", "--format", "csv", "--fields", "id"]
+    assert run(server, *argv, "--param", "offset=20") == 0
+    assert capsys.readouterr().out.split() == ["id", "21", "22", "23", "24", "25"]
+
+
+def test_export(server, tmp_path):
+    target = tmp_path / "trips.jsonl"
+    assert run(server, "export", "/api/v1/trips.json", str(target)) == 0
+    assert len(target.read_text(encoding="utf8").splitlines()) == 25
+
+
+def test_download_trips_skips_existing(server, tmp_path):
+    out = str(tmp_path)
+    assert run(server, "download-trips", "1", "2", "--out", out) == 0
+    assert sorted(os.listdir(out)) == ["1.gpx", "2.gpx"]
+    before = server.requests[("GET", "/trips/1.gpx")]
+    assert run(server, "download-trips", "1", "3", "--out", out) == 0
+    assert server.requests[("GET", "/trips/1.gpx")] == before
+    assert os.path.exists(tmp_path / "3.gpx")
+
+
+def test_sync_downloads_only_new_trips(server, tmp_path):
+    argv = ["--cache-dir", str(tmp_path), "sync", "--concurrency", "4"]
+    assert run(server, *argv) == 0
+    trips = tmp_path / "trips"
+    assert len(list(trips.glob("*.gpx"))) == 25
+    assert len(json.loads((trips / ".sync.json").read_text(encoding="utf8"))) == 25
+
+    (trips / "7.gpx").unlink()
+    downloads = sum(
+        n for (_, path), n in server.requests.items() if path.endswith(".gpx")
+    )
+    assert run(server, *argv) == 0
+    after = sum(n for (_, path), n in server.requests.items() if path.endswith(".gpx"))
+    assert after - downloads == 1
+
+
+def test_error_responses_are_failures_not_files(server, tmp_path, monkeypatch):
+    out = str(tmp_path)
+    assert run(server, "download-trips", "1", "99999", "--out", out) == 1
+    assert os.listdir(out) == ["1.gpx"]
+
+    monkeypatch.setattr("pyrwgps.retry.RetryPolicy.backoff", lambda *args: 0.0)
+    server.degraded = r"^/trips/3\.gpx$"
+    argv = ["--cache-dir", str(tmp_path), "sync"]
+    assert run(server, *argv) == 1
+    trips = tmp_path / "trips"
+    assert not (trips / "3.gpx").exists()
+    assert "3" not in json.loads((trips / ".sync.json").read_text(encoding="utf8"))
+
+    server.degraded = None
+    assert run(server, *argv) == 0
+    assert (trips / "3.gpx").exists()
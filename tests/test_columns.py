@@ -0,0 +1,77 @@
+import math
+from array import array
+
+import pytest
+
+from pyrwgps.columns import ColumnBuilder, to_frame, typed_column
+from pyrwgps.fakeserver import FakeRideWithGPS
+
+
+@pytest.fixture
+def client():
+    with FakeRideWithGPS(trips=57, seed=1) as fake:
+        yield fake.client(apikey="fake", rate_limit_max=1000)
+
+
+def test_typed_column_picks_narrowest_type():
+    assert typed_column([1, 2]) == array("q", [1, 2])
+    assert typed_column([1, 2.5]) == array("d", [1.0, 2.5])
+    with_missing = typed_column([1, None])
+    assert with_missing.typecode == "d" and math.isnan(with_missing[1])
+    assert typed_column(["a", None]) == ["a", None]
+    assert typed_column([True, False]) == [True, False]
+    assert typed_column([2**70]) == [2**70]
+
+
+def test_builder_pads_missing_fields():
+    builder = ColumnBuilder()
+    builder.add([{"id": 1, "user": {"name": "u"}}])
+    builder.add([{"id": 2, "extra": "x"}, {"id": 3}])
+    columns = builder.build()
+    assert len(builder) == 3
+    assert list(columns) == ["id", "user.name", "extra"]
+    assert columns["user.name"] == ["u", None, None]
+    assert columns["extra"] == [None, "x", None]
+
+    nested = ColumnBuilder(flatten=False)
+    nested.add([{"id": 1, "user": {"name": "u"}}])
+    assert nested.build()["user"] == [{"name": "u"}]
+
+
+@pytest.mark.parametrize(
+    "path, result_key",
+    [("/api/v1/trips.json", "trips"), ("/users/1/trips.json", "results")],
+)
+def test_to_columns_walks_both_paginators(client, path, result_key):
+    columns = client.to_columns(path, result_key=result_key, prefetch=1)
+    assert columns["id"] == array("q", range(1, 58))
+    assert columns["distance"].typecode == "d"
+    assert columns["name"][0] == "Fake trip 1"
+    assert columns["user.name"][56] == "Fake User"
+
+
+def test_list_frame(client):
+    pytest.importorskip("pandas")
+    frame = client.list_frame(
+        "/api/v1/trips.json",
+        result_key="trips",
+        fields=["id", "distance", "user.name"],
+        index="id",
+    )
+    assert list(frame.columns) == ["distance", "user.name"]
+    assert str(frame["distance"].dtype) == "float64"
+    assert frame.loc[3, "distance"] == pytest.approx(1000.0 + 3 * 37.5)
+    assert len(frame) == 57
+
+
+def test_to_frame_shares_numeric_columns():
+    np = pytest.importorskip("numpy")
+    pytest.importorskip("pandas")
+    columns = {
+        "id": array("q", [1, 2]),
+        "km": array("d", [1.5, 2.5]),
+        "name": ["a", "b"],
+    }
+    frame = to_frame(columns, index="id")
+    assert np.shares_memory(frame["km"].to_numpy(), np.frombuffer(columns["km"]))
+    assert list(frame.index) == [1, 2] and list(frame["name"]) == ["a", "b"]
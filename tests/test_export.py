@@ -0,0 +1,103 @@
+import csv
+import io
+import json
+
+import pytest
+
+from pyrwgps.export import NDJSONSink, export, format_of
+from pyrwgps.fakeserver import FakeRideWithGPS
+from pyrwgps.projection import flatten
+
+
+@pytest.fixture
+def client():
+    with FakeRideWithGPS(trips=57, seed=1) as fake:
+        yield fake.client(apikey="fake", rate_limit_max=1000)
+
+
+def test_flatten_uses_dotted_keys():
+    record = {"id": 1, "user": {"id": 9, "name": "u"}, "tags": [1], "meta": {}}
+    assert flatten(record) == {
+        "id": 1,
+        "user.id": 9,
+        "user.name": "u",
+        "tags": [1],
+        "meta": {},
+    }
+
+
+def test_list_raw_yields_parsed_json(client):
+    trips = list(client.list("/api/v1/trips.json", result_key="trips", raw=True))
+    assert len(trips) == 57
+    assert trips[0]["user"] == {"id": 1, "name": "Fake User"}
+
+
+def test_format_from_suffix():
+    assert format_of("trips.jsonl") == "ndjson"
+    assert format_of("trips.Parquet") == "parquet"
+    with pytest.raises(ValueError):
+        format_of("trips.txt")
+
+
+def test_export_ndjson_in_batches(client, tmp_path):
+    target = tmp_path / "trips.ndjson"
+    count = client.export(
+        "/api/v1/trips.json", str(target), result_key="trips", batch_size=10
+    )
+    lines = target.read_text(encoding="utf8").splitlines()
+    assert count == len(lines) == 57
+    assert json.loads(lines[-1])["name"] == "Fake trip 57"
+
+
+def test_export_to_open_file_leaves_it_open(client):
+    out = io.StringIO()
+    count = export(
+        client, "/users/1/trips.json", NDJSONSink(out), limit=5, fields=["id"]
+    )
+    assert count == 5
+    assert [json.loads(line) for line in out.getvalue().splitlines()] == [
+        {"id": i} for i in range(1, 6)
+    ]
+
+
+def test_export_csv_flattens_nested_fields(client, tmp_path):
+    target = tmp_path / "trips.csv"
+    client.export(
+        "/api/v1/trips.json",
+        target,
+        result_key="trips",
+        fields=["id", "name", "user.name"],
+    )
+    with open(target, encoding="utf8", newline="") as handle:
+        rows = list(csv.DictReader(handle))
+    assert len(rows) == 57
+    assert rows[0] == {"id": "1", "name": "Fake trip 1", "user.name": "Fake User"}
+
+
+def test_export_parquet_and_arrow_round_trip(client, tmp_path):
+    pa = pytest.importorskip("pyarrow")
+    pq = pytest.importorskip("pyarrow.parquet")
+    parquet = tmp_path / "trips.parquet"
+    client.export("/api/v1/trips.json", parquet, result_key="trips", batch_size=20)
+    table = pq.read_table(parquet)
+    assert table.num_rows == 57
+    assert pq.ParquetFile(parquet).num_row_groups == 3
+    assert table.column("user.name")[0].as_py() == "Fake User"
+    # gear_id is always null: stored as a string column rather than null type.
+    assert table.schema.field("gear_id").type == pa.string()
+
+    arrow = tmp_path / "trips.arrow"
+    client.export("/api/v1/trips.json", arrow, result_key="trips", limit=30)
+    with pa.ipc.open_file(arrow) as reader:
+        assert reader.read_all().column("id").to_pylist() == list(range(1, 31))
+
+
+def test_export_parquet_rejects_lossy_type_change(tmp_path):
+    pytest.importorskip("pyarrow")
+    from pyrwgps.export import ParquetSink
+
+    with ParquetSink(tmp_path / "x.parquet") as sink:
+        sink.write_batch([{"id": 1, "n": 1}])
+        sink.write_batch([{"id": 2}])  # missing columns are null
+        with pytest.raises(ValueError, match="'n'"):
+            sink.write_batch([{"id": 3, "n": 1.5}])
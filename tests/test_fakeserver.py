@@ -0,0 +1,100 @@
+import time
+
+import pytest
+import urllib3
+
+from pyrwgps.apiclient import DeadlineExceededError
+from pyrwgps.fakeserver import FakeRideWithGPS
+
+
+@pytest.fixture
+def server():
+    with FakeRideWithGPS(trips=45, routes=5, seed=1) as fake:
+        yield fake
+
+
+def test_authenticate_against_fake_server(server):
+    client = server.client(apikey="fake")
+    user = client.authenticate(email="a@example.com", password="pw")
+    assert user.id == server.user_id
+    assert client.auth_token == "FAKE_TOKEN"
+
+
+def test_list_v1_pagination(server):
+    client = server.client(apikey="fake")
+    trips = list(
+        client.list("/api/v1/trips.json", params={"page_size": 20}, result_key="trips")
+    )
+    assert [t.id for t in trips] == list(range(1, 46))
+    assert server.requests[("GET", "/api/v1/trips.json")] == 3
+
+
+def test_pages_answered_after_stop_keep_their_links():
+    fake = FakeRideWithGPS(trips=45).start()
+    url = fake.url
+    fake.stop()
+    with pytest.raises(RuntimeError):
+        fake.url  # pylint: disable=pointless-statement
+    # A handler still answering an in-flight request.
+    status, page, _ = fake.handle("GET", "/api/v1/trips.json", {}, {})
+    assert status == 200
+    assert page["meta"]["pagination"]["next_page_url"].startswith(url)
+
+
+def test_list_legacy_pagination(server):
+    client = server.client(client_id="cid", client_secret="csec", access_token="t")
+    trips = list(client.list("/users/1/trips.json", limit=30))
+    assert [t.id for t in trips] == list(range(1, 31))
+
+
+def test_update_and_delete(server):
+    client = server.client(apikey="fake")
+    response = client.put(path="/trips/3.json", params={"name": "Renamed"})
+    assert response.trip.name == "Renamed"
+    client.delete(path="/api/v1/trips/3.json")
+    assert 3 not in server.records["trips"]
+
+
+def test_download_trip_file(server):
+    client = server.client(apikey="fake")
+    data = client.download_trip_file(1, "gpx")
+    assert data.startswith(b"<?xml")
+    assert data.count(b"<trkpt") == server.track_points
+
+
+def test_injected_rate_limit_and_failures():
+    with FakeRideWithGPS(rate_limit_rate=1.0) as fake:
+        client = fake.client(apikey="fake", retry=False)
+        response = client.get(path="/api/v1/trips/1.json")
+        assert response.error == "Rate limit exceeded"
+        assert fake.statuses[429] == 1
+    with FakeRideWithGPS(failure_rate=1.0) as fake:
+        client = fake.client(apikey="fake", retry=False)
+        client.get(path="/api/v1/trips/1.json")
+        assert fake.statuses[500] == 1
+
+
+def test_read_timeout():
+    with FakeRideWithGPS(latency=0.5) as fake:
+        client = fake.client(apikey="fake", timeout=(1, 0.05), retry=False)
+        with pytest.raises(urllib3.exceptions.HTTPError):
+            client.get(path="/api/v1/trips/1.json")
+
+
+def test_list_deadline_stops_requesting_pages():
+    with FakeRideWithGPS(trips=100, latency=0.05) as fake:
+        client = fake.client(apikey="fake", rate_limit_max=1000)
+        seen = []
+        started = time.monotonic()
+        with pytest.raises(DeadlineExceededError):
+            for trip in client.list(
+                "/api/v1/trips.json",
+                params={"page_size": 5},
+                result_key="trips",
+                deadline=0.2,
+            ):
+                seen.append(trip.id)
+        assert time.monotonic() - started < 0.5
+        assert 0 < len(seen) < 100
+        # At most the page in flight when the deadline passed was lost.
+        assert fake.requests[("GET", "/api/v1/trips.json")] <= len(seen) // 5 + 1
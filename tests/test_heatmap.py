@@ -0,0 +1,106 @@
+import struct
+import zlib
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from pyrwgps.cli import main  # noqa: E402
+from pyrwgps.fakeserver import FakeRideWithGPS  # noqa: E402
+from pyrwgps.heatmap import Heatmap, rasterize  # noqa: E402
+from pyrwgps.polyline import encode  # noqa: E402
+
+# About 1.5 km east along a parallel: a horizontal run of pixels at zoom 14.
+EAST = [(40.0, -105.30), (40.0, -105.28)]
+
+
+def test_rasterize_counts_each_trip_once_per_pixel():
+    pixels, counts = rasterize([EAST, EAST[::-1] + EAST, [(40.0, -105.29)]], 14)
+    world = 256 * 2**14
+    rows, columns = pixels // world, pixels % world
+    assert len(set(rows.tolist())) == 1
+    # A gap-free run from one end to the other.
+    assert np.array_equal(np.diff(np.sort(columns)), np.ones(len(columns) - 1))
+    assert set(counts.tolist()) == {2, 3}
+    assert counts.sum() == 2 * len(columns) + 1
+
+    encoded, _ = rasterize([encode(EAST)], 14)
+    assert np.array_equal(encoded, pixels)
+    jump, _ = rasterize([[(40.0, -105.0), (40.0, 20.0)]], 14)
+    assert len(jump) == 2
+    assert len(rasterize([], 14)[0]) == 0
+
+
+def test_tiles_accumulate_incrementally(tmp_path):
+    heatmap = Heatmap(str(tmp_path), zooms=(14, 12))
+    assert heatmap.add_many([(1, EAST), (2, encode(EAST))]) == 2
+    assert not heatmap.add(1, EAST)
+    x, y = heatmap.tile_of(40.0, -105.29, 14)
+    assert (x, y) in heatmap.tiles(14) and heatmap.tiles(13) == []
+    assert heatmap.tile(14, x, y).max() == 2
+
+    reopened = Heatmap(str(tmp_path))
+    assert reopened.zooms == (12, 14) and 2 in reopened
+    reopened.add(3, EAST)
+    assert Heatmap(str(tmp_path)).tile(14, x, y).max() == 3
+    assert not Heatmap(str(tmp_path)).tile(14, 0, 0).any()
+    with pytest.raises(ValueError):
+        Heatmap(str(tmp_path), zooms=(10,))
+
+    png = reopened.png(14, x, y, saturate=3)
+    assert png.startswith(b"\x89PNG") and png[12:16] == b"IHDR"
+    assert struct.unpack(">II", png[16:24]) == (256, 256)
+    size = struct.unpack(">I", png[33:37])[0]
+    data = png[41:][:size]
+    rows = np.frombuffer(zlib.decompress(data), np.uint8)
+    alpha = rows.reshape(256, 256 * 4 + 1)[:, 1:].reshape(256, 256, 4)[..., 3]
+    assert (
+        alpha.max() == 255 and (alpha > 0).sum() == (heatmap.tile(14, x, y) > 0).sum()
+    )
+
+
+def test_processes_match_in_process(tmp_path):
+    lines = [
+        (trip_id, [(40.0 + trip_id * 1e-3, -105.3), (40.01, -105.28 + trip_id * 1e-3)])
+        for trip_id in range(12)
+    ]
+    serial = Heatmap(str(tmp_path / "serial"))
+    parallel = Heatmap(str(tmp_path / "parallel"))
+    assert serial.add_many(lines, batch_size=5) == 12
+    assert parallel.add_many(lines, processes=2, batch_size=5) == 12
+    assert serial.tiles(12) == parallel.tiles(12)
+    for x, y in serial.tiles(12):
+        assert np.array_equal(serial.tile(12, x, y), parallel.tile(12, x, y))
+
+
+def test_update_and_sync(tmp_path):
+    with FakeRideWithGPS(trips=6, track_points=20) as server:
+        client = server.client(apikey="fake", rate_limit_max=1000)
+        heatmap = Heatmap(str(tmp_path / "heat"))
+        assert heatmap.update(client, [1, 2]) == 2
+        assert heatmap.update(client) == 4
+        assert heatmap.update(client) == 0
+        assert server.requests[("GET", "/api/v1/trips/1/polyline.json")] == 1
+
+        argv = ["--apikey", "fake", "--base-url", server.url, "--rate-limit", "1000"]
+        argv += ["--cache-dir", str(tmp_path), "sync", "--heatmap", str(tmp_path / "h")]
+        assert main(argv + ["--heatmap-zooms", "10,12"]) == 0
+    assert Heatmap(str(tmp_path / "h")).trips == set(range(1, 7))
+    assert Heatmap(str(tmp_path / "h")).zooms == (10, 12)
+
+
+def test_update_skips_missing_items(tmp_path, monkeypatch):
+    with FakeRideWithGPS(trips=3, track_points=10) as server:
+        client = server.client(apikey="fake", rate_limit_max=1000)
+        heatmap = Heatmap(str(tmp_path / "heat"))
+        assert heatmap.update(client, [1, 99999, 2]) == 2
+        assert heatmap.trips == {1, 2}
+        assert list(heatmap.failed) == [99999]
+        assert heatmap.update(client, [3]) == 1 and heatmap.failed == {}
+
+        server.degraded = r"^/api/v1/trips/2/polyline"
+        argv = ["--apikey", "fake", "--base-url", server.url, "--rate-limit", "1000"]
+        argv += ["--cache-dir", str(tmp_path), "sync", "--heatmap", str(tmp_path / "h")]
+        monkeypatch.setattr("pyrwgps.retry.RetryPolicy.backoff", lambda *args: 0.0)
+        assert main(argv) == 1
+    assert Heatmap(str(tmp_path / "h")).trips == {1, 3}
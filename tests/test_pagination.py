@@ -0,0 +1,224 @@
+import time
+
+import pytest
+
+from pyrwgps.fakeserver import FakeRideWithGPS
+from pyrwgps.hooks import RequestContext
+from pyrwgps.pagination import ListCursor, PageFetcher, PageSizer
+
+
+def test_cursor_round_trips_through_json():
+    cursor = ListCursor(
+        "/api/v1/routes.json", {"q": "x"}, "routes", page_size=50, offset=120
+    )
+    cursor.yielded = 120
+    restored = ListCursor.from_json(cursor.to_json())
+    assert restored == cursor
+    assert restored.page == 3
+
+
+def test_start_reads_pagination_params():
+    v1 = ListCursor.start("/api/v1/trips.json", {"page": 3, "page_size": 20}, "trips")
+    assert (v1.offset, v1.page_size, v1.params) == (40, 20, {})
+    legacy = ListCursor.start(
+        "/users/1/trips.json", {"offset": 7, "limit": 5}, "results"
+    )
+    assert (legacy.offset, legacy.params) == (7, {})
+
+
+@pytest.fixture
+def server():
+    with FakeRideWithGPS(trips=45, seed=1) as fake:
+        yield fake
+
+
+@pytest.mark.parametrize(
+    "path, params, result_key",
+    [
+        ("/api/v1/trips.json", {"page_size": 10}, "trips"),
+        ("/users/1/trips.json", None, "results"),
+    ],
+)
+def test_resume_mid_page_from_saved_cursor(server, path, params, result_key):
+    client = server.client(apikey="fake", rate_limit_max=1000)
+    walk = client.list(path, params=params, result_key=result_key)
+    first = [next(walk).id for _ in range(23)]
+    saved = walk.cursor.to_json()
+    walk.close()
+
+    resumed = client.list(path, cursor=ListCursor.from_json(saved))
+    rest = [trip.id for trip in resumed]
+    assert first + rest == list(range(1, 46))
+    assert resumed.cursor.done
+    assert resumed.cursor.yielded == 45
+    assert list(client.list(path, cursor=resumed.cursor)) == []
+
+
+def test_limit_counts_items_before_resume(server):
+    client = server.client(apikey="fake", rate_limit_max=1000)
+    walk = client.list("/api/v1/trips.json", result_key="trips", limit=5)
+    assert len(list(walk)) == 5
+    more = client.list("/api/v1/trips.json", cursor=walk.cursor, limit=12)
+    assert [t.id for t in more] == list(range(6, 13))
+
+
+def test_limit_across_pages_does_not_repeat_items(server):
+    client = server.client(apikey="fake", rate_limit_max=1000)
+    trips = client.list(
+        "/api/v1/trips.json", params={"page_size": 20}, result_key="trips", limit=30
+    )
+    assert [t.id for t in trips] == list(range(1, 31))
+
+
+def test_cursor_follows_server_page_size_cap():
+    with FakeRideWithGPS(trips=45, max_page_size=10) as fake:
+        client = fake.client(apikey="fake", rate_limit_max=1000)
+        walk = client.list("/api/v1/trips.json", result_key="trips")
+        first = [next(walk).id for _ in range(15)]
+        assert walk.cursor.page_size == 10
+        rest = [t.id for t in client.list("/api/v1/trips.json", cursor=walk.cursor)]
+    assert first + rest == list(range(1, 46))
+
+
+def test_cursor_path_must_match(server):
+    client = server.client(apikey="fake")
+    cursor = ListCursor("/api/v1/trips.json", result_key="trips")
+    with pytest.raises(ValueError):
+        client.list("/api/v1/routes.json", cursor=cursor)
+
+
+@pytest.mark.parametrize(
+    "path, params, result_key",
+    [
+        ("/api/v1/trips.json", {"page_size": 10}, "trips"),
+        ("/users/1/trips.json", None, "results"),
+    ],
+)
+def test_prefetch_yields_same_items_without_extra_requests(path, params, result_key):
+    with FakeRideWithGPS(trips=245) as fake:
+        client = fake.client(apikey="fake", rate_limit_max=1000)
+        items = client.list(path, params=params, result_key=result_key, prefetch=3)
+        assert [t.id for t in items] == list(range(1, 246))
+        pages = fake.requests[("GET", path)]
+        limited = client.list(
+            path, params=params, result_key=result_key, limit=25, prefetch=3
+        )
+        assert [t.id for t in limited] == list(range(1, 26))
+        assert fake.requests[("GET", path)] - pages == (3 if params else 1)
+
+
+def test_prefetch_overlaps_network_and_consumer():
+    with FakeRideWithGPS(trips=60, latency=0.1) as fake:
+        client = fake.client(apikey="fake", rate_limit_max=1000)
+        started = time.monotonic()
+        for trip in client.list(
+            "/api/v1/trips.json",
+            params={"page_size": 10},
+            result_key="trips",
+            prefetch=1,
+        ):
+            time.sleep(0.01)  # 0.1 s of work per page
+        elapsed = time.monotonic() - started
+    # Sequentially this takes about 6 * (0.1 + 0.1) = 1.2 s.
+    assert elapsed < 0.9
+
+
+def test_closing_a_walk_leaves_no_requests_in_flight():
+    started, finished = [], []
+
+    def fetch(params):
+        started.append(params["page"])
+        time.sleep(0.1)
+        finished.append(params["page"])
+
+    fetcher = PageFetcher(fetch, depth=1)
+    fetcher.prefetch([{"page": 2}, {"page": 3}])
+    fetcher.prefetch([{"page": 3}])
+    time.sleep(0.02)
+    fetcher.close()
+    assert started == finished == [2]
+
+    with FakeRideWithGPS(trips=100, latency=0.05) as fake:
+        client = fake.client(apikey="fake", rate_limit_max=1000)
+        items = client.list(
+            "/api/v1/trips.json",
+            params={"page_size": 10},
+            result_key="trips",
+            prefetch=3,
+        )
+        assert next(items).id == 1
+        items.close()
+        sent = sum(fake.statuses.values())
+        time.sleep(0.1)
+        assert (
+            sum(fake.statuses.values())
+            == sent
+            == fake.requests[("GET", "/api/v1/trips.json")]
+        )
+
+
+def _ctx(nbytes, latency):
+    ctx = RequestContext("GET", "/api/v1/trips.json")
+    ctx.response_bytes = nbytes
+    ctx.timings = {"before_request": 1.0, "response": 1.0 + latency}
+    return ctx
+
+
+def test_page_sizer_grows_under_rate_limit_until_max():
+    sizer = PageSizer(max_size=400).start(50, min_interval=0.5)
+    sizes = [50]
+    for _ in range(5):
+        sizes.append(sizer.observe(sizes[-1], sizes[-1], _ctx(1000, 0.05)))
+    assert sizes == [50, 100, 200, 400, 400, 400]
+
+
+def test_page_sizer_shrinks_over_bounds():
+    sizer = PageSizer(max_bytes=100_000, max_latency=1.0).start(200)
+    assert sizer.observe(200, 200, _ctx(150_000, 0.1)) == 100
+    assert sizer.observe(100, 100, _ctx(10_000, 2.0)) == 50
+    # Never grows back into a size that went over a bound.
+    assert sizer.observe(50, 50, _ctx(10_000, 0.1)) == 50
+    # A coarse clock (or a fake server) can measure no latency at all.
+    sizer = PageSizer(max_bytes=100_000).start(200)
+    assert sizer.observe(200, 200, _ctx(150_000, 0.0)) == 100
+
+
+def test_page_sizer_backs_off_when_bigger_pages_are_slower():
+    sizer = PageSizer().start(100)
+    assert sizer.observe(100, 100, _ctx(1000, 0.1)) == 200  # 1000 items/s
+    assert sizer.observe(200, 200, _ctx(2000, 0.4)) == 100  # 500 items/s
+    assert sizer.observe(100, 100, _ctx(1000, 0.1)) == 100
+
+
+def test_page_sizer_ignores_short_pages_and_cache_hits():
+    sizer = PageSizer().start(100)
+    assert sizer.observe(100, 40, _ctx(1000, 0.1)) == 100
+    assert sizer.observe(100, 100, None) == 100
+
+
+@pytest.mark.parametrize(
+    "path, result_key",
+    [("/api/v1/trips.json", "trips"), ("/users/1/trips.json", "results")],
+)
+def test_adaptive_walk_needs_fewer_requests(path, result_key):
+    with FakeRideWithGPS(trips=1500, max_page_size=300) as fake:
+        client = fake.client(apikey="fake", rate_limit_max=20)
+        walk = client.list(
+            path, result_key=result_key, adaptive=PageSizer(max_size=800)
+        )
+        assert [t.id for t in walk] == list(range(1, 1501))
+        # Fixed pages of 100 take 15 requests.
+        assert fake.requests[("GET", path)] <= 8
+
+
+def test_adaptive_walk_keeps_heavy_pages_small():
+    with FakeRideWithGPS(trips=300, padding=2000) as fake:
+        client = fake.client(apikey="fake", rate_limit_max=1000)
+        sizes = []
+        client.add_hook("before_request", lambda ctx: sizes.append(ctx.params["limit"]))
+        walk = client.list(
+            "/users/1/trips.json", adaptive=PageSizer(min_size=10, max_bytes=50_000)
+        )
+        assert [t.id for t in walk] == list(range(1, 301))
+    assert sizes[0] == 100
+    assert max(sizes[1:]) <= 25
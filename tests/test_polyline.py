@@ -0,0 +1,21 @@
+from pyrwgps.fakeserver import FakeRideWithGPS
+from pyrwgps.polyline import decode, encode
+
+# The example from Google's polyline algorithm documentation.
+POINTS = [(38.5, -120.2), (40.7, -120.95), (43.252, -126.453)]
+ENCODED = "_p~iF~ps|U_ulLnnqC_mqNvxq`@"
+
+
+def test_decode_and_encode_reference_example():
+    assert decode(ENCODED) == POINTS
+    assert encode(POINTS) == ENCODED
+    assert decode("") == []
+
+
+def test_get_polyline_from_v1_endpoint():
+    with FakeRideWithGPS(trips=3, track_points=4) as server:
+        client = server.client(apikey="fake")
+        points = client.get_polyline("trips", 2)
+        assert points[0] == (40.0, -74.998)
+        assert len(points) == 4
+        assert server.requests[("GET", "/api/v1/trips/2/polyline.json")] == 1
@@ -0,0 +1,62 @@
+import pytest
+
+from pyrwgps.fakeserver import FakeRideWithGPS
+from pyrwgps.projection import compile_fields, normalize_fields, project
+
+
+def test_compile_fields_builds_tree():
+    tree = compile_fields(normalize_fields(["id", "user.name", "user.id", "gear"]))
+    assert tree == {"id": None, "gear": None, "user": {"id": None, "name": None}}
+
+
+def test_whole_parent_wins_over_children():
+    assert compile_fields(("user", "user.name")) == {"user": None}
+    assert compile_fields(("user.name", "user")) == {"user": None}
+
+
+def test_project_drops_unselected_subtrees_in_lists():
+    data = {
+        "trips": [
+            {"id": 1, "name": "a", "user": {"id": 9, "name": "u"}, "track": [1, 2]},
+            {"id": 2, "user": None},
+        ],
+        "meta": {"pagination": {"page_count": 1}},
+    }
+    tree = compile_fields(("trips.id", "trips.name", "trips.user.name"))
+    assert project(data, tree) == {
+        "trips": [
+            {"id": 1, "name": "a", "user": {"name": "u"}},
+            {"id": 2, "user": None},
+        ]
+    }
+
+
+@pytest.fixture
+def server():
+    with FakeRideWithGPS(trips=30, padding=500) as fake:
+        yield fake
+
+
+@pytest.mark.parametrize(
+    "path, result_key",
+    [("/api/v1/trips.json", "trips"), ("/users/1/trips.json", "results")],
+)
+def test_list_fields(server, path, result_key):
+    client = server.client(apikey="fake")
+    trips = list(
+        client.list(path, result_key=result_key, fields=["id", "name"], limit=25)
+    )
+    assert [vars(t) for t in trips[:2]] == [
+        {"id": 1, "name": "Fake trip 1"},
+        {"id": 2, "name": "Fake trip 2"},
+    ]
+    assert len(trips) == 25
+
+
+def test_get_fields_are_part_of_cache_key(server):
+    client = server.client(apikey="fake", cache=True)
+    slim = client.get(path="/api/v1/trips/1.json", fields=["trip.id"])
+    assert vars(slim.trip) == {"id": 1}
+    full = client.get(path="/api/v1/trips/1.json")
+    assert len(vars(full.trip)) > 1
+    assert server.requests[("GET", "/api/v1/trips/1.json")] == 2
@@ -0,0 +1,155 @@
+import json
+
+import pytest
+
+from pyrwgps.apiclient import DeadlineExceededError
+from pyrwgps.cli import main
+from pyrwgps.fakeserver import FakeRideWithGPS
+from pyrwgps.quota import QuotaExceededError, QuotaLedger, QuotaPlanner
+
+# 2026-01-01 10:30 UTC
+START = 1767263400.0
+
+
+class Clock:
+    def __init__(self, now=START):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return Clock()
+
+
+@pytest.fixture
+def sleeps(monkeypatch, clock):
+    """Make time.sleep in pyrwgps.quota advance the fake clock instead."""
+    slept = []
+
+    def sleep(seconds):
+        slept.append(seconds)
+        clock.now += seconds
+
+    monkeypatch.setattr("pyrwgps.quota.time.sleep", sleep)
+    return slept
+
+
+def test_counts_persist_per_scope_and_window(tmp_path, clock):
+    path = str(tmp_path / "quota.json")
+    ledger = QuotaLedger(path, hourly=10, clock=clock)
+    for _ in range(3):
+        ledger.spend("a")
+    ledger.spend("b")
+    ledger.flush()
+    assert "a" in json.loads((tmp_path / "quota.json").read_text())["scopes"]
+
+    other = QuotaLedger(path, hourly=10, clock=clock)
+    other.spend("a")
+    assert other.usage("a") == {"hour": 4, "day": 4}
+    assert other.remaining("a") == {"hour": 6, "day": None}
+    other.flush()
+    ledger.flush()
+    assert ledger.usage("a")["hour"] == 4
+
+    clock.now += 3600
+    assert ledger.usage("a") == {"hour": 0, "day": 4}
+    ledger.spend("a")
+    ledger.flush()
+    assert QuotaLedger(path, clock=clock).usage("a") == {"hour": 1, "day": 5}
+
+
+def test_bulk_cannot_use_the_reserve(tmp_path, clock):
+    ledger = QuotaLedger(str(tmp_path / "q.json"), daily=10, reserve=0.3, clock=clock)
+    for _ in range(7):
+        ledger.spend("key", "bulk")
+    with pytest.raises(QuotaExceededError) as caught:
+        ledger.spend("key", "bulk")
+    assert caught.value.window == "day" and caught.value.limit == 7
+    assert caught.value.retry_after == pytest.approx(13.5 * 3600)
+    assert ledger.remaining("key", "bulk")["day"] == 0
+    for _ in range(3):
+        ledger.spend("key", "interactive")
+    with pytest.raises(QuotaExceededError):
+        ledger.spend("key", "interactive")
+
+
+def test_pacing_spreads_bulk_over_the_hour(tmp_path, clock, sleeps):
+    ledger = QuotaLedger(
+        str(tmp_path / "q.json"), hourly=100, reserve=0.4, pace_bulk=True, clock=clock
+    )
+    assert ledger.spend("key", "bulk") == 0
+    # 59 bulk requests left for the remaining 30 minutes.
+    assert ledger.spend("key", "bulk") == pytest.approx(1800 / 60)
+    assert ledger.spend("key", "interactive") == 0
+    assert sleeps == [pytest.approx(30.0)]
+
+
+def test_pacing_never_sleeps_past_the_deadline(tmp_path, clock, sleeps):
+    ledger = QuotaLedger(
+        str(tmp_path / "q.json"), hourly=100, reserve=0.4, pace_bulk=True, clock=clock
+    )
+    with FakeRideWithGPS(trips=5) as server:
+        client = server.client(apikey="fake", quota=ledger)
+        client.get(path="/api/v1/trips/1.json", priority="bulk")
+        # The next paced slot is 30 s away.
+        with pytest.raises(DeadlineExceededError):
+            client.get(path="/api/v1/trips/2.json", priority="bulk", deadline=5)
+        assert sleeps == [] and server.requests[("GET", "/api/v1/trips/2.json")] == 0
+        assert ledger.usage(client.quota_scope())["hour"] == 1
+        client.get(path="/api/v1/trips/2.json", priority="bulk", deadline=60)
+    assert sleeps == [pytest.approx(30.0)]
+
+
+def test_client_counts_requests_not_cache_hits(tmp_path, clock):
+    ledger = QuotaLedger(str(tmp_path / "q.json"), hourly=3, clock=clock)
+    with FakeRideWithGPS(trips=5) as server:
+        client = server.client(apikey="fake", cache=True, quota=ledger)
+        client.get(path="/api/v1/trips/1.json")
+        client.get(path="/api/v1/trips/1.json")
+        client.download_trip_file(1, "gpx")
+        client.get(path="/api/v1/trips/2.json")
+        with pytest.raises(QuotaExceededError):
+            client.get(path="/api/v1/trips/3.json")
+        assert server.requests[("GET", "/api/v1/trips/3.json")] == 0
+    assert ledger.usage(client.quota_scope())["hour"] == 3
+    assert "fake" not in client.quota_scope()
+
+
+def test_planner_estimates_and_defers(tmp_path, clock, sleeps):
+    ledger = QuotaLedger(str(tmp_path / "q.json"), hourly=30, daily=100, clock=clock)
+    with FakeRideWithGPS(trips=250) as server:
+        client = server.client(apikey="fake", quota=ledger)
+        planner = QuotaPlanner(client)
+        walk = planner.estimate_list("/api/v1/trips.json", result_key="trips")
+        assert (walk.items, walk.pages, walk.requests) == (250, 3, 3)
+        legacy = planner.estimate_list("/users/1/trips.json", limit=120, page_size=50)
+        assert (legacy.items, legacy.requests) == (120, 3)
+        sync = planner.estimate_sync(known=240)
+        assert (sync.pages, sync.requests) == (3, 13)
+
+        assert planner.fits(20) and not planner.fits(40)
+        assert planner.defer(20) == 0
+        with pytest.raises(QuotaExceededError):
+            planner.defer(25)  # larger than the hourly bulk share
+        for _ in range(10):
+            client.get(path="/api/v1/trips/1.json")
+        assert planner.defer(20) == pytest.approx(1800)
+        for _ in range(10):
+            client.get(path="/api/v1/trips/2.json")
+        with pytest.raises(QuotaExceededError):
+            planner.defer(24, max_wait=60)
+        with pytest.raises(ValueError):
+            QuotaPlanner(server.client(apikey="fake"))
+
+
+def test_sync_checks_the_quota(tmp_path):
+    with FakeRideWithGPS(trips=5, track_points=5) as server:
+        argv = ["--apikey", "fake", "--base-url", server.url, "--rate-limit", "1000"]
+        argv += ["--cache-dir", str(tmp_path), "--daily-quota", "100", "sync"]
+        assert main(argv) == 0
+    ledger = QuotaLedger(str(tmp_path / "quota.json"))
+    (scope,) = json.loads((tmp_path / "quota.json").read_text())["scopes"]
+    assert ledger.usage(scope)["day"] == 1 + 1 + 5
@@ -1,6 +1,8 @@
+import threading
 import time
 import unittest
-from pyrwgps.ratelimiter import RateLimiter
+from pyrwgps.fakeserver import FakeRideWithGPS
+from pyrwgps.ratelimiter import RateBuckets, RateExceededError, RateLimiter
 
 
 class TestRateLimiter(unittest.TestCase):
@@ -13,11 +15,136 @@ class TestRateLimiter(unittest.TestCase):
         elapsed = time.time() - start
         self.assertGreaterEqual(elapsed, 0.4)  # Should wait at least some time
 
+    def test_acquire_returns_wait_time(self):
+        rl = RateLimiter(1, 1)
+        self.assertEqual(rl.acquire(), 0.0)
+        self.assertGreater(rl.acquire(), 0.0)
+
     def test_repr(self):
         rl = RateLimiter(1, 1)
         r = repr(rl)
         self.assertIn("RateLimiter", r)
 
 
+class TestPriorityLanes(unittest.TestCase):
+    def grant_order(self, limiter, priorities):
+        """Queue callers in order behind a full window; return who got slots, in order."""
+        limiter.acquire()
+        order = []
+        lock = threading.Lock()
+
+        def worker(name, priority):
+            limiter.acquire(priority=priority)
+            with lock:
+                order.append(name)
+
+        threads = []
+        for name, priority in priorities:
+            thread = threading.Thread(target=worker, args=(name, priority))
+            thread.start()
+            threads.append(thread)
+            time.sleep(0.01)  # queue in a known order
+        for thread in threads:
+            thread.join(5)
+        return order
+
+    def test_higher_priority_takes_next_slot(self):
+        limiter = RateLimiter(1, 0.1, bulk_share=0)
+        order = self.grant_order(
+            limiter,
+            [("b1", "bulk"), ("b2", "bulk"), ("n1", "normal"), ("i1", "interactive")],
+        )
+        self.assertEqual(order, ["i1", "n1", "b1", "b2"])
+        stats = limiter.wait_stats()
+        self.assertEqual(stats["bulk"]["acquired"], 2)
+        self.assertEqual(stats["normal"]["acquired"], 2)
+        self.assertEqual(stats["interactive"]["waited"], 1)
+        self.assertGreater(stats["bulk"]["wait_max"], stats["interactive"]["wait_max"])
+        self.assertGreater(stats["bulk"]["wait_mean"], 0)
+
+    def test_bulk_keeps_its_share(self):
+        limiter = RateLimiter(1, 0.05, bulk_share=0.5)
+        order = self.grant_order(
+            limiter,
+            [(f"b{i}", "bulk") for i in range(3)]
+            + [(f"n{i}", "normal") for i in range(3)],
+        )
+        self.assertEqual(order, ["n0", "b0", "n1", "b1", "n2", "b2"])
+
+    def test_timeout_leaves_the_queue(self):
+        limiter = RateLimiter(1, 0.3)
+        limiter.acquire()
+        with self.assertRaises(RateExceededError):
+            limiter.acquire(timeout=0.05, priority="interactive")
+        with self.assertRaises(RateExceededError):
+            limiter.acquire(block=False)
+        self.assertGreater(limiter.acquire(priority="bulk"), 0.0)
+        with self.assertRaises(ValueError):
+            limiter.acquire(priority="urgent")
+
+    def test_client_calls_use_their_lane(self):
+        with FakeRideWithGPS(trips=30) as server:
+            client = server.client(apikey="fake", rate_limit_max=1000)
+            client.get(path="/api/v1/trips/1.json", priority="interactive")
+            self.assertEqual(client.last_context.priority, "interactive")
+            walk = client.list(
+                "/api/v1/trips.json", result_key="trips", priority="bulk"
+            )
+            self.assertEqual(len(list(walk)), 30)
+            client.download_trip_file(1, "gpx", priority="bulk")
+            with self.assertRaises(ValueError):
+                client.get(path="/api/v1/trips/1.json", priority="urgent")
+        stats = client.ratelimiter.wait_stats()
+        self.assertEqual(stats["interactive"]["acquired"], 1)
+        self.assertEqual(stats["bulk"]["acquired"], 2)
+        self.assertEqual(stats["normal"]["acquired"], 0)
+
+
+class TestRateBuckets(unittest.TestCase):
+    def test_per_second(self):
+        limiter = RateLimiter.per_second(4, burst=2)
+        self.assertEqual((limiter.max_messages, limiter.every_seconds), (2, 0.5))
+        self.assertEqual(RateLimiter.per_second(0.5).every_seconds, 2.0)
+
+    def test_patterns_pick_buckets_in_order(self):
+        default, reads, writes, files = (RateLimiter() for _ in range(4))
+        buckets = RateBuckets(
+            default,
+            {
+                "GET /api/v1/*": reads,
+                "POST|PUT|PATCH|DELETE *": writes,
+                "/trips/*.gpx": files,
+            },
+        )
+        self.assertEqual(len(buckets), 3)
+        self.assertIs(buckets.limiter_for("GET", "/api/v1/trips.json"), reads)
+        self.assertIs(buckets.limiter_for("get", "api/v1/trips/1.json?x=1"), reads)
+        self.assertIs(buckets.limiter_for("PUT", "/api/v1/trips/1.json"), writes)
+        self.assertIs(buckets.limiter_for("DELETE", "/trips/1.json"), writes)
+        self.assertIs(buckets.limiter_for("GET", "/trips/1.gpx"), files)
+        self.assertIs(buckets.limiter_for("GET", "/trips/1.tcx"), default)
+        buckets.add("/trips/*", files)
+        self.assertIs(buckets.limiter_for("GET", "/trips/1.tcx"), files)
+        self.assertEqual(set(buckets.wait_stats()), set(buckets.buckets) | {"default"})
+
+    def test_downloads_do_not_throttle_reads(self):
+        downloads = RateLimiter(1, 60)
+        with FakeRideWithGPS(trips=5, track_points=5) as server:
+            client = server.client(
+                apikey="fake",
+                rate_limit_max=1000,
+                rate_limits={"GET /trips/*.gpx": downloads},
+            )
+            client.download_trip_file(1, "gpx")
+            with self.assertRaises(RateExceededError):
+                downloads.acquire(block=False)
+            start = time.monotonic()
+            for trip_id in range(1, 6):
+                client.get(path=f"/api/v1/trips/{trip_id}.json")
+            self.assertLess(time.monotonic() - start, 5)
+        self.assertEqual(downloads.wait_stats()["normal"]["acquired"], 1)
+        self.assertEqual(client.ratelimiter.wait_stats()["normal"]["acquired"], 5)
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,31 @@
+import unittest
+
+from pyrwgps.retry import RetryPolicy
+
+
+class TestRetryPolicy(unittest.TestCase):
+    def test_allows_idempotent_methods_only_by_default(self):
+        policy = RetryPolicy(total=2)
+        self.assertTrue(policy.allows("GET", 1))
+        self.assertTrue(policy.allows("put", 2))
+        self.assertFalse(policy.allows("GET", 3))
+        self.assertFalse(policy.allows("POST", 1))
+        self.assertTrue(policy.allows("POST", 1, opted_in=True))
+
+    def test_backoff_is_exponential_and_capped(self):
+        policy = RetryPolicy(backoff_factor=1, backoff_max=5, jitter=False)
+        self.assertEqual([policy.backoff(n) for n in (1, 2, 3, 4)], [1, 2, 4, 5])
+
+    def test_backoff_jitter_stays_in_range(self):
+        policy = RetryPolicy(backoff_factor=2)
+        for _ in range(50):
+            self.assertTrue(2 <= policy.backoff(2) <= 4)
+
+    def test_retry_after_extends_delay(self):
+        policy = RetryPolicy(backoff_factor=0.1, backoff_max=10, jitter=False)
+        self.assertEqual(policy.backoff(1, retry_after=3), 3)
+        self.assertEqual(policy.backoff(1, retry_after=60), 10)
+
+
+if __name__ == "__main__":
+    unittest.main()
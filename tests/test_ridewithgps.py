@@ -4,12 +4,15 @@ from types import SimpleNamespace
 from typing import Any
 from unittest.mock import Mock, patch
 
+from pyrwgps.cache import ResponseCache
 from pyrwgps.ridewithgps import RideWithGPS
 
 
 class DummyAPIClient:
     """A dummy APIClient to mock HTTP calls for unit testing."""
 
+    last_context = None
+
     def __init__(self, *args, **kwargs):
         self.calls = []
 
@@ -20,7 +23,7 @@ class DummyAPIClient:
             return [self._to_obj(i) for i in data]
         return data
 
-    def call(self, *args, path=None, params=None, method="GET", **kwargs):
+    def call(self, *args, path=None, params=None, method="GET", raw=False, **kwargs):
         self.calls.append((path, params, method))
         json_result = "{}"
         if path == "/api/v1/auth_tokens.json" and method == "POST":
@@ -91,7 +94,8 @@ class DummyAPIClient:
                 json_result = json.dumps(
                     {"results": [{"id": 103, "name": "Ride 3"}], "results_count": 3}
                 )
-        return self._to_obj(json.loads(json_result))
+        data = json.loads(json_result)
+        return data if raw else self._to_obj(data)
 
 
 @pytest.fixture
@@ -334,3 +338,46 @@ def test_download_trip_file_invalid_format():
     client = _make_apikey_client()
     with pytest.raises(ValueError, match="file_format must be one of"):
         client.download_trip_file(123, "fit")
+
+
+# ------------------------------------------------------------------
+# Shared cache
+# ------------------------------------------------------------------
+
+
+def _counting_client(token, store):
+    client = RideWithGPS(
+        client_id="cid", client_secret="csec", access_token=token, cache=store
+    )
+    client.calls = 0
+
+    def urlopen(method, url, **kwargs):
+        client.calls += 1
+        return _fake_response(b'{"trip": {"id": 1}}')
+
+    client._urlopen = urlopen
+    return client
+
+
+def test_shared_cache_is_scoped_per_user():
+    store = ResponseCache(shared=["/api/v1/routes/*"])
+    alice = _counting_client("alice-token", store)
+    bob = _counting_client("bob-token", store)
+
+    alice.get(path="/api/v1/trips/1.json", params={"filter": {"ids": [1, 2]}})
+    bob.get(path="/api/v1/trips/1.json", params={"filter": {"ids": [1, 2]}})
+    assert (alice.calls, bob.calls) == (1, 1)
+
+    alice.get(path="/api/v1/routes/5.json")
+    bob.get(path="/api/v1/routes/5.json")
+    assert (alice.calls, bob.calls) == (2, 1)
+
+
+def test_shared_cache_invalidation_reaches_every_user():
+    store = ResponseCache()
+    alice = _counting_client("alice-token", store)
+    bob = _counting_client("bob-token", store)
+    bob.get(path="/api/v1/trips/1.json")
+    alice.put(path="/trips/1.json", params={"name": "x"})
+    bob.get(path="/api/v1/trips/1.json")
+    assert bob.calls == 2
@@ -0,0 +1,142 @@
+import math
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from pyrwgps.fakeserver import FakeRideWithGPS  # noqa: E402
+from pyrwgps.polyline import decode  # noqa: E402
+from pyrwgps.simplify import (  # noqa: E402
+    LODPyramid,
+    _project,
+    _segment_distance,
+    douglas_peucker,
+    importance,
+    pixel_metres,
+    visvalingam,
+)
+
+
+def wiggly(size=500, seed=3):
+    rng = np.random.default_rng(seed)
+    steps = rng.normal(0, 1e-4, (size, 2)).cumsum(axis=0)
+    return steps + [40.0, -105.0]
+
+
+def reference_dp(points, tolerance):
+    """Textbook recursive Douglas-Peucker, keeping indices."""
+    _, x, y = _project(points)
+    keep = {0, len(x) - 1}
+
+    def recurse(first, last):
+        if last - first < 2:
+            return
+        inner = np.arange(first + 1, last)
+        distance = _segment_distance(
+            x[inner], y[inner], (x[first], y[first]), (x[last], y[last])
+        )
+        if distance.max() > tolerance:
+            split = int(inner[np.argmax(distance)])
+            keep.add(split)
+            recurse(first, split)
+            recurse(split, last)
+
+    recurse(0, len(x) - 1)
+    return np.asarray(points)[sorted(keep)]
+
+
+@pytest.mark.parametrize("tolerance", [1.0, 5.0, 20.0, 100.0])
+def test_douglas_peucker_matches_recursive(tolerance):
+    points = wiggly()
+    simplified = douglas_peucker(points, tolerance)
+    assert np.array_equal(simplified, reference_dp(points, tolerance))
+    ranks = importance(points)
+    assert np.array_equal(points[ranks > tolerance], simplified)
+    assert math.isinf(ranks[0]) and math.isinf(ranks[-1])
+
+
+def test_edge_cases():
+    assert douglas_peucker([], 5).shape == (0, 2)
+    assert douglas_peucker([(40, -105)], 5).tolist() == [[40, -105]]
+    line = [(40.0, -105.0 + step * 1e-4) for step in range(10)]
+    assert len(douglas_peucker(line, 0.5)) == 2
+    assert len(visvalingam(line, 0.5)) == 2
+    # A closed loop keeps its far side.
+    loop = [(40, -105), (40.01, -105), (40.01, -104.99), (40, -105)]
+    assert len(douglas_peucker(loop, 10)) == 4
+
+
+def test_visvalingam_drops_small_triangles():
+    points = wiggly()
+    coarse = visvalingam(points, 20.0)
+    fine = visvalingam(points, 2.0)
+    assert 2 < len(coarse) < len(fine) < len(points)
+    assert coarse[0].tolist() == points[0].tolist()
+    assert coarse[-1].tolist() == points[-1].tolist()
+    rows = {tuple(row) for row in points.tolist()}
+    assert all(tuple(row) in rows for row in coarse.tolist())
+
+
+def test_pyramid_levels():
+    points = wiggly(2000)
+    pyramid = LODPyramid(points, zooms=range(8, 15))
+    sizes = [len(pyramid.at(zoom)) for zoom in range(8, 15)]
+    assert sizes == sorted(sizes) and sizes[0] < sizes[-1] <= len(points)
+    assert len(pyramid.at(20)) == len(points)
+    assert np.array_equal(pyramid.at(2), pyramid.at(8))
+    tolerance = pixel_metres(12, 40.0)
+    assert len(pyramid.at(12)) == len(douglas_peucker(points, tolerance))
+    assert np.allclose(decode(pyramid.encoded(12)), pyramid.at(12), atol=1e-5)
+    assert pyramid.encoded(12) is pyramid.encoded(12)
+    with pytest.raises(ValueError):
+        pyramid.at(12)[0, 0] = 0
+
+
+def max_pixel_error(points, drawn, zoom):
+    """How many pixels at ``zoom`` the dropped points are from the drawn line."""
+    index = {tuple(row): i for i, row in enumerate(points.tolist())}
+    kept = np.array([index[tuple(row)] for row in drawn.tolist()])
+    dropped = np.setdiff1d(np.arange(len(points)), kept)
+    if dropped.size == 0:
+        return 0.0
+    _, x, y = _project(points)
+    after = np.searchsorted(kept, dropped)
+    start, end = kept[after - 1], kept[after]
+    distance = _segment_distance(
+        x[dropped], y[dropped], (x[start], y[start]), (x[end], y[end])
+    )
+    return distance.max() / pixel_metres(zoom, float(points[:, 0].mean()))
+
+
+def test_sparse_pyramid_keeps_pixel_tolerance():
+    # About 50 km across, so levels 4 to 12 all differ.
+    points = (wiggly(2000) - [40.0, -105.0]) * 100 + [40.0, -105.0]
+    pyramid = LODPyramid(points, zooms=(12, 4, 8))
+    assert np.array_equal(pyramid.at(6), pyramid.at(8))
+    assert np.array_equal(pyramid.at(11), pyramid.at(12))
+    assert np.array_equal(pyramid.at(2), pyramid.at(4))
+    assert len(pyramid.at(13)) == len(points)
+    assert len(pyramid.at(4)) < len(pyramid.at(8)) < len(pyramid.at(12))
+    for zoom in range(2, 14):
+        assert max_pixel_error(points, pyramid.at(zoom), zoom) <= 1.0
+    assert max_pixel_error(points, pyramid.at(4), 6) > 1.0
+
+
+def test_client_caches_pyramid_per_route():
+    with FakeRideWithGPS(routes=3, track_points=50) as server:
+        client = server.client(apikey="fake", cache=True)
+        pyramid = client.get_pyramid("routes", 2, zooms=(10, 14))
+        assert client.get_pyramid("routes", 2, zooms=(10, 14)) is pyramid
+        assert client.get_pyramid("routes", 2, zooms=[14, 10]) is pyramid
+        assert client.get_pyramid("routes", 2) is not pyramid
+        assert client.get_pyramid("routes", 3, zooms=(10, 14)) is not pyramid
+        assert server.requests[("GET", "/api/v1/routes/2/polyline.json")] == 1
+
+        client.invalidate_cache("/api/v1/routes/2.json")
+        assert client.get_pyramid("routes", 2, zooms=(10, 14)) is not pyramid
+        assert server.requests[("GET", "/api/v1/routes/2/polyline.json")] == 2
+
+        uncached = server.client(apikey="fake")
+        assert uncached.get_pyramid("routes", 2) is not uncached.get_pyramid(
+            "routes", 2
+        )
@@ -0,0 +1,107 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from pyrwgps.apiclient import APIError  # noqa: E402
+from pyrwgps.fakeserver import FakeRideWithGPS  # noqa: E402
+from pyrwgps.spatial import SpatialIndex  # noqa: E402
+
+
+def random_tracks(count, seed=0):
+    rng = np.random.default_rng(seed)
+    starts = rng.uniform((39.0, -76.0), (41.0, -74.0), (count, 2))
+    return {
+        i: starts[i] + np.cumsum(rng.normal(0, 3e-4, (200, 2)), axis=0)
+        for i in range(count)
+    }
+
+
+def test_bbox_matches_brute_force():
+    tracks = random_tracks(500)
+    index = SpatialIndex(cell_size=0.02)
+    for item_id, points in tracks.items():
+        index.add(item_id, points)
+    box = (39.8, -75.3, 40.2, -74.9)
+    # A polyline with a point inside the box certainly passes through it.
+    inside = {
+        item_id
+        for item_id, points in tracks.items()
+        if (
+            (np.round(points * 1e5) / 1e5 >= box[:2])
+            & (np.round(points * 1e5) / 1e5 <= box[2:])
+        )
+        .all(axis=1)
+        .any()
+    }
+    found = set(index.bbox(*box))
+    assert inside and inside <= found
+    # Anything else found crosses the box between two points outside it.
+    assert len(found - inside) < len(inside) // 5 + 2
+
+
+def test_segment_crossing_box_without_points_in_it():
+    index = SpatialIndex()
+    index.add(1, [(40.0, -75.5), (40.0, -74.5)])
+    index.add(2, [(41.0, -75.5), (41.0, -74.5)])
+    assert index.bbox(39.99, -75.01, 40.01, -74.99) == [1]
+    assert index.near(40.004, -75.0, 500)[0][0] == 1
+    assert index.near(40.004, -75.0, 400) == []
+
+
+def test_near_orders_by_distance():
+    index = SpatialIndex()
+    index.add(7, [(40.0, -75.0), (40.0, -74.99)])
+    index.add(8, [(40.002, -75.0), (40.002, -74.99)])
+    index.add(9, [(40.5, -75.0)])
+    result = index.near(39.999, -74.995, 1000)
+    assert [item_id for item_id, _ in result] == [7, 8]
+    assert result[0][1] == pytest.approx(111.2, rel=0.01)
+    assert index.near(40.5, -75.0, 1) == [(9, 0.0)]
+
+
+def test_replace_remove_and_persist(tmp_path):
+    index = SpatialIndex()
+    index.add(1, [(40.0, -75.0), (40.0, -74.99)])
+    index.add(2, [(40.0, -75.0), (40.0, -74.99)])
+    assert index.bbox(39.9, -75.1, 40.1, -74.9) == [1, 2]
+    index.add(1, [(10.0, 10.0), (10.0, 10.01)])
+    index.remove(2)
+    assert index.bbox(39.9, -75.1, 40.1, -74.9) == []
+    assert index.points(1) == [(10.0, 10.0), (10.0, 10.01)]
+
+    path = str(tmp_path / "index.npz")
+    index.save(path)
+    loaded = SpatialIndex.load(path)
+    assert loaded.ids == {1}
+    assert loaded.near(10.0, 10.005, 10) == [(1, pytest.approx(0.0, abs=1e-6))]
+
+
+def test_update_fetches_only_missing_polylines():
+    with FakeRideWithGPS(routes=30, track_points=50) as server:
+        client = server.client(apikey="fake", rate_limit_max=1000)
+        index = SpatialIndex()
+        assert index.update(client, "routes", ids=range(1, 11)) == 10
+        assert index.update(client, "routes", max_workers=8) == 20
+        assert len(index) == 30
+        fetched = sum(
+            n
+            for (_, path), n in server.requests.items()
+            if path.endswith("polyline.json")
+        )
+        assert fetched == 30
+        # Route 5 starts at (40.0, -74.995) and heads north-east.
+        assert 5 in index.bbox(39.999, -74.996, 40.001, -74.994)
+        assert index.update(client, "routes", ids=[1, 2], prune=True) == 0
+        assert index.ids == {1, 2}
+
+
+def test_update_skips_missing_items():
+    with FakeRideWithGPS(routes=3, track_points=10) as server:
+        client = server.client(apikey="fake", rate_limit_max=1000)
+        with pytest.raises(APIError, match="routes 99999 .HTTP 404"):
+            client.get_polyline("routes", 99999)
+        index = SpatialIndex()
+        assert index.update(client, "routes", ids=[1, 2, 99999]) == 2
+        assert index.ids == {1, 2}
+        assert list(index.failed) == [99999]
+        assert isinstance(index.failed[99999], APIError)
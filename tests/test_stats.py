@@ -0,0 +1,91 @@
+import math
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from pyrwgps.stats import batch_stats, compare, haversine, ride_stats  # noqa: E402
+from pyrwgps.track import Track  # noqa: E402
+
+# Degrees of latitude per metre.
+DEG = 1 / 111_195.0
+
+
+def ride(seconds=3600, speed=5.0, pause_at=None, pause=0, trip_id=1):
+    """Ride north at ``speed`` m/s, one point a second, climbing 200 m in the first
+    1000 points, flat for 600, then descending 150 m."""
+    n = seconds + 1
+    time = np.arange(n, dtype=float)
+    if pause_at is not None:
+        time[pause_at:] += pause
+    lat = 40 + np.arange(n) * speed * DEG
+    ele = 100 + np.concatenate(
+        [np.linspace(0, 200, 1000), np.full(600, 200.0), np.linspace(200, 50, n - 1600)]
+    )
+    hr = np.where(np.arange(n) < n // 2, 130, 160)
+    return Track(lat, np.full(n, -75.0), ele=ele, time=time, hr=hr, trip_id=trip_id)
+
+
+def test_haversine_one_degree():
+    assert haversine(0, 0, 1, 0) == pytest.approx(111_195, rel=1e-4)
+
+
+def test_distance_time_and_elevation():
+    stats = ride_stats(ride(), hr_zones=(140,))
+    assert stats.distance == pytest.approx(18_000, rel=1e-3)
+    assert stats.duration == 3600
+    assert stats.moving_time == 3600
+    assert stats.max_speed == pytest.approx(5.0, rel=1e-3)
+    assert stats.elevation_gain == pytest.approx(200, abs=1)
+    assert stats.elevation_loss == pytest.approx(150, abs=1)
+    assert stats.hr_zones == [1800.0, 1800.0]
+    assert stats.avg_hr == pytest.approx(145, abs=0.1)
+    assert math.isnan(stats.avg_power) and stats.power_zones == []
+
+
+def test_pauses_and_slow_segments_are_not_moving():
+    paused = ride_stats(ride(pause_at=2000, pause=600))
+    assert paused.duration == 4200
+    assert paused.moving_time == 3599
+    crawling = ride_stats(ride(speed=0.5))
+    assert crawling.moving_time == 0
+
+
+def test_smoothing_removes_noise():
+    track = ride()
+    noise = np.random.default_rng(0).normal(0, 1.0, len(track))
+    track.ele = track.ele + noise
+    raw = ride_stats(track, smoothing=1).elevation_gain
+    smoothed = ride_stats(track, smoothing=15).elevation_gain
+    assert raw > 400
+    assert smoothed == pytest.approx(200, rel=0.25)
+
+
+def test_climbs():
+    (climb,) = ride_stats(ride(), smoothing=1).climbs
+    assert (climb.start, climb.end) == (0, 999)
+    assert climb.gain == pytest.approx(200)
+    assert climb.length == pytest.approx(4995, rel=1e-3)
+    assert climb.grade == pytest.approx(4.0, rel=0.01)
+    assert ride_stats(ride(), min_climb_grade=5).climbs == []
+
+
+def test_batch_matches_single_tracks():
+    tracks = [ride(trip_id=1), Track([], []), ride(seconds=2000, speed=7, trip_id=3)]
+    batch = batch_stats(tracks, hr_zones=(140,))
+    assert batch[1].points == 0 and batch[1].distance == 0
+    for track, stats in zip(tracks, batch):
+        if len(track):
+            single = ride_stats(track, hr_zones=(140,))
+            assert stats.to_dict()["climbs"] == single.to_dict()["climbs"]
+            assert stats.distance == pytest.approx(single.distance)
+            assert stats.elevation_gain == pytest.approx(single.elevation_gain)
+            assert stats.hr_zones == single.hr_zones
+
+
+def test_compare_with_reported_values():
+    stats = ride_stats(ride())
+    report = compare(stats, {"distance": 18_000.0, "moving_time": 3500, "avg_hr": None})
+    assert set(report) == {"distance", "moving_time"}
+    assert abs(report["distance"][2]) < 1e-3
+    assert report["moving_time"] == (3600.0, 3500.0, pytest.approx(100 / 3500))
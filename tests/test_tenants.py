@@ -0,0 +1,94 @@
+import pytest
+
+from pyrwgps.apiclient import DeadlineExceededError
+from pyrwgps.fakeserver import FakeRideWithGPS
+from pyrwgps.tenants import ClientPool, TenantClient
+
+
+@pytest.fixture
+def server():
+    with FakeRideWithGPS(trips=30, track_points=5) as fake:
+        yield fake
+
+
+def make_pool(server, **kwargs):
+    pool = ClientPool(client_id="app", client_secret="secret", **kwargs)
+    pool.shared.BASE_URL = server.url
+    return pool
+
+
+def test_clients_are_reused_and_evicted(server):
+    with make_pool(server, max_clients=2) as pool:
+        first = pool.client("token-a")
+        assert isinstance(first, TenantClient)
+        assert pool.client("token-a") is first
+        pool.client("token-b")
+        pool.client("token-a")
+        pool.client("token-c")  # evicts token-b, the least recently used
+        assert "token-a" in pool and "token-b" not in pool and len(pool) == 2
+        assert pool.discard("token-c") and not pool.discard("token-c")
+        with pytest.raises(ValueError):
+            pool.client("")
+        assert not hasattr(first, "__dict__") or not first.__dict__
+    assert len(pool) == 0
+
+
+def test_tenants_share_connections_and_cache(server):
+    with make_pool(server, rate_limit_max=100, global_rate_limit_max=1000) as pool:
+        alice, bob = pool.client("alice"), pool.client("bob")
+        assert (
+            alice.connection_pool is bob.connection_pool is pool.shared.connection_pool
+        )
+        assert alice.access_token == "alice" and alice.BASE_URL == server.url
+        assert alice.get(path="/api/v1/trips/1.json").trip.id == 1
+        alice.get(path="/api/v1/trips/1.json")
+        bob.get(path="/api/v1/trips/1.json")
+        # One cache store, scoped per token.
+        assert server.requests[("GET", "/api/v1/trips/1.json")] == 2
+        assert alice.last_context.path == "/api/v1/trips/1.json"
+        trips = list(alice.list("/api/v1/trips.json", result_key="trips", prefetch=2))
+        assert len(trips) == 30
+        assert alice.download_trip_file(1, "gpx")
+        # Every request took a slot of its tenant's limiter and of the global one.
+        sent = sum(server.requests.values())
+        assert pool.shared.ratelimiter.wait_stats()["normal"]["acquired"] == sent
+        assert alice.ratelimiter.wait_stats()["normal"]["acquired"] == sent - 1
+        alice.cache_enabled = False  # a per-tenant override
+        assert bob.cache_enabled
+
+
+def test_pool_cache_is_bounded(server):
+    with make_pool(server, rate_limit_max=100, max_cache_entries=3) as pool:
+        alice = pool.client("alice")
+        for trip_id in range(1, 6):
+            alice.get(path=f"/api/v1/trips/{trip_id}.json")
+        assert len(pool.shared._cache) == 3
+        alice.get(path="/api/v1/trips/5.json")
+        alice.get(path="/api/v1/trips/1.json")
+        assert server.requests[("GET", "/api/v1/trips/5.json")] == 1
+        assert server.requests[("GET", "/api/v1/trips/1.json")] == 2
+
+
+def test_per_token_and_global_limits(server):
+    with make_pool(
+        server,
+        rate_limit_max=2,
+        rate_limit_seconds=60,
+        global_rate_limit_max=3,
+        global_rate_limit_seconds=60,
+        cache=False,
+    ) as pool:
+        busy, quiet, late = (
+            pool.client("busy"),
+            pool.client("quiet"),
+            pool.client("late"),
+        )
+        busy.get(path="/api/v1/trips/1.json")
+        busy.get(path="/api/v1/trips/2.json")
+        with pytest.raises(DeadlineExceededError):
+            busy.get(path="/api/v1/trips/3.json", deadline=0.05)
+        # The busy user has not used up the global limit.
+        quiet.get(path="/api/v1/trips/3.json")
+        with pytest.raises(DeadlineExceededError):
+            late.get(path="/api/v1/trips/4.json", deadline=0.05)
+    assert server.requests[("GET", "/api/v1/trips/4.json")] == 0
@@ -0,0 +1,67 @@
+import math
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from pyrwgps.fakeserver import FakeRideWithGPS  # noqa: E402
+from pyrwgps.track import Track  # noqa: E402
+
+GPX = b"""<?xml version="1.0"?>
+<gpx xmlns="http://www.topografix.com/GPX/1/1"
+     xmlns:gpxtpx="http://www.garmin.com/xmlschemas/TrackPointExtension/v1">
+<trk><trkseg>
+<trkpt lat="40.0" lon="-75.0"><ele>10.5</ele><time>2026-01-01T00:00:00Z</time>
+<extensions><power>200</power><gpxtpx:TrackPointExtension>
+<gpxtpx:hr>130</gpxtpx:hr><gpxtpx:cad>85</gpxtpx:cad>
+</gpxtpx:TrackPointExtension></extensions></trkpt>
+<trkpt lat="40.001" lon="-75.001"><ele>11</ele><time>2026-01-01T00:00:05Z</time></trkpt>
+</trkseg></trk></gpx>"""
+
+TCX = b"""<?xml version="1.0"?>
+<TrainingCenterDatabase xmlns="http://www.garmin.com/xmlschemas/TrainingCenterDatabase/v2">
+<Activities><Activity><Lap><Track>
+<Trackpoint><Time>2026-01-01T00:00:00Z</Time>
+<Position><LatitudeDegrees>40.0</LatitudeDegrees><LongitudeDegrees>-75.0</LongitudeDegrees></Position>
+<AltitudeMeters>10.5</AltitudeMeters><HeartRateBpm><Value>130</Value></HeartRateBpm>
+<Cadence>85</Cadence><Extensions><TPX><Watts>200</Watts></TPX></Extensions></Trackpoint>
+<Trackpoint><Time>2026-01-01T00:00:03Z</Time><HeartRateBpm><Value>131</Value></HeartRateBpm></Trackpoint>
+<Trackpoint><Time>2026-01-01T00:00:05Z</Time>
+<Position><LatitudeDegrees>40.001</LatitudeDegrees><LongitudeDegrees>-75.001</LongitudeDegrees></Position>
+</Trackpoint>
+</Track></Lap></Activity></Activities></TrainingCenterDatabase>"""
+
+
+@pytest.mark.parametrize("parse, data", [(Track.from_gpx, GPX), (Track.from_tcx, TCX)])
+def test_parse_files(parse, data):
+    track = parse(data, trip_id=5)
+    assert len(track) == 2 and track.trip_id == 5
+    assert track.lat.tolist() == [40.0, 40.001]
+    assert track.ele[0] == 10.5
+    assert track.time[1] - track.time[0] == 5
+    assert (track.hr[0], track.cadence[0], track.power[0]) == (130, 85, 200)
+    assert math.isnan(track.power[1])
+    assert track.has("hr") and track.has("power")
+
+
+def test_track_points_and_fetch():
+    track = Track.from_track_points(
+        [{"x": -75, "y": 40, "t": 1}, {"x": -75.1, "y": 40.1}]
+    )
+    assert track.lng.tolist() == [-75, -75.1]
+    assert math.isnan(track.time[1]) and not track.has("ele")
+
+    with FakeRideWithGPS(trips=3, track_points=20) as server:
+        client = server.client(apikey="fake")
+        fetched = Track.fetch(client, 2)
+        gpx = Track.from_gpx(client.download_trip_file(2, "gpx"))
+    assert fetched.trip_id == 2 and len(fetched) == 20
+    assert fetched.has("hr") and fetched.has("power")
+    assert np.allclose(fetched.lat, gpx.lat) and np.allclose(fetched.lng, gpx.lng)
+
+
+def test_columns_must_match():
+    with pytest.raises(ValueError):
+        Track([1, 2], [1])
+    with pytest.raises(ValueError):
+        Track([1, 2], [1, 2], ele=[1])
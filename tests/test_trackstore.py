@@ -0,0 +1,103 @@
+import math
+import multiprocessing
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from pyrwgps.apiclient import APIError  # noqa: E402
+from pyrwgps.fakeserver import FakeRideWithGPS  # noqa: E402
+from pyrwgps.track import Track  # noqa: E402
+from pyrwgps.trackstore import POINT_SIZE, TrackStore  # noqa: E402
+
+
+def make_track(trip_id, size=10):
+    steps = np.arange(size, dtype=float)
+    return Track(
+        40 + steps * 1e-4,
+        -105 - steps * 1e-4,
+        ele=1600 + steps,
+        time=1767225600 + steps * 5,
+        hr=np.where(steps % 2 == 0, 130.0, np.nan),
+        trip_id=trip_id,
+    )
+
+
+def test_round_trip_and_zero_copy(tmp_path):
+    with TrackStore(str(tmp_path), mode="a") as store:
+        store.extend(make_track(trip_id) for trip_id in (3, 1, 2))
+        assert 2 in store  # readable before flush
+        assert store.track(2).lat[0] == 40
+    assert (tmp_path / "tracks.bin").stat().st_size == 16 + 3 * 10 * POINT_SIZE
+
+    store = TrackStore(str(tmp_path))
+    assert len(store) == 3 and store.ids().tolist() == [1, 2, 3]
+    assert 4 not in store and np.int64(3) in store
+    columns = store.columns(3)
+    assert columns["lat"].base is not None and not columns["lat"].flags.writeable
+    assert columns["lat"][1] == 400001000
+    track = store.track(3)
+    expected = make_track(3)
+    assert np.allclose(track.lat, expected.lat) and np.allclose(track.lng, expected.lng)
+    assert track.time.tolist() == expected.time.tolist()
+    assert track.hr[0] == 130 and math.isnan(track.hr[1])
+    assert not track.has("power")
+    with pytest.raises(KeyError):
+        store.columns(4)
+    with pytest.raises(ValueError):
+        store.add(make_track(4))
+
+
+def test_replace_missing_positions_and_refresh(tmp_path):
+    writer = TrackStore(str(tmp_path), mode="a")
+    writer.add(make_track(1))
+    writer.flush()
+    reader = TrackStore(str(tmp_path))
+
+    gap = make_track(1, size=3)
+    gap.lat[1] = np.nan
+    writer.add(gap)
+    writer.add(make_track(2))
+    writer.close()
+
+    assert len(reader.track(1)) == 10 and 2 not in reader
+    reader.refresh()
+    assert len(reader) == 2 and len(reader.track(1)) == 3
+    assert math.isnan(reader.track(1).lat[1])
+
+    with pytest.raises(ValueError):
+        TrackStore(str(tmp_path), mode="a").add(Track([1], [2]))
+
+
+def _total_points(directory):
+    store = TrackStore(directory)
+    return sum(len(store.columns(trip_id)["time"]) for trip_id in store.ids())
+
+
+def test_fetch_and_share_across_processes(tmp_path):
+    with FakeRideWithGPS(trips=5, track_points=20) as server:
+        client = server.client(apikey="fake", rate_limit_max=1000)
+        with TrackStore(str(tmp_path), mode="a") as store:
+            assert store.fetch(client, [1, 2, 3], max_workers=2) == 3
+            assert store.fetch(client, [2, 3, 4]) == 1
+        assert server.requests[("GET", "/api/v1/trips/2.json")] == 1
+        fetched = Track.fetch(client, 4)
+
+    store = TrackStore(str(tmp_path))
+    assert store.ids().tolist() == [1, 2, 3, 4]
+    assert np.allclose(store.track(4).power, fetched.power)
+    with multiprocessing.get_context("spawn").Pool(2) as pool:
+        assert pool.map(_total_points, [str(tmp_path)] * 2) == [80, 80]
+
+
+def test_fetch_skips_missing_trips(tmp_path):
+    with FakeRideWithGPS(trips=3, track_points=10) as server:
+        client = server.client(apikey="fake", rate_limit_max=1000)
+        with pytest.raises(APIError, match="trips 99999 .HTTP 404"):
+            Track.fetch(client, 99999)
+        with TrackStore(str(tmp_path), mode="a") as store:
+            assert store.fetch(client, [1, 99999, 2], max_workers=2) == 2
+            assert list(store.failed) == [99999]
+            assert isinstance(store.failed[99999], APIError)
+            assert store.fetch(client, [3]) == 1 and store.failed == {}
+    assert TrackStore(str(tmp_path)).ids().tolist() == [1, 2, 3]